@@ -1,6 +1,7 @@
 package main
 
 import (
+	"bufio"
 	"context"
 	"encoding/json"
 	"flag"
@@ -14,23 +15,43 @@ import (
 
 func usage() {
 	fmt.Fprintf(os.Stderr, "Uso: %s [opções] <pergunta>\n", os.Args[0])
+	fmt.Fprintf(os.Stderr, "     %s [opções] -batch <arquivo>\n", os.Args[0])
 	fmt.Fprintln(os.Stderr)
 	fmt.Fprintln(os.Stderr, "Opções:")
 	fmt.Fprintln(os.Stderr, "  -json       Saída em JSON bruto (amigável para agentes/integrações)")
 	fmt.Fprintln(os.Stderr, "  -timeout    Timeout em segundos para a requisição (default 300, 0 = sem timeout)")
+	fmt.Fprintln(os.Stderr, "  -stream     Usa /query/stream e imprime a resposta à medida que é gerada")
+	fmt.Fprintln(os.Stderr, "  -batch      Arquivo com uma pergunta por linha (\"-\" = stdin), enviado a /query/batch")
+	fmt.Fprintln(os.Stderr, "  -collections  Coleções a buscar, separadas por vírgula (default: roteamento do servidor)")
+	fmt.Fprintln(os.Stderr, "  -library    Bibliotecas (metadata.library) a buscar, separadas por vírgula (default: detectadas na pergunta)")
 	fmt.Fprintln(os.Stderr)
 	fmt.Fprintln(os.Stderr, "Ambiente:")
 	fmt.Fprintln(os.Stderr, "  RAG_BASE_URL  URL base do servidor RAG (default http://127.0.0.1:8001)")
 }
 
+// splitList separa uma lista por vírgulas, ignorando itens vazios.
+func splitList(s string) []string {
+	var items []string
+	for _, item := range strings.Split(s, ",") {
+		if item = strings.TrimSpace(item); item != "" {
+			items = append(items, item)
+		}
+	}
+	return items
+}
+
 func main() {
 	jsonOut := flag.Bool("json", false, "Saída em JSON bruto (amigável para agentes/integrações)")
 	timeoutSec := flag.Int("timeout", 300, "Timeout em segundos (0 = sem timeout)")
+	stream := flag.Bool("stream", false, "Usa /query/stream e imprime a resposta à medida que é gerada")
+	batch := flag.String("batch", "", "Arquivo com uma pergunta por linha (\"-\" = stdin), enviado a /query/batch")
+	collections := flag.String("collections", "", "Coleções a buscar, separadas por vírgula (default: roteamento do servidor)")
+	library := flag.String("library", "", "Bibliotecas (metadata.library) a buscar, separadas por vírgula (default: detectadas na pergunta)")
 	flag.Usage = usage
 	flag.Parse()
 
 	args := flag.Args()
-	if len(args) == 0 {
+	if len(args) == 0 && *batch == "" {
 		usage()
 		os.Exit(1)
 	}
@@ -47,8 +68,48 @@ func main() {
 	}
 	defer cancel()
 
-	client := ragclient.New()
-	res, err := client.Query(ctx, question, nil)
+	var opts []ragclient.Option
+	if names := splitList(*collections); len(names) > 0 {
+		opts = append(opts, ragclient.WithCollections(names...))
+	}
+	if names := splitList(*library); len(names) > 0 {
+		opts = append(opts, ragclient.WithFilters(map[string][]string{"library": names}))
+	}
+	client := ragclient.New(opts...)
+
+	if *batch != "" {
+		if err := runBatch(ctx, client, *batch, *jsonOut); err != nil {
+			fmt.Fprintf(os.Stderr, "erro ao consultar RAG: %v\n", err)
+			os.Exit(1)
+		}
+		return
+	}
+
+	var res *ragclient.Result
+	var err error
+	switch {
+	case *stream && !*jsonOut:
+		fmt.Println("Pergunta:")
+		fmt.Println("  ", question)
+		fmt.Println()
+		fmt.Println("Resposta:")
+		res, err = client.QueryStream(ctx, question, nil, func(ev ragclient.StreamEvent) error {
+			if ev.Type == ragclient.EventToken {
+				fmt.Print(ev.Content)
+			}
+			return nil
+		})
+		if err == nil {
+			fmt.Println()
+			fmt.Println()
+			printStats(res)
+			return
+		}
+	case *stream:
+		res, err = client.QueryStream(ctx, question, nil, nil)
+	default:
+		res, err = client.Query(ctx, question, nil)
+	}
 	if err != nil {
 		fmt.Fprintf(os.Stderr, "erro ao consultar RAG: %v\n", err)
 		os.Exit(1)
@@ -57,16 +118,21 @@ func main() {
 	if *jsonOut {
 		// Modo "agent-friendly": expõe pergunta, resposta, documentos e latência.
 		out := struct {
-			Question  string               `json:"question"`
-			Answer    string               `json:"answer"`
-			Documents []ragclient.Document `json:"documents"`
-			LatencyMs int64                `json:"latency_ms"`
+			Question     string               `json:"question"`
+			Answer       string               `json:"answer"`
+			Documents    []ragclient.Document `json:"documents"`
+			LatencyMs    int64                `json:"latency_ms"`
+			FirstTokenMs *int64               `json:"first_token_ms,omitempty"`
 		}{
 			Question:  question,
 			Answer:    res.Response.Answer,
 			Documents: res.Response.Documents,
 			LatencyMs: res.FinishedAt.Sub(res.StartedAt).Milliseconds(),
 		}
+		if !res.FirstTokenAt.IsZero() {
+			ms := res.FirstTokenAt.Sub(res.StartedAt).Milliseconds()
+			out.FirstTokenMs = &ms
+		}
 
 		enc := json.NewEncoder(os.Stdout)
 		enc.SetIndent("", "  ")
@@ -86,6 +152,89 @@ func main() {
 	fmt.Println(res.Response.Answer)
 	fmt.Println()
 
+	printStats(res)
+}
+
+// readQuestions lê uma pergunta por linha de path ("-" = stdin), ignorando
+// linhas vazias.
+func readQuestions(path string) ([]string, error) {
+	f := os.Stdin
+	if path != "-" {
+		var err error
+		if f, err = os.Open(path); err != nil {
+			return nil, err
+		}
+		defer f.Close()
+	}
+
+	var questions []string
+	scanner := bufio.NewScanner(f)
+	for scanner.Scan() {
+		if q := strings.TrimSpace(scanner.Text()); q != "" {
+			questions = append(questions, q)
+		}
+	}
+	return questions, scanner.Err()
+}
+
+// runBatch envia as perguntas de path numa única chamada a /query/batch e
+// imprime cada resultado assim que chega (com -json, uma linha JSON por pergunta).
+func runBatch(ctx context.Context, client *ragclient.Client, path string, jsonOut bool) error {
+	questions, err := readQuestions(path)
+	if err != nil {
+		return fmt.Errorf("falha ao ler perguntas: %w", err)
+	}
+	if len(questions) == 0 {
+		return fmt.Errorf("nenhuma pergunta em %s", path)
+	}
+
+	queries := make([]ragclient.QueryRequest, len(questions))
+	for i, q := range questions {
+		queries[i] = ragclient.QueryRequest{Query: q}
+	}
+
+	started := time.Now()
+	enc := json.NewEncoder(os.Stdout)
+	_, err = client.QueryBatch(ctx, queries, 0, func(ev ragclient.BatchEvent) error {
+		if ev.Type != ragclient.EventResult && ev.Type != ragclient.EventError {
+			return nil
+		}
+		latency := time.Since(started)
+		if jsonOut {
+			return enc.Encode(struct {
+				Question  string               `json:"question"`
+				Answer    string               `json:"answer,omitempty"`
+				Documents []ragclient.Document `json:"documents,omitempty"`
+				Cached    bool                 `json:"cached,omitempty"`
+				Error     string               `json:"error,omitempty"`
+				LatencyMs int64                `json:"latency_ms"`
+			}{
+				Question:  questions[ev.Index],
+				Answer:    ev.Answer,
+				Documents: ev.Documents,
+				Cached:    ev.Cached,
+				Error:     ev.Detail,
+				LatencyMs: latency.Milliseconds(),
+			})
+		}
+
+		fmt.Printf("[%d] %s\n", ev.Index+1, questions[ev.Index])
+		if ev.Type == ragclient.EventError {
+			fmt.Printf("ERRO: %s\n\n", ev.Detail)
+			return nil
+		}
+		fmt.Println(ev.Answer)
+		fmt.Printf("(%s, %d documentos)\n\n", latency.Round(10*time.Millisecond), len(ev.Documents))
+		return nil
+	})
+	return err
+}
+
+// printStats imprime latências e fontes de um resultado.
+func printStats(res *ragclient.Result) {
+	if !res.FirstTokenAt.IsZero() {
+		fmt.Printf("Primeiro token: %s\n", res.FirstTokenAt.Sub(res.StartedAt).Round(10*time.Millisecond))
+	}
 	fmt.Printf("Tempo total: %s\n", res.FinishedAt.Sub(res.StartedAt).Round(10*time.Millisecond))
 
 	if len(res.Response.Documents) > 0 {
@@ -98,6 +247,9 @@ func main() {
 			lang := toString(meta["lang"])
 
 			fmt.Printf("  [%d] score=%.3f", i+1, d.Score)
+			if d.Collection != "" {
+				fmt.Printf(" collection=%s", d.Collection)
+			}
 			if source != "" {
 				fmt.Printf(" source=%s", source)
 			}
@@ -1,6 +1,7 @@
 package ragclient
 
 import (
+	"bufio"
 	"bytes"
 	"context"
 	"encoding/json"
@@ -16,8 +17,10 @@ const defaultBaseURL = "http://127.0.0.1:8001"
 
 // Client é um cliente HTTP para o servidor Shantilly RAG.
 type Client struct {
-	baseURL    string
-	httpClient *http.Client
+	baseURL     string
+	httpClient  *http.Client
+	collections []string
+	filters     map[string][]string
 }
 
 // Option configura o Client.
@@ -39,6 +42,22 @@ func WithHTTPClient(hc *http.Client) Option {
 	}
 }
 
+// WithCollections restringe todas as consultas a essas coleções, em vez do
+// roteamento automático do servidor.
+func WithCollections(names ...string) Option {
+	return func(c *Client) {
+		c.collections = names
+	}
+}
+
+// WithFilters aplica filtros de metadados (library, type, path, lang) a todas
+// as consultas, em vez da detecção automática de biblioteca do servidor.
+func WithFilters(filters map[string][]string) Option {
+	return func(c *Client) {
+		c.filters = filters
+	}
+}
+
 // New cria um novo Client.
 //
 // Se baseURL não for informada via Option, usa RAG_BASE_URL ou defaultBaseURL.
@@ -60,16 +79,18 @@ func New(opts ...Option) *Client {
 	return c
 }
 
-// Query envia uma pergunta ao servidor RAG e retorna a resposta estruturada.
-func (c *Client) Query(ctx context.Context, query string, history []Message) (*Result, error) {
+// newQueryRequest valida a pergunta e monta a requisição POST para path.
+func (c *Client) newQueryRequest(ctx context.Context, path, query string, history []Message) (*http.Request, error) {
 	query = strings.TrimSpace(query)
 	if query == "" {
 		return nil, errors.New("query vazia")
 	}
 
 	reqBody := QueryRequest{
-		Query:   query,
-		History: history,
+		Query:       query,
+		History:     history,
+		Collections: c.collections,
+		Filters:     c.filters,
 	}
 
 	buf, err := json.Marshal(reqBody)
@@ -77,12 +98,30 @@ func (c *Client) Query(ctx context.Context, query string, history []Message) (*R
 		return nil, fmt.Errorf("falha ao serializar QueryRequest: %w", err)
 	}
 
-	url := c.baseURL + "/query"
+	url := c.baseURL + path
 	httpreq, err := http.NewRequestWithContext(ctx, http.MethodPost, url, bytes.NewReader(buf))
 	if err != nil {
 		return nil, fmt.Errorf("falha ao criar requisição: %w", err)
 	}
 	httpreq.Header.Set("Content-Type", "application/json")
+	return httpreq, nil
+}
+
+// httpError monta um erro a partir de uma resposta HTTP não-200.
+func httpError(resp *http.Response, url string) error {
+	// tenta ler corpo para facilitar debug
+	var bodyBuf bytes.Buffer
+	_, _ = bodyBuf.ReadFrom(resp.Body)
+	return fmt.Errorf("resposta HTTP %d de %s: %s", resp.StatusCode, url, strings.TrimSpace(bodyBuf.String()))
+}
+
+// Query envia uma pergunta ao servidor RAG e retorna a resposta estruturada.
+func (c *Client) Query(ctx context.Context, query string, history []Message) (*Result, error) {
+	httpreq, err := c.newQueryRequest(ctx, "/query", query, history)
+	if err != nil {
+		return nil, err
+	}
+	url := httpreq.URL.String()
 
 	started := time.Now()
 	resp, err := c.httpClient.Do(httpreq)
@@ -93,10 +132,7 @@ func (c *Client) Query(ctx context.Context, query string, history []Message) (*R
 	defer resp.Body.Close()
 
 	if resp.StatusCode != http.StatusOK {
-		// tenta ler corpo para facilitar debug
-		var bodyBuf bytes.Buffer
-		_, _ = bodyBuf.ReadFrom(resp.Body)
-		return nil, fmt.Errorf("resposta HTTP %d de %s: %s", resp.StatusCode, url, strings.TrimSpace(bodyBuf.String()))
+		return nil, httpError(resp, url)
 	}
 
 	var qr QueryResponse
@@ -110,3 +146,188 @@ func (c *Client) Query(ctx context.Context, query string, history []Message) (*R
 		FinishedAt: finished,
 	}, nil
 }
+
+// QueryStream consulta o endpoint /query/stream, chamando onEvent para cada
+// evento recebido (documentos primeiro, depois os tokens do LLM).
+//
+// Ao final, retorna um Result com a resposta completa montada a partir dos
+// tokens. FirstTokenAt indica quando o primeiro token chegou. Se onEvent
+// retornar erro, o stream é interrompido e o erro é repassado.
+func (c *Client) QueryStream(ctx context.Context, query string, history []Message, onEvent func(StreamEvent) error) (*Result, error) {
+	httpreq, err := c.newQueryRequest(ctx, "/query/stream", query, history)
+	if err != nil {
+		return nil, err
+	}
+	url := httpreq.URL.String()
+
+	started := time.Now()
+	resp, err := c.httpClient.Do(httpreq)
+	if err != nil {
+		return nil, fmt.Errorf("falha ao chamar %s: %w", url, err)
+	}
+	defer resp.Body.Close()
+
+	if resp.StatusCode != http.StatusOK {
+		return nil, httpError(resp, url)
+	}
+
+	res := &Result{Response: &QueryResponse{}, StartedAt: started}
+	var answer strings.Builder
+
+	scanner := bufio.NewScanner(resp.Body)
+	// Evento de documentos pode ser grande (vários chunks de texto).
+	scanner.Buffer(make([]byte, 0, 64*1024), 16*1024*1024)
+	done := false
+	for scanner.Scan() {
+		line := bytes.TrimSpace(scanner.Bytes())
+		if len(line) == 0 {
+			continue
+		}
+
+		var ev StreamEvent
+		if err := json.Unmarshal(line, &ev); err != nil {
+			return nil, fmt.Errorf("falha ao decodificar evento do stream: %w", err)
+		}
+
+		switch ev.Type {
+		case EventDocuments:
+			res.Response.Documents = ev.Documents
+			res.Response.PromptTokens = ev.PromptTokens
+			res.Response.Filters = ev.Filters
+		case EventToken:
+			if res.FirstTokenAt.IsZero() {
+				res.FirstTokenAt = time.Now()
+			}
+			answer.WriteString(ev.Content)
+		case EventDone:
+			done = true
+			res.Response.Cached = ev.Cached
+		}
+
+		if onEvent != nil {
+			if err := onEvent(ev); err != nil {
+				return nil, err
+			}
+		}
+
+		if ev.Type == EventError {
+			return nil, fmt.Errorf("erro no stream de %s: %s", url, ev.Detail)
+		}
+		if done {
+			break
+		}
+	}
+	if err := scanner.Err(); err != nil {
+		return nil, fmt.Errorf("falha ao ler stream de %s: %w", url, err)
+	}
+	if !done {
+		return nil, fmt.Errorf("stream de %s terminou sem evento %q", url, EventDone)
+	}
+
+	res.Response.Answer = answer.String()
+	res.FinishedAt = time.Now()
+	return res, nil
+}
+
+// QueryBatch envia várias perguntas numa única requisição a /query/batch.
+//
+// O servidor embeda e busca todas de uma vez e devolve cada resultado assim
+// que fica pronto; onEvent (opcional) é chamado para cada evento, na ordem de
+// chegada. O retorno tem um BatchItem por pergunta, na ordem de queries.
+// Falhas de um item ficam em BatchItem.Err; o erro retornado indica falha
+// do lote inteiro.
+func (c *Client) QueryBatch(ctx context.Context, queries []QueryRequest, maxConcurrency int, onEvent func(BatchEvent) error) ([]BatchItem, error) {
+	reqBody := BatchQueryRequest{
+		Queries:        make([]QueryRequest, len(queries)),
+		MaxConcurrency: maxConcurrency,
+	}
+	for i, q := range queries {
+		q.Query = strings.TrimSpace(q.Query)
+		if q.Query == "" {
+			return nil, fmt.Errorf("query vazia na posição %d", i)
+		}
+		if len(q.Collections) == 0 {
+			q.Collections = c.collections
+		}
+		if len(q.Filters) == 0 {
+			q.Filters = c.filters
+		}
+		reqBody.Queries[i] = q
+	}
+
+	buf, err := json.Marshal(reqBody)
+	if err != nil {
+		return nil, fmt.Errorf("falha ao serializar BatchQueryRequest: %w", err)
+	}
+
+	url := c.baseURL + "/query/batch"
+	httpreq, err := http.NewRequestWithContext(ctx, http.MethodPost, url, bytes.NewReader(buf))
+	if err != nil {
+		return nil, fmt.Errorf("falha ao criar requisição: %w", err)
+	}
+	httpreq.Header.Set("Content-Type", "application/json")
+
+	resp, err := c.httpClient.Do(httpreq)
+	if err != nil {
+		return nil, fmt.Errorf("falha ao chamar %s: %w", url, err)
+	}
+	defer resp.Body.Close()
+
+	if resp.StatusCode != http.StatusOK {
+		return nil, httpError(resp, url)
+	}
+
+	items := make([]BatchItem, len(queries))
+	scanner := bufio.NewScanner(resp.Body)
+	scanner.Buffer(make([]byte, 0, 64*1024), 16*1024*1024)
+	done := false
+	for scanner.Scan() {
+		line := bytes.TrimSpace(scanner.Bytes())
+		if len(line) == 0 {
+			continue
+		}
+
+		var ev BatchEvent
+		if err := json.Unmarshal(line, &ev); err != nil {
+			return nil, fmt.Errorf("falha ao decodificar evento do lote: %w", err)
+		}
+
+		switch ev.Type {
+		case EventResult, EventError:
+			if ev.Index < 0 || ev.Index >= len(items) {
+				return nil, fmt.Errorf("evento de %s com índice inválido: %d", url, ev.Index)
+			}
+			item := &items[ev.Index]
+			item.FinishedAt = time.Now()
+			if ev.Type == EventError {
+				item.Err = errors.New(ev.Detail)
+			} else {
+				item.Response = &QueryResponse{
+					Answer:       ev.Answer,
+					Documents:    ev.Documents,
+					Cached:       ev.Cached,
+					PromptTokens: ev.PromptTokens,
+					Filters:      ev.Filters,
+				}
+			}
+		case EventDone:
+			done = true
+		}
+
+		if onEvent != nil {
+			if err := onEvent(ev); err != nil {
+				return nil, err
+			}
+		}
+		if done {
+			break
+		}
+	}
+	if err := scanner.Err(); err != nil {
+		return nil, fmt.Errorf("falha ao ler stream de %s: %w", url, err)
+	}
+	if !done {
+		return nil, fmt.Errorf("stream de %s terminou sem evento %q", url, EventDone)
+	}
+	return items, nil
+}
@@ -12,6 +12,11 @@ type Message struct {
 type QueryRequest struct {
 	Query   string    `json:"query"`
 	History []Message `json:"history,omitempty"`
+	// Collections restringe a busca a essas coleções (vazio = roteamento do servidor).
+	Collections []string `json:"collections,omitempty"`
+	// Filters filtra por metadados (library, type, path, lang): campo ->
+	// valores aceitos. Vazio = library detectada na pergunta pelo servidor.
+	Filters map[string][]string `json:"filters,omitempty"`
 }
 
 // Document representa um documento retornado pelo RAG.
@@ -20,12 +25,20 @@ type Document struct {
 	Score    float64        `json:"score"`
 	Text     string         `json:"text"`
 	Metadata map[string]any `json:"metadata"`
+	// Collection é a coleção de onde o documento veio.
+	Collection string `json:"collection,omitempty"`
 }
 
 // QueryResponse é a resposta de /query.
 type QueryResponse struct {
 	Answer    string     `json:"answer"`
 	Documents []Document `json:"documents"`
+	// Cached indica que a resposta veio do cache de respostas do servidor.
+	Cached bool `json:"cached,omitempty"`
+	// PromptTokens é a estimativa de tokens do prompt enviado ao LLM.
+	PromptTokens int `json:"prompt_tokens,omitempty"`
+	// Filters são os filtros de metadados aplicados na busca.
+	Filters map[string][]string `json:"filters,omitempty"`
 }
 
 // Result agrega a resposta e informações de latência.
@@ -33,4 +46,60 @@ type Result struct {
 	Response   *QueryResponse
 	StartedAt  time.Time
 	FinishedAt time.Time
+	// FirstTokenAt só é preenchido em consultas via QueryStream.
+	FirstTokenAt time.Time
+}
+
+// Tipos de evento emitidos por /query/stream.
+const (
+	EventDocuments = "documents"
+	EventToken     = "token"
+	EventDone      = "done"
+	EventError     = "error"
+)
+
+// StreamEvent é uma linha NDJSON emitida pelo endpoint /query/stream.
+type StreamEvent struct {
+	Type      string     `json:"type"`
+	Documents []Document `json:"documents,omitempty"`
+	Content   string     `json:"content,omitempty"`
+	Detail    string     `json:"detail,omitempty"`
+	Cached    bool       `json:"cached,omitempty"`
+	// PromptTokens e Filters vêm no evento "documents".
+	PromptTokens int                 `json:"prompt_tokens,omitempty"`
+	Filters      map[string][]string `json:"filters,omitempty"`
+}
+
+// EventResult é o evento de /query/batch com a resposta de uma pergunta
+// (erros por item usam EventError e o fim do lote, EventDone).
+const EventResult = "result"
+
+// BatchQueryRequest é o payload enviado ao endpoint /query/batch.
+type BatchQueryRequest struct {
+	Queries []QueryRequest `json:"queries"`
+	// MaxConcurrency limita as gerações simultâneas deste lote (0 = default do servidor).
+	MaxConcurrency int `json:"max_concurrency,omitempty"`
+}
+
+// BatchEvent é uma linha NDJSON emitida pelo endpoint /query/batch.
+type BatchEvent struct {
+	Type         string              `json:"type"`
+	Index        int                 `json:"index"`
+	Answer       string              `json:"answer,omitempty"`
+	Documents    []Document          `json:"documents,omitempty"`
+	Cached       bool                `json:"cached,omitempty"`
+	PromptTokens int                 `json:"prompt_tokens,omitempty"`
+	Filters      map[string][]string `json:"filters,omitempty"`
+	Detail       string              `json:"detail,omitempty"`
+	// Count e Errors vêm no evento "done".
+	Count  int `json:"count,omitempty"`
+	Errors int `json:"errors,omitempty"`
+}
+
+// BatchItem é o resultado de uma pergunta enviada via QueryBatch.
+type BatchItem struct {
+	// Response é nil se o servidor informou erro para o item (ver Err).
+	Response   *QueryResponse
+	Err        error
+	FinishedAt time.Time
 }
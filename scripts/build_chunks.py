@@ -1,36 +1,237 @@
+import argparse
+import hashlib
 import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import yaml
 
 
 ROOT = Path(__file__).resolve().parents[1]
 RAW_DIR = ROOT / "data" / "raw"
 CHUNKS_DIR = ROOT / "data" / "chunks"
+CONFIG_PATH = ROOT / "config" / "chunking.yaml"
+# Um JSONL por arquivo de origem, reaproveitado entre execuções (ver ShardIndex).
+SHARDS_DIR = ROOT / "data" / "cache" / "chunk_shards"
+FETCH_MANIFEST_PATH = RAW_DIR / "fetch_manifest.json"
+
+# Permite importar o pacote server/ (configuração das coleções) ao rodar como script.
+sys.path.insert(0, str(ROOT))
+
+from server.collection_config import assign_collection, load_collection_configs  # noqa: E402
+
+
+@dataclass
+class ChunkConfig:
+    max_chars: int = 1500
+    min_chars: int = 400
+    overlap_chars: int = 200
+    workers: int = 0
+    extensions: List[str] = field(default_factory=lambda: [".md", ".txt", ".go"])
+
+    @classmethod
+    def load(cls, path: Path = CONFIG_PATH) -> "ChunkConfig":
+        data: Dict[str, Any] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+        default = cls()
+        return cls(
+            max_chars=int(data.get("max_chars", default.max_chars)),
+            min_chars=int(data.get("min_chars", default.min_chars)),
+            overlap_chars=int(data.get("overlap_chars", default.overlap_chars)),
+            workers=int(data.get("workers", default.workers)),
+            extensions=[e.lower() for e in data.get("extensions", default.extensions)],
+        )
+
+    def digest(self) -> str:
+        """Hash dos parâmetros que afetam a saída (mudou -> rebuild completo)."""
+        params = asdict(self)
+        params.pop("workers")
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# (rótulo da seção/declaração, texto)
+Unit = Tuple[str, str]
 
 
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def iter_text_files() -> Iterable[Path]:
-    for path in RAW_DIR.rglob("*"):
-        if path.is_file() and path.suffix.lower() in {".md", ".txt", ".go"}:
+def iter_text_files(extensions: Iterable[str] = (".md", ".txt", ".go")) -> Iterable[Path]:
+    allowed = set(extensions)
+    for path in sorted(RAW_DIR.rglob("*")):
+        if path.is_file() and path.suffix.lower() in allowed:
             yield path
 
 
-def simple_chunk(text: str, max_chars: int = 2000) -> List[str]:
-    """Chunking simples por tamanho fixo de caracteres.
+# --- Divisão em unidades estruturais -------------------------------------
+
+_GO_DECL_RE = re.compile(r"^(func|type|var|const|import)\b")
+_GO_FUNC_RE = re.compile(r"^func\s+(?:\(\s*(?:\w+\s+)?\*?\s*(\w+)[^)]*\)\s*)?(\w+)")
+_GO_NAMED_RE = re.compile(r"^(?:type|var|const)\s+(\w+)")
+
+
+def _go_label(line: str) -> str:
+    m = _GO_FUNC_RE.match(line)
+    if m:
+        receiver, name = m.groups()
+        return f"{receiver}.{name}" if receiver else name
+    m = _GO_NAMED_RE.match(line)
+    if m:
+        return m.group(1)
+    return line.split()[0]
+
+
+def split_go(text: str) -> List[Unit]:
+    """Divide um arquivo Go nas declarações de topo.
+
+    O comentário `//` imediatamente acima de uma declaração vai junto com ela;
+    o cabeçalho (comentário do pacote + `package`) vira a primeira unidade.
+    """
+    lines = text.splitlines(keepends=True)
+    starts: List[Tuple[int, str]] = []
+    for i, line in enumerate(lines):
+        if not _GO_DECL_RE.match(line):
+            continue
+        start = i
+        while start > 0 and lines[start - 1].startswith("//"):
+            start -= 1
+        starts.append((start, _go_label(line)))
+
+    if not starts:
+        return [("", text)]
+
+    units: List[Unit] = []
+    if starts[0][0] > 0:
+        units.append(("package", "".join(lines[: starts[0][0]])))
+    for idx, (start, label) in enumerate(starts):
+        end = starts[idx + 1][0] if idx + 1 < len(starts) else len(lines)
+        units.append((label, "".join(lines[start:end])))
+    return units
+
+
+_MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_MD_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+
+def split_markdown(text: str) -> List[Unit]:
+    """Divide Markdown nos títulos; o rótulo é o caminho de títulos (`A > B`)."""
+    units: List[Unit] = []
+    path: List[Tuple[int, str]] = []
+    current: List[str] = []
+    label = ""
+    in_fence = False
 
-    Posteriormente podemos evoluir para chunking por seções/títulos.
+    for line in text.splitlines(keepends=True):
+        if _MD_FENCE_RE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _MD_HEADING_RE.match(line)
+        if heading:
+            if current:
+                units.append((label, "".join(current)))
+            level = len(heading.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level]
+            path.append((level, heading.group(2)))
+            label = " > ".join(title for _, title in path)
+            current = []
+        current.append(line)
+
+    if current:
+        units.append((label, "".join(current)))
+    return units
+
+
+def split_paragraphs(text: str) -> List[Unit]:
+    return [("", p + "\n\n") for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+def split_units(text: str, suffix: str) -> List[Unit]:
+    if suffix == ".go":
+        return split_go(text)
+    if suffix == ".md":
+        return split_markdown(text)
+    return split_paragraphs(text)
+
+
+# --- Empacotamento em chunks ---------------------------------------------
+
+
+def split_oversized(text: str, max_chars: int, overlap_chars: int) -> List[str]:
+    """Divide uma unidade grande em partes de até `max_chars`, em fins de linha.
+
+    Cada parte (a partir da segunda) começa com até `overlap_chars` do final
+    da anterior. Linhas maiores que `max_chars` são cortadas.
     """
-    chunks: List[str] = []
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(start + max_chars, n)
-        chunks.append(text[start:end])
-        start = end
-    return chunks
+    lines: List[str] = []
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            lines.append(line[:max_chars])
+            line = line[max_chars:]
+        lines.append(line)
+
+    overlap_chars = min(overlap_chars, max_chars // 2)
+    parts: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + len(line) > max_chars:
+            parts.append("".join(current))
+            carry: List[str] = []
+            carried = 0
+            for prev in reversed(current):
+                if carried + len(prev) > overlap_chars:
+                    break
+                carry.insert(0, prev)
+                carried += len(prev)
+            current, size = carry, carried
+        current.append(line)
+        size += len(line)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def pack_units(units: List[Unit], cfg: ChunkConfig) -> Iterator[Unit]:
+    """Agrupa unidades vizinhas pequenas e divide as grandes demais."""
+    buf: List[str] = []
+    buf_label: Optional[str] = None
+    size = 0
+
+    def flush() -> Iterator[Unit]:
+        nonlocal buf, buf_label, size
+        text = "".join(buf).strip()
+        if text:
+            yield buf_label or "", text
+        buf, buf_label, size = [], None, 0
+
+    for label, text in units:
+        if len(text) > cfg.max_chars:
+            yield from flush()
+            for part in split_oversized(text, cfg.max_chars, cfg.overlap_chars):
+                if part.strip():
+                    yield label, part.strip()
+            continue
+        if buf and (size >= cfg.min_chars or size + len(text) > cfg.max_chars):
+            yield from flush()
+        if buf_label is None:
+            buf_label = label
+        buf.append(text)
+        size += len(text)
+    yield from flush()
+
+
+def structural_chunks(text: str, suffix: str, cfg: ChunkConfig) -> List[Unit]:
+    return list(pack_units(split_units(text, suffix), cfg))
 
 
 def build_metadata(path: Path) -> Dict:
@@ -57,27 +258,261 @@ def build_metadata(path: Path) -> Dict:
     }
 
 
+def chunk_file(path: Path, cfg: ChunkConfig) -> List[Dict[str, Any]]:
+    """Lê e divide um arquivo; roda nos processos do pool."""
+    text = path.read_text(encoding="utf-8", errors="ignore")
+    if not text.strip():
+        return []
+
+    meta = build_metadata(path)
+    records: List[Dict[str, Any]] = []
+    for section, chunk in structural_chunks(text, path.suffix.lower(), cfg):
+        records.append({"text": chunk, "metadata": {**meta, "section": section}})
+    return records
+
+
+def iter_file_chunks(
+    paths: List[Path], cfg: ChunkConfig
+) -> Iterator[Tuple[Path, List[Dict[str, Any]]]]:
+    """Divide os arquivos em paralelo, produzindo (arquivo, registros) em ordem."""
+    work = partial(chunk_file, cfg=cfg)
+    workers = cfg.workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, work(path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from zip(paths, pool.map(work, paths, chunksize=8))
+
+
+# --- Build incremental ---------------------------------------------------
+
+
+@dataclass
+class ShardIndex:
+    """Estado do último build: um shard por arquivo de `data/raw/`.
+
+    - `config`: `ChunkConfig.digest()` usado nos shards;
+    - `repos`: diretório do repo (`github/owner/repo`) -> commit já processado;
+    - `files`: caminho relativo -> `{shard, size, mtime_ns, chunks}`.
+    """
+
+    config: str = ""
+    repos: Dict[str, str] = field(default_factory=dict)
+    files: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @staticmethod
+    def path() -> Path:
+        return SHARDS_DIR / "index.json"
+
+    @classmethod
+    def load(cls) -> "ShardIndex":
+        if not cls.path().exists():
+            return cls()
+        with cls.path().open("r", encoding="utf-8") as f:
+            data = json.load(f) or {}
+        return cls(
+            config=data.get("config", ""),
+            repos=data.get("repos", {}),
+            files=data.get("files", {}),
+        )
+
+    def save(self) -> None:
+        ensure_dir(SHARDS_DIR)
+        tmp = self.path().with_name("index.json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp, self.path())
+
+
+def shard_path(rel: str) -> Path:
+    return SHARDS_DIR / (hashlib.sha1(rel.encode("utf-8")).hexdigest() + ".jsonl")
+
+
+def repo_of(rel: str) -> Optional[str]:
+    parts = rel.split("/")
+    if parts[0] == "github" and len(parts) >= 4:
+        return "/".join(parts[:3])
+    return None
+
+
+def _git(repo_dir: Path, *args: str) -> Optional[str]:
+    result = subprocess.run(
+        ["git", "-C", str(repo_dir), *args], capture_output=True, text=True
+    )
+    return result.stdout if result.returncode == 0 else None
+
+
+def load_fetch_revisions() -> Dict[str, str]:
+    """Commits atuais registrados pelo fetch_sources (`after` de cada repo)."""
+    if not FETCH_MANIFEST_PATH.exists():
+        return {}
+    with FETCH_MANIFEST_PATH.open("r", encoding="utf-8") as f:
+        data = json.load(f) or {}
+    return {
+        name: entry["after"]
+        for name, entry in (data.get("repos") or {}).items()
+        if entry.get("after")
+    }
+
+
+def repo_changes(repo: str, old: Optional[str], new: Optional[str]) -> Optional[Set[str]]:
+    """Arquivos (relativos a data/raw) alterados entre dois commits do repo.
+
+    None quando não dá para saber pelo git (primeiro build, commit antigo
+    ausente num clone raso etc.); nesse caso vale a comparação por stat.
+    """
+    if old is None or new is None:
+        return None
+    if old == new:
+        return set()
+    out = _git(RAW_DIR / repo, "diff", "--name-only", "--no-renames", old, new)
+    if out is None:
+        return None
+    return {f"{repo}/{line}" for line in out.splitlines() if line}
+
+
+def _stat_changed(path: Path, entry: Dict[str, Any]) -> bool:
+    st = path.stat()
+    return st.st_size != entry.get("size") or st.st_mtime_ns != entry.get("mtime_ns")
+
+
+def current_revisions(repos: Iterable[str]) -> Dict[str, str]:
+    """Commit atual de cada repo: o HEAD do clone ou, sem ele, o `after` do fetch."""
+    fetched = load_fetch_revisions()
+    revs: Dict[str, str] = {}
+    for repo in repos:
+        rev = (_git(RAW_DIR / repo, "rev-parse", "HEAD") or "").strip() or fetched.get(repo)
+        if rev:
+            revs[repo] = rev
+    return revs
+
+
+def plan_build(
+    paths: List[Path], index: ShardIndex
+) -> Tuple[List[Path], Dict[str, str]]:
+    """Escolhe os arquivos a reprocessar; retorna também o commit atual de cada repo.
+
+    Em repos git, vale o `git diff` entre o commit do último build e o atual;
+    fora deles (ou sem histórico suficiente), tamanho + mtime do arquivo.
+    """
+    rels = [p.relative_to(RAW_DIR).as_posix() for p in paths]
+    repos = sorted({r for r in map(repo_of, rels) if r is not None})
+    revs = current_revisions(repos)
+    changes = {
+        repo: repo_changes(repo, index.repos.get(repo), revs.get(repo)) for repo in repos
+    }
+
+    dirty: List[Path] = []
+    for path, rel in zip(paths, rels):
+        entry = index.files.get(rel)
+        if entry is None or not shard_path(rel).exists():
+            dirty.append(path)
+            continue
+        repo = repo_of(rel)
+        changed = changes.get(repo) if repo is not None else None
+        if changed is not None:
+            if rel in changed:
+                dirty.append(path)
+        elif _stat_changed(path, entry):
+            dirty.append(path)
+    return dirty, revs
+
+
+def write_shard(rel: str, records: List[Dict[str, Any]]) -> None:
+    path = shard_path(rel)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Gera os chunks a partir de data/raw/.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processos em paralelo (default: `workers` de config/chunking.yaml).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reprocessa todos os arquivos (default: só os alterados desde o último build).",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
+    cfg = ChunkConfig.load()
+    if args.workers is not None:
+        cfg.workers = args.workers
+
+    collections = load_collection_configs()
+    if not collections:
+        raise SystemExit("Nenhuma coleção configurada em config/collections.yaml")
+
     ensure_dir(CHUNKS_DIR)
-    out_path = CHUNKS_DIR / "charmbracelet_shantilly_knowledge.jsonl"
+    ensure_dir(SHARDS_DIR)
+
+    index = ShardIndex.load()
+    if args.full or index.config != cfg.digest():
+        index = ShardIndex(config=cfg.digest())
+
+    paths = list(iter_text_files(cfg.extensions))
+    rels = [p.relative_to(RAW_DIR).as_posix() for p in paths]
+    dirty, revs = plan_build(paths, index)
 
-    with out_path.open("w", encoding="utf-8") as out_f:
-        for file_path in iter_text_files():
-            text = file_path.read_text(encoding="utf-8", errors="ignore")
-            if not text.strip():
-                continue
+    for rel in set(index.files) - set(rels):
+        shard_path(rel).unlink(missing_ok=True)
+        del index.files[rel]
 
-            meta = build_metadata(file_path)
-            chunks = simple_chunk(text)
+    # Shards gravados conforme os arquivos ficam prontos.
+    for path, records in iter_file_chunks(dirty, cfg):
+        rel = path.relative_to(RAW_DIR).as_posix()
+        write_shard(rel, records)
+        st = path.stat()
+        index.files[rel] = {
+            "shard": shard_path(rel).name,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "chunks": len(records),
+        }
+    index.repos = revs
+    index.save()
 
-            for chunk in chunks:
-                record = {
-                    "text": chunk,
-                    "metadata": meta,
-                }
-                out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    # Cada coleção recebe os arquivos de `routing.paths` (ver
+    # collection_config.assign_collection); o JSONL de cada uma é a
+    # concatenação dos seus shards, na ordem dos arquivos.
+    members: Dict[str, List[str]] = {c.name: [] for c in collections}
+    skipped = 0
+    for rel in rels:
+        name = assign_collection(collections, rel)
+        if name is None:
+            skipped += 1
+        else:
+            members[name].append(rel)
 
-    print(f"Chunks escritos em {out_path}")
+    print(
+        f"{len(paths)} arquivos ({len(dirty)} reprocessados, "
+        f"{len(paths) - len(dirty)} reaproveitados)"
+    )
+    for name, files in members.items():
+        out_path = CHUNKS_DIR / f"{name}.jsonl"
+        tmp_path = out_path.with_name(out_path.name + ".tmp")
+        n_chunks = 0
+        with tmp_path.open("wb") as out_f:
+            for rel in files:
+                with shard_path(rel).open("rb") as shard_f:
+                    shutil.copyfileobj(shard_f, out_f)
+                n_chunks += index.files[rel]["chunks"]
+        os.replace(tmp_path, out_path)
+        print(f"  {name}: {n_chunks} chunks de {len(files)} arquivos em {out_path}")
+    if skipped:
+        print(f"  {skipped} arquivos fora de todas as coleções (nenhum routing.paths casou)")
 
 
 if __name__ == "__main__":
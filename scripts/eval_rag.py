@@ -1,13 +1,24 @@
+import argparse
+import hashlib
 import json
 import os
+import sys
+import threading
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import requests
 
 
 ROOT = Path(__file__).resolve().parents[1]
 QA_PATH = ROOT / "tests" / "rag" / "qa_dataset.jsonl"
+RESULTS_PATH = ROOT / "tests" / "rag" / "eval_results.jsonl"
+RETRIEVAL_RESULTS_PATH = ROOT / "tests" / "rag" / "retrieval_results.jsonl"
+CACHE_PATH = ROOT / "data" / "cache" / "eval_answers.sqlite"
+DEFAULT_KS = (1, 3, 5, 10)
 
 
 def load_qa_dataset(path: Path) -> List[Dict[str, Any]]:
@@ -25,23 +36,195 @@ def load_qa_dataset(path: Path) -> List[Dict[str, Any]]:
     return items
 
 
-def call_rag_api(base_url: str, question: str) -> Tuple[str, List[Dict[str, Any]]]:
-    url = base_url.rstrip("/") + "/query"
-    resp = requests.post(
-        url,
-        json={"query": question, "history": []},
-        timeout=120,
-    )
+def make_rag_session(in_process: bool) -> Any:
+    """Sessão HTTP para a RAG API.
+
+    Com `in_process`, o servidor (`server/app.py`) roda neste processo via
+    `TestClient`, sem uvicorn; o Qdrant segue `QDRANT_URL` (inclusive
+    `:memory:` ou caminho local) e o Ollama, `OLLAMA_BASE_URL`.
+    """
+    if not in_process:
+        return requests.Session()
+    sys.path.insert(0, str(ROOT))
+    from fastapi.testclient import TestClient
+
+    from server.app import app
+
+    return TestClient(app)
+
+
+def _post_rag(session: Any, base_url: str, endpoint: str, question: str) -> Dict[str, Any]:
+    url = base_url.rstrip("/") + endpoint
+    # O TestClient (servidor no processo) não aceita `timeout`.
+    kwargs = {"timeout": 120} if isinstance(session, requests.Session) else {}
+    resp = session.post(url, json={"query": question, "history": []}, **kwargs)
     if resp.status_code != 200:
         raise RuntimeError(f"Falha ao chamar RAG API ({resp.status_code}): {resp.text}")
+    return resp.json()
 
-    data = resp.json()
+
+def call_rag_api(session: Any, base_url: str, question: str) -> Tuple[str, List[Dict[str, Any]]]:
+    data = _post_rag(session, base_url, "/query", question)
     answer = data.get("answer", "")
     docs = data.get("documents", []) or []
     return answer, docs
 
 
+def call_retrieve_api(session: Any, base_url: str, question: str) -> List[Dict[str, Any]]:
+    """Documentos que `/query` usaria para `question`, sem gerar resposta."""
+    return _post_rag(session, base_url, "/retrieve", question).get("documents", []) or []
+
+
+# --- Retrieval ------------------------------------------------------------
+
+
+def doc_source(doc: Dict[str, Any]) -> str:
+    return (doc.get("metadata") or {}).get("source", "")
+
+
+def matches_expected(source: str, expected: List[str]) -> bool:
+    """`expected_sources` aceita o `metadata.source` exato ou um prefixo dele.
+
+    Ex.: `github:charmbracelet/lipgloss:/README.md` só casa com esse arquivo;
+    `github:charmbracelet/lipgloss:` casa com qualquer arquivo do repositório.
+    """
+    return any(source.startswith(e) for e in expected)
+
+
+def retrieval_metrics(
+    docs: List[Dict[str, Any]], expected: List[str], ks: Tuple[int, ...]
+) -> Dict[str, Any]:
+    """recall@k (fração das fontes esperadas presentes no top-k) e reciprocal rank.
+
+    Cada fonte esperada conta uma vez, no primeiro documento que casa com ela.
+    """
+    sources = [doc_source(d) for d in docs]
+    first_rank: Dict[str, int] = {}
+    for rank, source in enumerate(sources, start=1):
+        for e in expected:
+            if e not in first_rank and source.startswith(e):
+                first_rank[e] = rank
+    hits = [rank for rank, source in enumerate(sources, start=1) if matches_expected(source, expected)]
+    return {
+        "recall": {
+            str(k): sum(1 for r in first_rank.values() if r <= k) / len(expected) for k in ks
+        },
+        "rr": 1.0 / hits[0] if hits else 0.0,
+        "first_hit": hits[0] if hits else None,
+        "sources": sources,
+    }
+
+
+def evaluate_retrieval(args: argparse.Namespace, rag_base_url: str, qa_items: List[Dict[str, Any]]) -> None:
+    """`--retrieval-only`: recall@k e MRR das `expected_sources`, sem LLM."""
+    ks = tuple(int(k) for k in args.k.split(",") if k.strip())
+    labeled = [(i, item) for i, item in enumerate(qa_items) if item.get("expected_sources")]
+    skipped = len(qa_items) - len(labeled)
+    if skipped:
+        print(f"{skipped} questão(ões) sem `expected_sources` ignoradas.")
+    if not labeled:
+        raise SystemExit("Nenhuma questão do dataset tem `expected_sources`.")
+
+    def run(item: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float]:
+        started = time.perf_counter()
+        docs = call_retrieve_api(session, rag_base_url, item["question"])
+        return docs, (time.perf_counter() - started) * 1000.0
+
+    results: List[Dict[str, Any]] = []
+    with make_rag_session(args.in_process) as session, \
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {pool.submit(run, item): (i, item) for i, item in labeled}
+        for future in as_completed(futures):
+            index, item = futures[future]
+            docs, ms = future.result()
+            metrics = retrieval_metrics(docs, item["expected_sources"], ks)
+            results.append({
+                "index": index,
+                "question": item["question"],
+                "expected_sources": item["expected_sources"],
+                **metrics,
+                "latency_ms": round(ms, 1),
+            })
+    results.sort(key=lambda r: r["index"])
+
+    for r in results:
+        recall = " ".join(f"R@{k}={r['recall'][k]:.2f}" for k in r["recall"])
+        print(f"[Q{r['index'] + 1}] {recall} RR={r['rr']:.2f} ({r['latency_ms']:.0f} ms) - {r['question']}")
+
+    n = len(results)
+    print("\n========================================")
+    print(f"Questões avaliadas: {n}")
+    for k in ks:
+        print(f"Recall@{k}: {sum(r['recall'][str(k)] for r in results) / n:.3f}")
+    print(f"MRR: {sum(r['rr'] for r in results) / n:.3f}")
+    latencies = [r["latency_ms"] for r in results]
+    print(f"Latência: p50 {_percentile(latencies, 0.5):.0f} ms, p95 {_percentile(latencies, 0.95):.0f} ms")
+
+    out_path = args.output or RETRIEVAL_RESULTS_PATH
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    print(f"Resultados detalhados salvos em {out_path}")
+
+
+# --- Cache de respostas/vereditos ------------------------------------------
+
+
+class EvalCache:
+    """Cache SQLite de (pergunta, conjunto de IDs do contexto) -> resposta e veredito.
+
+    Numa varredura de configurações a maioria das perguntas recupera os mesmos
+    documentos; para elas, a resposta e o veredito anteriores continuam
+    válidos e só `/retrieve` é chamado. A chave inclui também a resposta de
+    referência e os modelos (LLM e juiz), então mudar qualquer um deles
+    invalida as entradas. Mudanças no prompt do servidor não entram na chave:
+    use `--no-cache` nesse caso.
+    """
+
+    def __init__(self, path: Path, models: str) -> None:
+        self.path = path
+        self.models = models
+        self.hits = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key BLOB PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+
+    def key(self, item: Dict[str, Any], doc_ids: List[Any]) -> bytes:
+        h = hashlib.sha256()
+        for part in (self.models, item["question"], item["answer"], *sorted(map(str, doc_ids))):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.digest()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key: bytes, result: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, result, created) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
 def call_llm_judge(
+    session: requests.Session,
     base_url: str,
     model: str,
     question: str,
@@ -74,9 +257,11 @@ def call_llm_judge(
             {"role": "user", "content": user_content},
         ],
         "stream": False,
+        # Modo JSON do Ollama: a saída é sempre um objeto JSON válido.
+        "format": "json",
     }
 
-    resp = requests.post(url, json=payload, timeout=180)
+    resp = session.post(url, json=payload, timeout=180)
     if resp.status_code != 200:
         raise RuntimeError(
             f"Falha ao chamar LLM judge via Ollama (status {resp.status_code}): {resp.text}"
@@ -96,67 +281,239 @@ def call_llm_judge(
         return {"verdict": "incorrect", "reason": "Falha ao interpretar a saída do juiz."}
 
 
+class ResultsWriter:
+    """`eval_results.jsonl` gravado à medida que cada questão termina.
+
+    Uma linha por questão julgada, em ordem de conclusão (o campo `index`
+    aponta a posição no dataset). Com `resume`, as questões já presentes no
+    arquivo são puladas e as novas são acrescentadas no final.
+    """
+
+    def __init__(self, path: Path, resume: bool) -> None:
+        self.path = path
+        self.results: List[Dict[str, Any]] = self._load() if resume else []
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Regrava só as linhas válidas: uma linha cortada por um crash no meio
+        # da escrita não pode ficar colada na próxima.
+        with self.path.open("w", encoding="utf-8") as f:
+            for r in self.results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def _load(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        results: List[Dict[str, Any]] = []
+        with self.path.open("r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return results
+
+    def completed(self) -> Set[str]:
+        return {r["question"] for r in self.results}
+
+    def append(self, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self.results.append(result)
+            self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Avalia o RAG com o dataset de Q&A.")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Roda o servidor neste processo em vez de chamar RAG_BASE_URL.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=2,
+        help="Chamadas simultâneas à RAG API (default: 2).",
+    )
+    parser.add_argument(
+        "--judge-concurrency",
+        type=int,
+        default=2,
+        help="Chamadas simultâneas ao LLM juiz (default: 2).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continua a partir de --output, pulando as questões já julgadas.",
+    )
+    parser.add_argument(
+        "--retrieval-only",
+        action="store_true",
+        help="Mede só recall@k/MRR das `expected_sources` via /retrieve, sem LLM nem juiz.",
+    )
+    parser.add_argument(
+        "--k",
+        default=",".join(map(str, DEFAULT_KS)),
+        help="Valores de k do recall@k, separados por vírgula (default: 1,3,5,10).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignora o cache de respostas/vereditos (data/cache/eval_answers.sqlite).",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Arquivo de resultados (default: tests/rag/eval_results.jsonl ou "
+        "retrieval_results.jsonl com --retrieval-only).",
+    )
+    return parser.parse_args()
+
+
 def evaluate() -> None:
-    rag_base_url = os.getenv("RAG_BASE_URL", "http://127.0.0.1:8001")
+    args = parse_args()
+    rag_base_url = "" if args.in_process else os.getenv("RAG_BASE_URL", "http://127.0.0.1:8001")
     ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     judge_model = os.getenv("OLLAMA_JUDGE_MODEL", os.getenv("OLLAMA_CHAT_MODEL", "phi3:medium"))
 
-    print(f"RAG_BASE_URL: {rag_base_url}")
+    print(f"RAG_BASE_URL: {rag_base_url or '(servidor no processo)'}")
     print(f"OLLAMA_BASE_URL (judge): {ollama_base_url}")
     print(f"Modelo do juiz: {judge_model}")
 
     qa_items = load_qa_dataset(QA_PATH)
     print(f"Carregadas {len(qa_items)} questões do dataset.")
 
-    total = 0
-    correct = 0
-    results: List[Dict[str, Any]] = []
-
-    for item in qa_items:
-        total += 1
-        question = item["question"]
-        reference_answer = item["answer"]
+    if args.retrieval_only:
+        evaluate_retrieval(args, rag_base_url, qa_items)
+        return
 
-        print("\n----------------------------------------")
-        print(f"[Q{total}] {question}")
+    writer = ResultsWriter(args.output or RESULTS_PATH, args.resume)
+    done = writer.completed()
+    pending = [(i, item) for i, item in enumerate(qa_items) if item["question"] not in done]
+    if done:
+        print(f"Retomando: {len(qa_items) - len(pending)} já avaliadas, {len(pending)} pendentes.")
 
-        model_answer, docs = call_rag_api(rag_base_url, question)
+    cache = None if args.no_cache else EvalCache(
+        CACHE_PATH, f"{os.getenv('OLLAMA_CHAT_MODEL', '')}|{judge_model}"
+    )
+    failures: List[str] = []
+    print_lock = threading.Lock()
+    judge_session = requests.Session()
+
+    def record(index: int, item: Dict[str, Any], result: Dict[str, Any], cached: bool) -> None:
+        writer.append({"index": index, "question": item["question"], **result, "cached": cached})
+        verdict = result["judge_verdict"]
+        timing = (
+            f"em cache, retrieve {result['rag_latency_ms'] / 1000:.1f}s"
+            if cached
+            else f"rag {result['rag_latency_ms'] / 1000:.1f}s, juiz {result['judge_latency_ms'] / 1000:.1f}s"
+        )
+        with print_lock:
+            print(f"[Q{index + 1}] {verdict.get('verdict')} ({timing}) - {item['question']}")
+
+    def ask(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Resposta da RAG API ou, se o contexto não mudou, o resultado em cache."""
+        started = time.perf_counter()
+        if cache is not None:
+            docs = call_retrieve_api(session, rag_base_url, item["question"])
+            hit = cache.get(cache.key(item, [d.get("id") for d in docs]))
+            if hit is not None:
+                hit["rag_latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+                hit["judge_latency_ms"] = 0.0
+                return {"cached": hit}
+            started = time.perf_counter()
+        answer, docs = call_rag_api(session, rag_base_url, item["question"])
+        return {"answer": answer, "docs": docs, "rag_ms": (time.perf_counter() - started) * 1000.0}
+
+    def judge(index: int, item: Dict[str, Any], rag: Dict[str, Any]) -> None:
+        started = time.perf_counter()
         verdict = call_llm_judge(
+            session=judge_session,
             base_url=ollama_base_url,
             model=judge_model,
-            question=question,
-            reference_answer=reference_answer,
-            model_answer=model_answer,
-        )
-
-        is_correct = verdict.get("verdict") == "correct"
-        if is_correct:
-            correct += 1
-
-        results.append(
-            {
-                "question": question,
-                "reference_answer": reference_answer,
-                "model_answer": model_answer,
-                "judge_verdict": verdict,
-                "documents": docs,
-            }
+            question=item["question"],
+            reference_answer=item["answer"],
+            model_answer=rag["answer"],
         )
-
-        print(f"Veredito: {verdict.get('verdict')} - {verdict.get('reason')}")
-
+        judge_ms = (time.perf_counter() - started) * 1000.0
+        result = {
+            "reference_answer": item["answer"],
+            "model_answer": rag["answer"],
+            "judge_verdict": verdict,
+            "documents": rag["docs"],
+            "rag_latency_ms": round(rag["rag_ms"], 1),
+            "judge_latency_ms": round(judge_ms, 1),
+        }
+        if cache is not None:
+            cache.put(cache.key(item, [d.get("id") for d in rag["docs"]]), result)
+        record(index, item, result, cached=False)
+
+    # Pipeline: cada resposta da RAG API vai para o pool do juiz assim que
+    # chega, enquanto as próximas perguntas já estão sendo respondidas.
+    # TestClient precisa do `with` para manter um único event loop entre requisições.
+    with make_rag_session(args.in_process) as session, \
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as rag_pool, \
+            ThreadPoolExecutor(max_workers=max(1, args.judge_concurrency)) as judge_pool:
+        asked: Dict[Future, Tuple[int, Dict[str, Any]]] = {
+            rag_pool.submit(ask, item): (i, item) for i, item in pending
+        }
+        judged: Dict[Future, Tuple[int, Dict[str, Any]]] = {}
+        for future in as_completed(asked):
+            index, item = asked[future]
+            try:
+                rag = future.result()
+            except (RuntimeError, requests.RequestException) as exc:
+                print(f"[Q{index + 1}] ERRO na RAG API: {exc}")
+                failures.append(item["question"])
+                continue
+            if "cached" in rag:
+                record(index, item, rag["cached"], cached=True)
+                continue
+            judged[judge_pool.submit(judge, index, item, rag)] = (index, item)
+        for future in as_completed(judged):
+            index, item = judged[future]
+            try:
+                future.result()
+            except (RuntimeError, requests.RequestException) as exc:
+                print(f"[Q{index + 1}] ERRO no juiz: {exc}")
+                failures.append(item["question"])
+    judge_session.close()
+    writer.close()
+    if cache is not None:
+        cache.close()
+
+    results = writer.results
+    total = len(results)
+    correct = sum(1 for r in results if (r.get("judge_verdict") or {}).get("verdict") == "correct")
     accuracy = correct / total if total else 0.0
     print("\n========================================")
     print(f"Total de questões: {total}")
     print(f"Corretas segundo o juiz: {correct}")
     print(f"Acurácia aproximada: {accuracy:.2%}")
+    if cache is not None and cache.hits:
+        print(f"Reaproveitadas do cache (mesmo contexto): {cache.hits}")
+    rag_ms = [r["rag_latency_ms"] for r in results if "rag_latency_ms" in r]
+    if rag_ms:
+        print(
+            f"Latência RAG: p50 {_percentile(rag_ms, 0.5) / 1000:.2f}s, "
+            f"p95 {_percentile(rag_ms, 0.95) / 1000:.2f}s"
+        )
+    print(f"Resultados detalhados salvos em {writer.path}")
 
-    out_path = ROOT / "tests" / "rag" / "eval_results.jsonl"
-    with out_path.open("w", encoding="utf-8") as f:
-        for r in results:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-    print(f"Resultados detalhados salvos em {out_path}")
+    if failures:
+        raise SystemExit(
+            f"{len(failures)} questão(ões) falharam; rode de novo com --resume para tentar só elas."
+        )
 
 
 if __name__ == "__main__":
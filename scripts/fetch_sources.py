@@ -1,13 +1,29 @@
+import argparse
+import hashlib
+import json
 import os
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 
+import httpx
 import yaml
 
 
 ROOT = Path(__file__).resolve().parents[1]
 CONFIG_PATH = ROOT / "config" / "sources.yaml"
 RAW_DIR = ROOT / "data" / "raw"
+WEB_DIR = RAW_DIR / "web"
+# Revisões de cada repositório antes/depois do último fetch e validadores HTTP
+# (ETag/Last-Modified) dos manual_docs; lido pelo build_chunks.
+FETCH_MANIFEST_PATH = RAW_DIR / "fetch_manifest.json"
+
+REPO_GROUPS = ("charmbracelet_official", "derived_projects", "go_libraries")
 
 
 def load_sources():
@@ -19,46 +35,278 @@ def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def clone_or_update_repo(owner_repo: str) -> None:
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+@dataclass
+class FetchConfig:
+    workers: int = 4
+    # 0 = histórico completo
+    depth: int = 1
+    # ex.: "blob:none" (clone parcial: blobs baixados só no checkout)
+    filter: Optional[str] = "blob:none"
+    # padrões de sparse checkout (sintaxe .gitignore); vazio = checkout completo
+    sparse: List[str] = field(default_factory=list)
+    timeout: float = 30.0
+
+    @classmethod
+    def from_sources(cls, data: Dict[str, Any]) -> "FetchConfig":
+        section = data.get("fetch") or {}
+        default = cls()
+        return cls(
+            workers=int(section.get("workers", default.workers)),
+            depth=int(section.get("depth", default.depth)),
+            filter=section.get("filter", default.filter) or None,
+            sparse=list(section.get("sparse") or []),
+            timeout=float(section.get("timeout", default.timeout)),
+        )
+
+
+class FetchManifest:
+    """`data/raw/fetch_manifest.json`, atualizado de várias threads."""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.data = data
+        self.data.setdefault("repos", {})
+        self.data.setdefault("docs", {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls) -> "FetchManifest":
+        if not FETCH_MANIFEST_PATH.exists():
+            return cls({})
+        with FETCH_MANIFEST_PATH.open("r", encoding="utf-8") as f:
+            return cls(json.load(f) or {})
+
+    def get(self, section: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.data[section].get(key) or {})
+
+    def put(self, section: str, key: str, entry: Dict[str, Any]) -> None:
+        # Salva a cada entrada: uma falha no meio não perde o que já foi registrado.
+        with self._lock:
+            self.data[section][key] = entry
+            tmp = FETCH_MANIFEST_PATH.with_name(FETCH_MANIFEST_PATH.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2, sort_keys=True)
+            os.replace(tmp, FETCH_MANIFEST_PATH)
+
+
+# --- Repositórios git ----------------------------------------------------
+
+
+def _git(*args: str) -> None:
+    subprocess.run(["git", *args], check=True, capture_output=True, text=True)
+
+
+def head_sha(repo_dir: Path) -> Optional[str]:
+    result = subprocess.run(
+        ["git", "-C", str(repo_dir), "rev-parse", "HEAD"],
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def repo_url(entry: Dict[str, Any]) -> str:
+    # `url` permite apontar para um mirror ou um repo local (file://) em testes.
+    return entry.get("url") or f"https://github.com/{entry['repo']}.git"
+
+
+def _fetch_args(cfg: FetchConfig) -> List[str]:
+    args: List[str] = []
+    if cfg.depth > 0:
+        args.append(f"--depth={cfg.depth}")
+    if cfg.filter:
+        args.append(f"--filter={cfg.filter}")
+    return args
+
+
+def clone_or_update_repo(entry: Dict[str, Any], cfg: FetchConfig) -> Dict[str, Any]:
     """Clona ou atualiza um repositório GitHub em data/raw/github/owner/repo.
 
-    Espera uma string no formato "owner/repo".
+    `entry["repo"]` está no formato "owner/repo". O clone é raso (`depth`),
+    parcial (`filter`) e, se `sparse` tiver padrões, só faz checkout desses
+    caminhos. Na atualização, busca apenas a ponta do branch remoto e move o
+    checkout para ela (o diretório é um espelho, sem alterações locais).
+
+    Retorna a entrada do manifesto com o commit anterior (`before`, None num
+    clone novo) e o atual (`after`).
     """
+    owner_repo = entry["repo"]
     owner, repo = owner_repo.split("/", 1)
     target_dir = RAW_DIR / "github" / owner / repo
     ensure_dir(target_dir.parent)
+    url = repo_url(entry)
 
+    before = head_sha(target_dir) if target_dir.exists() else None
     if not target_dir.exists():
-        subprocess.run([
-            "git",
-            "clone",
-            f"https://github.com/{owner_repo}.git",
-            str(target_dir),
-        ], check=True)
+        _git("clone", "--no-checkout", *_fetch_args(cfg), url, str(target_dir))
+        if cfg.sparse:
+            _git("-C", str(target_dir), "sparse-checkout", "set", "--no-cone", *cfg.sparse)
+        _git("-C", str(target_dir), "checkout")
     else:
-        subprocess.run([
-            "git",
-            "-C",
-            str(target_dir),
-            "pull",
-            "--ff-only",
-        ], check=True)
+        _git("-C", str(target_dir), "fetch", *_fetch_args(cfg), "origin")
+        _git("-C", str(target_dir), "reset", "--hard", "FETCH_HEAD")
+
+    return {
+        "repo": owner_repo,
+        "url": url,
+        "before": before,
+        "after": head_sha(target_dir),
+        "fetched_at": _now(),
+    }
+
+
+# --- manual_docs ---------------------------------------------------------
+
+
+def doc_download_url(url: str) -> str:
+    """Troca links `github.com/.../blob/...` pelo conteúdo bruto do arquivo."""
+    parts = urlsplit(url)
+    segments = parts.path.strip("/").split("/")
+    if parts.netloc == "github.com" and len(segments) > 4 and segments[2] == "blob":
+        owner, repo, _, ref, *path = segments
+        return f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/" + "/".join(path)
+    return url
+
+
+def doc_target_path(url: str) -> Path:
+    """Caminho local em data/raw/web/<host>/<caminho da URL>."""
+    parts = urlsplit(url)
+    path = parts.path.strip("/") or "index.html"
+    if parts.path.endswith("/"):
+        path += "/index.html"
+    if parts.query:
+        stem, dot, ext = path.rpartition(".")
+        digest = hashlib.sha1(parts.query.encode("utf-8")).hexdigest()[:8]
+        path = f"{stem}-{digest}.{ext}" if dot else f"{path}-{digest}"
+    return WEB_DIR / (parts.netloc or "local").replace(":", "_") / path
+
+
+def fetch_manual_doc(
+    entry: Dict[str, Any],
+    client: httpx.Client,
+    previous: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Baixa um documento com GET condicional (If-None-Match/If-Modified-Since).
+
+    Com 304, ou se o conteúdo não mudou, o arquivo local não é reescrito (o
+    mtime fica igual e o build_chunks não o reprocessa).
+    """
+    url = entry["url"]
+    target = doc_target_path(url)
+    headers: Dict[str, str] = {}
+    if target.exists():
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    resp = client.get(doc_download_url(url), headers=headers)
+    result = {
+        **previous,
+        "url": url,
+        "path": target.relative_to(RAW_DIR).as_posix(),
+        "type": entry.get("type"),
+        "fetched_at": _now(),
+    }
+    if resp.status_code == 304:
+        return {**result, "status": "unchanged"}
+    resp.raise_for_status()
+
+    digest = hashlib.sha256(resp.content).hexdigest()
+    status = "unchanged" if target.exists() and digest == previous.get("sha256") else "updated"
+    if status == "updated":
+        ensure_dir(target.parent)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(resp.content)
+        os.replace(tmp, target)
+    return {
+        **result,
+        "status": status,
+        "sha256": digest,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    }
+
+
+# --- Execução ------------------------------------------------------------
+
+
+Job = Tuple[str, str, Callable[[], Dict[str, Any]]]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Baixa as fontes de config/sources.yaml.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Fetches em paralelo (default: `fetch.workers` de config/sources.yaml).",
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
+    args = parse_args()
     ensure_dir(RAW_DIR)
 
     data = load_sources() or {}
+    cfg = FetchConfig.from_sources(data)
+    if args.workers is not None:
+        cfg.workers = args.workers
+    manifest = FetchManifest.load()
+    http = httpx.Client(timeout=cfg.timeout, follow_redirects=True)
 
-    for group_key in ("charmbracelet_official", "derived_projects", "go_libraries"):
+    jobs: List[Job] = []
+    for group_key in REPO_GROUPS:
         for entry in data.get(group_key, []) or []:
-            repo = entry.get("repo")
-            if not repo:
+            if not entry.get("repo"):
+                continue
+            jobs.append((
+                "repos",
+                f"github/{entry['repo']}",
+                lambda entry=entry: clone_or_update_repo(entry, cfg),
+            ))
+    for entry in data.get("manual_docs", []) or []:
+        if not entry.get("url"):
+            continue
+        jobs.append((
+            "docs",
+            entry["url"],
+            lambda entry=entry: fetch_manual_doc(
+                entry, http, manifest.get("docs", entry["url"])
+            ),
+        ))
+
+    failures: List[str] = []
+    with ThreadPoolExecutor(max_workers=max(1, cfg.workers)) as pool:
+        futures = {pool.submit(job): (section, key) for section, key, job in jobs}
+        for future in as_completed(futures):
+            section, key = futures[future]
+            try:
+                result = future.result()
+            except (subprocess.CalledProcessError, httpx.HTTPError) as exc:
+                detail = getattr(exc, "stderr", None) or str(exc)
+                print(f"[fetch] ERRO {key}: {detail.strip()}")
+                failures.append(key)
                 continue
-            print(f"[fetch] {group_key}: {repo}")
-            clone_or_update_repo(repo)
+            manifest.put(section, key, result)
+            if section == "repos":
+                change = (
+                    "sem mudanças"
+                    if result["before"] == result["after"]
+                    else f"{result['before'] or '(novo)'} -> {result['after']}"
+                )
+            else:
+                change = result["status"]
+            print(f"[fetch] {key}: {change}")
+    http.close()
 
-    # TODO: baixar manual_docs (HTML/markdown) e salvar em data/raw/web
+    if failures:
+        raise SystemExit(f"{len(failures)} fonte(s) falharam: {', '.join(failures)}")
 
 
 if __name__ == "__main__":
@@ -1,135 +1,478 @@
+import argparse
 import json
-import os
+import queue
+import sys
+import threading
+import time
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
-import requests
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as rest
 
 
 ROOT = Path(__file__).resolve().parents[1]
+# Permite importar o pacote server/ (engine de embeddings) ao rodar como script.
+sys.path.insert(0, str(ROOT))
+
+from server.chunk_store import build_chunk_store, chunk_store_dir  # noqa: E402
+from server.collection_config import (  # noqa: E402
+    DISTANCES,
+    CollectionConfig,
+    load_collection_configs,
+)
+from server.filters import FILTER_FIELDS  # noqa: E402
+from server.index_manifest import (  # noqa: E402
+    IndexManifest,
+    payload_digest,
+    point_id,
+)
+from server.models import OllamaEmbeddingEngine  # noqa: E402
+from server.qdrant_store import MEMORY, is_local, make_qdrant_client, qdrant_url  # noqa: E402
+from server.text_index import build_text_index, text_index_dir  # noqa: E402
+from server.vector_index import build_vector_index, vector_index_dir  # noqa: E402
+
 CHUNKS_DIR = ROOT / "data" / "chunks"
-CONFIG_DIR = ROOT / "config"
 
 
 def get_qdrant_client() -> QdrantClient:
-    url = os.getenv("QDRANT_URL", "http://localhost:6333")
-    api_key = os.getenv("QDRANT_API_KEY") or None
-    return QdrantClient(url=url, api_key=api_key)
+    # QDRANT_URL: servidor, `:memory:` ou caminho local (ver server/qdrant_store.py).
+    return make_qdrant_client()
 
 
-def load_collections_config():
-    import yaml
+def create_collection(client: QdrantClient, col: CollectionConfig) -> None:
+    client.recreate_collection(
+        collection_name=col.name,
+        vectors_config=col.vectors_config(),
+        hnsw_config=col.hnsw_config(),
+        quantization_config=col.quantization_config(),
+    )
+
+
+def _dump(model: Any) -> Any:
+    return model.model_dump(exclude_none=True) if model is not None else None
+
+
+def sync_collection_config(client: QdrantClient, col: CollectionConfig) -> bool:
+    """Aplica `on_disk`, HNSW e quantização de collections.yaml a uma coleção
+    existente, sem reindexar (o Qdrant reconstrói índices em segundo plano).
+
+    Retorna False se dimensão ou distância mudaram: isso exige recriar a
+    coleção. O modo local do qdrant-client faz busca exata e ignora esses
+    parâmetros, então nada é aplicado nele.
+    """
+    info = client.get_collection(col.name)
+    current = info.config.params.vectors
+    if current.size != col.vector_size or current.distance != DISTANCES[col.distance]:
+        return False
+    if is_local():
+        return True
+
+    changes: Dict[str, Any] = {}
+    if bool(current.on_disk) != col.on_disk:
+        changes["vectors_config"] = {"": rest.VectorParamsDiff(on_disk=col.on_disk)}
+    wanted_hnsw = col.hnsw_config()
+    if wanted_hnsw is not None and any(
+        value is not None and getattr(info.config.hnsw_config, key) != value
+        for key, value in wanted_hnsw.model_dump().items()
+    ):
+        changes["hnsw_config"] = wanted_hnsw
+    wanted_quant = col.quantization_config()
+    if _dump(wanted_quant) != _dump(info.config.quantization_config):
+        changes["quantization_config"] = wanted_quant or rest.Disabled.DISABLED
+    if changes:
+        print(f"  Configuração da coleção atualizada: {', '.join(changes)}")
+        client.update_collection(collection_name=col.name, **changes)
+    return True
 
-    path = CONFIG_DIR / "collections.yaml"
-    with path.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
 
-def load_embedding_config():
-    import yaml
+def ensure_payload_indexes(client: QdrantClient, col: CollectionConfig) -> List[str]:
+    """Cria os índices `keyword` de `payload_indexes` que ainda não existem.
 
-    path = CONFIG_DIR / "embedding.yaml"
+    Com os campos indexados, um filtro (`library`, `type`...) restringe os
+    candidatos durante a busca HNSW em vez de varrer a coleção inteira. É
+    feito antes do upload, como recomenda o Qdrant. No modo local não há
+    índices de payload (os filtros funcionam, por varredura).
+    """
+    if is_local():
+        return []
+    existing = client.get_collection(col.name).payload_schema or {}
+    created = [f for f in col.payload_indexes if f not in existing]
+    for field_name in created:
+        client.create_payload_index(
+            collection_name=col.name,
+            field_name=field_name,
+            field_schema=rest.PayloadSchemaType.KEYWORD,
+        )
+    return created
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """Lê o JSONL de chunks sob demanda, um registro por vez."""
     with path.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line)
+
+
+def iter_batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_payload(rec: Dict[str, Any], mode: str = "full") -> Dict[str, Any]:
+    """Payload do ponto: o chunk inteiro (`full`) ou só os campos de filtro
+    (`slim`; texto e metadados ficam no chunk store, ver `main`)."""
+    if mode == "slim":
+        meta = rec["metadata"]
+        return {f: meta[f] for f in FILTER_FIELDS if meta.get(f) is not None}
+    payload = dict(rec["metadata"])
+    payload["text"] = rec["text"]
+    return payload
+
+
+# (point_id, digest do payload, texto, payload)
+PendingPoint = Tuple[str, str, str, Dict[str, Any]]
+
+
+def plan_points(
+    records: Iterable[Dict[str, Any]],
+    manifest: IndexManifest,
+    seen: Dict[str, str],
+    payload_updates: List[Tuple[str, Dict[str, Any]]],
+    payload_mode: str = "full",
+) -> Iterator[PendingPoint]:
+    """Compara os chunks com o manifesto e só produz os que precisam de embedding.
+
+    - ID novo (texto novo ou alterado): produzido para embedding + upsert.
+    - ID conhecido com payload diferente: vai para `payload_updates` (sem
+      reembedar).
+    - ID conhecido e idêntico: ignorado.
+
+    Trocar `payload` (`full`/`slim`) em collections.yaml muda o digest de
+    todos os pontos: os payloads são regravados, sem reembedar.
+
+    Todo ID encontrado é registrado em `seen`; o que estiver no manifesto e não
+    aparecer em `seen` ao final foi removido do corpus.
+    """
+    for rec in records:
+        source = (rec.get("metadata") or {}).get("source") or ""
+        pid = point_id(source, rec["text"])
+        if pid in seen:
+            # Chunk duplicado (mesmo texto no mesmo arquivo): um ponto basta.
+            continue
+
+        payload = build_payload(rec, payload_mode)
+        digest = payload_digest(payload)
+        seen[pid] = digest
+
+        known = manifest.points.get(pid)
+        if known is None:
+            yield pid, digest, rec["text"], payload
+        elif known != digest:
+            payload_updates.append((pid, payload))
+
+
+class ProgressReporter:
+    """Imprime progresso e throughput (pontos/s) da indexação."""
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.started = time.perf_counter()
+        self.points = 0
+
+    def update(self, n: int) -> None:
+        self.points += n
+        elapsed = time.perf_counter() - self.started
+        rate = self.points / elapsed if elapsed > 0 else 0.0
+        print(f"  [{self.label}] {self.points} pontos indexados ({rate:.1f} pontos/s)", flush=True)
+
+
+_DONE = object()
+
+
+def embed_batches(
+    batches: Iterable[List[PendingPoint]],
+    engine: OllamaEmbeddingEngine,
+    out: "queue.Queue[Any]",
+) -> None:
+    """Produtor: gera embeddings lote a lote e entrega em `out`.
+
+    `out` é uma fila limitada; quando o upsert fica para trás, `put` bloqueia e
+    o produtor para de ler o JSONL, mantendo a memória limitada a
+    `max_in_flight` lotes. Exceções são repassadas ao consumidor pela fila.
+    """
+    try:
+        for batch in batches:
+            vectors = engine.embed([p[2] for p in batch], prefix="search_document: ")
+            out.put((batch, vectors))
+    except BaseException as exc:  # repassa para a thread principal
+        out.put(exc)
+    finally:
+        out.put(_DONE)
 
 
-def embed(texts, expected_dim=None):
-    """Stub para embeddings.
+def index_collection(
+    client: QdrantClient,
+    name: str,
+    pending_points: Iterable[PendingPoint],
+    engine: OllamaEmbeddingEngine,
+    manifest: IndexManifest,
+    batch_size: int,
+    max_in_flight: int,
+) -> int:
+    """Indexa pontos em streaming: ler → embeddings → upsert, por lotes.
 
-    Em uma próxima etapa vamos conectar com o Ollama ou outro provider.
-    Por enquanto, levanta um erro claro para evitar uso acidental.
+    O embedding do próximo lote roda numa thread enquanto o lote atual é
+    enviado ao Qdrant. Cada lote é confirmado (`wait=True`) e registrado no
+    `manifest` antes do próximo, então uma falha no meio preserva tudo o que
+    já foi enviado.
     """
-    cfg = load_embedding_config()
-    provider = cfg.get("provider", "ollama")
-    if provider != "ollama":
-        raise RuntimeError(f"Provider de embeddings não suportado: {provider!r}")
-
-    model = cfg.get("model", "nomic-embed-text")
-    base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
-    url = f"{base_url}/api/embeddings"
-
-    vectors = []
-    for idx, text in enumerate(texts):
-        resp = requests.post(
-            url,
-            json={"model": model, "prompt": text},
-            timeout=60,
+
+    pending: "queue.Queue[Any]" = queue.Queue(maxsize=max_in_flight)
+    producer = threading.Thread(
+        target=embed_batches,
+        args=(iter_batches(pending_points, batch_size), engine, pending),
+        daemon=True,
+    )
+    producer.start()
+
+    progress = ProgressReporter(name)
+    while True:
+        item = pending.get()
+        if item is _DONE:
+            break
+        if isinstance(item, BaseException):
+            raise item
+
+        batch, vectors = item
+        points = [
+            rest.PointStruct(id=pid, vector=vec, payload=payload)
+            for (pid, _, _, payload), vec in zip(batch, vectors)
+        ]
+
+        client.upsert(collection_name=name, points=points, wait=True)
+        for pid, digest, _, _ in batch:
+            manifest.points[pid] = digest
+        progress.update(len(points))
+
+    producer.join()
+    return progress.points
+
+
+def apply_payload_updates(
+    client: QdrantClient,
+    name: str,
+    updates: List[Tuple[str, Dict[str, Any]]],
+    seen: Dict[str, str],
+    manifest: IndexManifest,
+) -> None:
+    for pid, payload in updates:
+        client.overwrite_payload(
+            collection_name=name,
+            payload=payload,
+            points=[pid],
+            wait=True,
         )
-        if resp.status_code != 200:
-            raise RuntimeError(
-                f"Falha ao obter embedding via Ollama (status {resp.status_code}) "
-                f"para item {idx}: {resp.text}"
-            )
-        data = resp.json()
-        vec = data.get("embedding")
-        if vec is None:
-            raise RuntimeError(
-                "Resposta de embeddings do Ollama não contém campo 'embedding'"
-            )
-        if expected_dim is not None and len(vec) != expected_dim:
-            raise RuntimeError(
-                f"Dimensão do embedding ({len(vec)}) diferente do esperado ({expected_dim})."
-            )
+        manifest.points[pid] = seen[pid]
+
+
+def delete_stale_points(
+    client: QdrantClient,
+    name: str,
+    seen: Dict[str, str],
+    manifest: IndexManifest,
+    batch_size: int,
+) -> int:
+    """Remove do Qdrant (e do manifesto) os pontos que sumiram do corpus."""
+    stale = [pid for pid in manifest.points if pid not in seen]
+    for batch in iter_batches(stale, batch_size):
+        client.delete(
+            collection_name=name,
+            points_selector=rest.PointIdsList(points=batch),
+            wait=True,
+        )
+        for pid in batch:
+            del manifest.points[pid]
+    return len(stale)
 
-        vectors.append(vec)
 
-    return vectors
+def iter_collection_points(
+    client: QdrantClient, name: str, batch_size: int
+) -> Iterator[Tuple[str, List[float], Dict[str, Any]]]:
+    """(point_id, vetor, payload) de todos os pontos da coleção, via `scroll`."""
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        for rec in records:
+            yield str(rec.id), rec.vector, rec.payload or {}
+        if offset is None:
+            break
+
+
+def iter_text_index_docs(path: Path) -> Iterator[Tuple[str, str]]:
+    """Pares (point_id, texto) para o índice BM25, sem duplicatas."""
+    seen = set()
+    for rec in iter_records(path):
+        source = (rec.get("metadata") or {}).get("source") or ""
+        pid = point_id(source, rec["text"])
+        if pid in seen:
+            continue
+        seen.add(pid)
+        yield pid, rec["text"]
+
+
+def _cache_summary(engine: OllamaEmbeddingEngine) -> str:
+    if engine.cache is None:
+        return ""
+    c = engine.cache.stats
+    return (
+        f"Cache de embeddings: {c.hits} hits, {c.misses} misses "
+        f"({c.hit_rate:.0%}), {c.evictions} despejos"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Indexa os chunks no Qdrant.")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Recria a coleção e reembeda tudo (default: incremental via manifesto).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Chunks por lote de embedding/upsert (default: batch_size * concurrency de embedding.yaml).",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=2,
+        help="Lotes com embeddings prontos aguardando upsert (limita a memória).",
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
-    cfg = load_collections_config()
-    collections = cfg.get("collections", [])
+    args = parse_args()
+
+    collections = load_collection_configs()
     if not collections:
         raise SystemExit("Nenhuma coleção configurada em config/collections.yaml")
 
     client = get_qdrant_client()
+    print(f"[index] Qdrant: {qdrant_url()}")
+    if qdrant_url() == MEMORY:
+        print("[index] Coleções em memória: descartadas ao final (útil para medir a indexação).")
 
     for col in collections:
-        name = col["name"]
-        vector_size = col["vector_size"]
+        name = col.name
+        vector_size = col.vector_size
 
         print(f"[index] Coleção: {name}")
 
-        client.recreate_collection(
-            collection_name=name,
-            vectors_config=rest.VectorParams(
-                size=vector_size,
-                distance=rest.Distance.COSINE,
-            ),
-        )
-
         chunks_path = CHUNKS_DIR / f"{name}.jsonl"
         if not chunks_path.exists():
             print(f"  Arquivo de chunks não encontrado: {chunks_path}")
             continue
 
-        records = []
-        with chunks_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                data = json.loads(line)
-                records.append(data)
-
-        texts = [f"search_document: {r['text']}" for r in records]
-        vectors = embed(texts, expected_dim=vector_size)
-
-        points = []
-        for idx, (rec, vec) in enumerate(zip(records, vectors)):
-            payload = dict(rec["metadata"])
-            payload["text"] = rec["text"]
-
-            points.append(
-                rest.PointStruct(
-                    id=idx,
-                    vector=vec,
-                    payload=payload,
-                )
+        if col.payload == "slim":
+            # Antes do upsert: um ponto slim só é útil com o texto já no store.
+            n_stored = build_chunk_store(iter_records(chunks_path), chunk_store_dir(name))
+            print(f"  Chunk store: {n_stored} chunks em {chunk_store_dir(name)}")
+
+        engine = OllamaEmbeddingEngine(expected_dim=vector_size)
+        batch_size = args.batch_size or engine.batch_size * engine.concurrency
+
+        manifest = IndexManifest.load(name)
+        rebuild = (
+            args.rebuild
+            or not client.collection_exists(name)
+            or not manifest.matches(engine.model, vector_size)
+            or not sync_collection_config(client, col)
+        )
+        if rebuild:
+            print(
+                f"  Modo: rebuild (coleção recriada; {col.distance}, on_disk={col.on_disk}, "
+                f"quantização {col.quantization})"
+            )
+            create_collection(client, col)
+            manifest = IndexManifest(collection=name, model=engine.model, vector_size=vector_size)
+        else:
+            print(f"  Modo: incremental ({len(manifest.points)} pontos no manifesto)")
+        created = ensure_payload_indexes(client, col)
+        if created:
+            print(f"  Índices de payload criados: {', '.join(created)}")
+
+        seen: Dict[str, str] = {}
+        payload_updates: List[Tuple[str, Dict[str, Any]]] = []
+        added = removed = 0
+        try:
+            added = index_collection(
+                client,
+                name,
+                plan_points(
+                    iter_records(chunks_path), manifest, seen, payload_updates, col.payload
+                ),
+                engine,
+                manifest,
+                batch_size=batch_size,
+                max_in_flight=max(1, args.max_in_flight),
             )
+            apply_payload_updates(client, name, payload_updates, seen, manifest)
+            removed = delete_stale_points(client, name, seen, manifest, batch_size)
+        finally:
+            cache_line = _cache_summary(engine)
+            engine.close()
+            if rebuild or added or payload_updates or removed:
+                manifest.bump_version()
+            manifest.save()
 
-        client.upsert(collection_name=name, points=points)
-        print(f"  Indexação concluída: {len(points)} pontos")
+        stats = engine.stats
+        print(
+            f"  Embeddings: {stats.texts} textos em {stats.requests} lotes "
+            f"({stats.texts_per_second:.1f} textos/s, {stats.retries} novas tentativas)"
+        )
+        if cache_line:
+            print(f"  {cache_line}")
+        unchanged = len(seen) - added - len(payload_updates)
+        print(
+            f"  Indexação concluída: {added} novos, {len(payload_updates)} payloads atualizados, "
+            f"{removed} removidos, {unchanged} inalterados (versão {manifest.version})"
+        )
+
+        n_docs = build_text_index(iter_text_index_docs(chunks_path), text_index_dir(name))
+        print(f"  Índice textual (BM25): {n_docs} documentos em {text_index_dir(name)}")
+
+        if col.backend == "numpy":
+            # Cópia da coleção já atualizada (inclui pontos de execuções
+            # incrementais anteriores, que não foram embedados agora).
+            n_vectors = build_vector_index(
+                iter_collection_points(client, name, batch_size),
+                vector_index_dir(name),
+                dim=vector_size,
+                dtype=col.numpy_dtype,
+                distance=col.distance,
+            )
+            print(
+                f"  Índice vetorial local ({col.numpy_dtype}): {n_vectors} vetores "
+                f"em {vector_index_dir(name)}"
+            )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+"""Cache de respostas do LLM para `/query`.
+
+Fica na frente de `_build_prompt` + geração: se a mesma pergunta (ou uma
+pergunta semanticamente equivalente) já foi respondida com o mesmo contexto,
+a resposta anterior é devolvida sem chamar o LLM.
+
+Uma entrada só é reaproveitada quando o *contexto* coincide:
+- mesmos IDs de documentos após o reranking (na mesma ordem);
+- mesma versão da coleção (ver `server/index_manifest.py`), de modo que uma
+  reindexação com alterações invalida tudo.
+
+Dentro de um mesmo contexto, a busca é:
+1. exata, pela pergunta normalizada (minúsculas, espaços e pontuação final);
+2. semântica (opcional), pelo cosseno entre o embedding da pergunta atual e
+   os das perguntas em cache, se acima de `semantic_threshold`.
+
+Parâmetros em config/retrieval.yaml, seção `answer_cache`.
+"""
+
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+ContextKey = Tuple[Tuple[str, ...], Optional[str]]
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _SPACES.sub(" ", query.strip().lower()).rstrip(" ?!.;:")
+
+
+def cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    if na == 0 or nb == 0:
+        return 0.0
+    return dot / (na * nb)
+
+
+@dataclass
+class _Entry:
+    query: str
+    vector: Optional[List[float]]
+    answer: str
+    created: float
+
+
+@dataclass
+class AnswerCacheStats:
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    expirations: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        max_entries: int = 1000,
+        semantic_threshold: Optional[float] = 0.95,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self.semantic_threshold = semantic_threshold
+        self.stats = AnswerCacheStats()
+        # (pergunta normalizada, contexto) -> entrada, em ordem LRU
+        self._entries: "OrderedDict[Tuple[str, ContextKey], _Entry]" = OrderedDict()
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> Optional["AnswerCache"]:
+        section = cfg.get("answer_cache") or {}
+        if not section.get("enabled", False):
+            return None
+        return cls(
+            ttl_seconds=float(section.get("ttl_seconds", 86400)),
+            max_entries=int(section.get("max_entries", 1000)),
+            semantic_threshold=section.get("semantic_threshold", 0.95),
+        )
+
+    @staticmethod
+    def context_key(doc_ids: Sequence[Any], collection_version: Optional[str]) -> ContextKey:
+        return tuple(str(d) for d in doc_ids), collection_version
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created > self.ttl_seconds
+
+    def lookup(
+        self,
+        query: str,
+        vector: Optional[List[float]],
+        doc_ids: Sequence[Any],
+        collection_version: Optional[str],
+    ) -> Optional[str]:
+        now = time.time()
+        ctx = self.context_key(doc_ids, collection_version)
+        key = (normalize_query(query), ctx)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._expired(entry, now):
+                del self._entries[key]
+                self.stats.expirations += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats.exact_hits += 1
+                return entry.answer
+
+        if self.semantic_threshold is not None and vector is not None:
+            best_key, best_sim = None, float(self.semantic_threshold)
+            for other_key, other in list(self._entries.items()):
+                if other_key[1] != ctx or other.vector is None:
+                    continue
+                if self._expired(other, now):
+                    del self._entries[other_key]
+                    self.stats.expirations += 1
+                    continue
+                sim = cosine(vector, other.vector)
+                if sim >= best_sim:
+                    best_key, best_sim = other_key, sim
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self.stats.semantic_hits += 1
+                return self._entries[best_key].answer
+
+        self.stats.misses += 1
+        return None
+
+    def store(
+        self,
+        query: str,
+        vector: Optional[List[float]],
+        doc_ids: Sequence[Any],
+        collection_version: Optional[str],
+        answer: str,
+    ) -> None:
+        ctx = self.context_key(doc_ids, collection_version)
+        key = (normalize_query(query), ctx)
+        self._entries[key] = _Entry(
+            query=key[0], vector=vector, answer=answer, created=time.time()
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic_threshold": self.semantic_threshold,
+            "exact_hits": self.stats.exact_hits,
+            "semantic_hits": self.stats.semantic_hits,
+            "misses": self.stats.misses,
+            "expirations": self.stats.expirations,
+            "evictions": self.stats.evictions,
+            "hit_rate": round(self.stats.hit_rate, 4),
+        }
@@ -1,16 +1,78 @@
-import os
-from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-from fastapi import FastAPI
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from qdrant_client import QdrantClient
-
-from .models import OllamaEmbeddingsClient, OllamaLLMClient
-from .rag_pipeline import rerank, retrieve, rewrite_query
-
 
-app = FastAPI(title="Shantilly RAG API")
+from .answer_cache import AnswerCache
+from .chunk_store import ChunkStore, ChunkStoreError
+from .collection_config import load_collection_configs
+from .context_builder import BuiltContext, ContextConfig, build_context, estimate_tokens
+from .filters import Filters, LibraryDetector, normalize_filters
+from .index_manifest import collection_version
+from .metrics import (
+    CONTENT_TYPE_LATEST,
+    REQUESTS_IN_FLIGHT,
+    observe_request,
+    observe_route,
+    observe_stage,
+    render,
+    track_llm_limiter,
+)
+from .models import AsyncOllamaEmbeddingsClient, AsyncOllamaLLMClient
+from .qdrant_store import make_async_qdrant_client
+from .rag_pipeline import (
+    RETRIEVAL_CFG,
+    available_docs,
+    embed_queries,
+    embed_query,
+    rerank,
+    merge_collections,
+    retrieval_section,
+    retrieve,
+    retrieve_batch,
+    rewrite_query,
+)
+from .rerankers import RerankStats, build_reranker
+from .query_rewriter import QueryRewriter
+from .routing import CollectionRouter, SearchTarget, UnknownCollectionError
+
+
+# Coleções de collections.yaml, com índice BM25 e parâmetros de busca de cada uma.
+router = CollectionRouter(load_collection_configs())
+
+# QDRANT_URL: servidor, `:memory:` ou caminho local (ver server/qdrant_store.py).
+qdrant_client = make_async_qdrant_client()
+embeddings_client = AsyncOllamaEmbeddingsClient()
+llm_client = AsyncOllamaLLMClient()
+answer_cache = AnswerCache.from_config(RETRIEVAL_CFG)
+reranker = build_reranker(retrieval_section("rerank"), limiter=llm_client.limiter)
+rerank_stats = RerankStats()
+context_config = ContextConfig.from_config(RETRIEVAL_CFG)
+library_detector = LibraryDetector.from_config(RETRIEVAL_CFG)
+query_rewriter = QueryRewriter.from_config(RETRIEVAL_CFG)
+BATCH_CFG = RETRIEVAL_CFG.get("batch") or {}
+track_llm_limiter(lambda: llm_client.limiter.in_flight, lambda: llm_client.limiter.queued)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    # Fecha os pools de conexão HTTP ao desligar o servidor.
+    await embeddings_client.aclose()
+    await llm_client.aclose()
+    await reranker.aclose()
+    if query_rewriter is not None:
+        await query_rewriter.aclose()
+    await qdrant_client.close()
+
+
+app = FastAPI(title="Shantilly RAG API", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -18,32 +80,23 @@ async def health():
     return {"status": "ok"}
 
 
-ROOT = Path(__file__).resolve().parents[1]
-CONFIG_DIR = ROOT / "config"
-
-
-def _load_collection_name() -> str:
-    import yaml
-
-    path = CONFIG_DIR / "collections.yaml"
-    with path.open("r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
-
-    collections = data.get("collections", [])
-    if not collections:
-        raise RuntimeError("Nenhuma coleção configurada em config/collections.yaml")
-
-    # Por enquanto usamos a primeira coleção como padrão.
-    return collections[0]["name"]
-
+@app.get("/stats")
+async def stats():
+    """Gauges de runtime (fila do LLM, throughput de embeddings, caches)."""
+    return {
+        "llm": llm_client.limiter.snapshot(),
+        "embeddings": embeddings_client.engine.snapshot(),
+        "answer_cache": answer_cache.snapshot() if answer_cache is not None else None,
+        "rerank": {"provider": reranker.name, **rerank_stats.snapshot()},
+        "rewrite": query_rewriter.snapshot() if query_rewriter is not None else None,
+        "collections": {"available": list(router.targets), "default": router.defaults},
+    }
 
-QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY") or None
-COLLECTION_NAME = _load_collection_name()
 
-qdrant_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-embeddings_client = OllamaEmbeddingsClient()
-llm_client = OllamaLLMClient()
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Histogramas por estágio e gauges no formato de exposição do Prometheus."""
+    return Response(content=render(), media_type=CONTENT_TYPE_LATEST)
 
 
 class QueryMessage(BaseModel):
@@ -54,26 +107,45 @@ class QueryMessage(BaseModel):
 class QueryRequest(BaseModel):
     query: str
     history: Optional[List[Dict[str, Any]]] = None
+    # inclui a duração (ms) de cada estágio na resposta
+    include_timings: bool = False
+    # coleções a buscar; vazio = escolhidas pelo roteador (server/routing.py)
+    collections: Optional[List[str]] = None
+    # filtros de metadados (`library`, `type`, `path`, `lang`): valor ou lista
+    # de valores aceitos; vazio = `library` detectada na pergunta, se houver
+    filters: Optional[Dict[str, Union[str, List[str]]]] = None
 
 
 class QueryResponse(BaseModel):
     answer: str
     documents: List[Dict[str, Any]]
+    cached: bool = False
+    # estimativa de tokens do prompt enviado ao LLM
+    prompt_tokens: Optional[int] = None
+    # duração (ms) de cada estágio, se `include_timings` foi pedido
+    timings: Optional[Dict[str, float]] = None
+    # filtros de metadados efetivamente aplicados na busca
+    filters: Optional[Dict[str, List[str]]] = None
 
 
-def _build_prompt(question: str, docs: List[Dict[str, Any]]) -> str:
-    """Monta o prompt para o LLM a partir do contexto recuperado."""
+class RetrieveResponse(BaseModel):
+    documents: List[Dict[str, Any]]
+    prompt_tokens: int
+    filters: Optional[Dict[str, List[str]]] = None
+    timings: Optional[Dict[str, float]] = None
+
+
+def _build_prompt(question: str, built: BuiltContext) -> str:
+    """Monta o prompt para o LLM a partir do contexto já orçado."""
 
-    if not docs:
+    if not built.docs:
         context = "(Nenhum documento relevante foi encontrado no índice.)"
     else:
         parts: List[str] = []
-        for i, doc in enumerate(docs, start=1):
+        for i, (doc, text) in enumerate(zip(built.docs, built.texts), start=1):
             meta = doc.get("metadata", {}) or {}
             source = meta.get("source") or meta.get("path") or "desconhecido"
-            parts.append(
-                f"[Documento {i}]\nFonte: {source}\n\n{doc.get('text', '')}".strip()
-            )
+            parts.append(f"[Documento {i}]\nFonte: {source}\n\n{text}".strip())
         context = "\n\n---\n\n".join(parts)
 
     system_instructions = (
@@ -93,28 +165,511 @@ def _build_prompt(question: str, docs: List[Dict[str, Any]]) -> str:
     return prompt
 
 
+@dataclass
+class RetrievedContext:
+    query: str
+    query_vector: List[float]
+    docs: List[Dict[str, Any]]
+    prompt: str
+    prompt_tokens: int
+    # coleções buscadas
+    collections: List[str]
+    # duração (ms) de cada estágio já executado
+    timings: Dict[str, float] = field(default_factory=dict)
+    # filtros de metadados aplicados na busca
+    filters: Filters = field(default_factory=dict)
+
+    def version(self) -> str:
+        """Versão do conjunto de coleções buscadas (chave do cache de respostas)."""
+        return "+".join(f"{name}@{collection_version(name)}" for name in self.collections)
+
+    def cached_answer(self) -> Optional[str]:
+        if answer_cache is None:
+            return None
+        return answer_cache.lookup(
+            self.query,
+            self.query_vector,
+            [d.get("id") for d in self.docs],
+            self.version(),
+        )
+
+    def remember(self, answer: str) -> None:
+        if answer_cache is None or not answer:
+            return
+        answer_cache.store(
+            self.query,
+            self.query_vector,
+            [d.get("id") for d in self.docs],
+            self.version(),
+            answer,
+        )
+
+
+class _StageTimer:
+    def __init__(self, timings: Dict[str, float], stage: str) -> None:
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self) -> "_StageTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.started
+        self.timings[f"{self.stage}_ms"] = seconds * 1000.0
+        observe_stage(self.stage, seconds)
+
+
+def _route(body: QueryRequest, query: str) -> List[SearchTarget]:
+    try:
+        targets = router.route(query, body.collections)
+    except UnknownCollectionError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    observe_route(t.name for t in targets)
+    return targets
+
+
+def _filters(body: QueryRequest, query: str) -> Tuple[Filters, bool]:
+    """Filtros da requisição ou, sem eles, `library` detectada na pergunta.
+
+    O segundo valor indica filtro automático, descartado se deixar menos de
+    `filters.min_results` documentos (ver `server/filters.py`).
+    """
+    try:
+        filters = normalize_filters(body.filters)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    if filters:
+        return filters, False
+    libraries = library_detector.detect(query)
+    return ({"library": libraries}, True) if libraries else ({}, False)
+
+
+def _vector_top_k() -> int:
+    return int(retrieval_section("vector").get("top_k", 40))
+
+
+def _stores() -> Dict[str, Optional[ChunkStore]]:
+    return {name: t.store() for name, t in router.targets.items()}
+
+
+def _available(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Descarta, já na busca, o que o chunk store não conseguiria completar.
+
+    Assim a contagem que decide o fallback do filtro automático é a dos
+    documentos que chegam ao prompt.
+    """
+    try:
+        return available_docs(docs, _stores())
+    except ChunkStoreError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+
+async def _search(
+    query: str, query_vec: List[float], targets: List[SearchTarget], filters: Filters
+) -> List[Dict[str, Any]]:
+    """Uma busca por coleção, em paralelo, todas com o mesmo embedding."""
+
+    results = await asyncio.gather(
+        *(
+            retrieve(
+                query=query,
+                client=qdrant_client,
+                embeddings=embeddings_client,
+                collection_name=target.name,
+                query_vector=query_vec,
+                text_index=target.text_index.get(),
+                search_params=target.search_params,
+                filters=filters,
+                vector_index=target.local_vectors(),
+            )
+            for target in targets
+        )
+    )
+    return _available(
+        merge_collections([(t.name, r) for t, r in zip(targets, results)], _vector_top_k())
+    )
+
+
+async def _retrieve_context(body: QueryRequest) -> RetrievedContext:
+    """Executa as etapas anteriores ao LLM (rewrite, retrieval, rerank, prompt)."""
+
+    timings: Dict[str, float] = {}
+    history = body.history or []
+    with _StageTimer(timings, "rewrite"):
+        effective_query = await rewrite_query(history, body.query, query_rewriter)
+    targets = _route(body, effective_query)
+    filters, auto = _filters(body, effective_query)
+
+    with _StageTimer(timings, "embed"):
+        query_vec = await embed_query(effective_query, embeddings_client)
+    with _StageTimer(timings, "retrieve"):
+        docs = await _search(effective_query, query_vec, targets, filters)
+        if auto and len(docs) < library_detector.min_results:
+            filters = {}
+            docs = await _search(effective_query, query_vec, targets, filters)
+    return await _finish_context(
+        effective_query, query_vec, docs, [t.name for t in targets], timings, filters
+    )
+
+
+async def _finish_context(
+    query: str,
+    query_vec: List[float],
+    docs: List[Dict[str, Any]],
+    collections: List[str],
+    timings: Dict[str, float],
+    filters: Filters,
+) -> RetrievedContext:
+    """Rerank e montagem do prompt, comuns a `/query` e `/query/batch`."""
+
+    with _StageTimer(timings, "rerank"):
+        docs = await rerank(query, docs, reranker=reranker, stats=rerank_stats, stores=_stores())
+
+    with _StageTimer(timings, "prompt"):
+        built = build_context(query, docs, context_config)
+        prompt = _build_prompt(query, built)
+        prompt_tokens = estimate_tokens(prompt, context_config.chars_per_token)
+    return RetrievedContext(
+        query, query_vec, built.docs, prompt, prompt_tokens, collections, timings, filters
+    )
+
+
+@dataclass
+class _Searched:
+    """Resultado da busca de um item de `/query/batch`, antes do rerank."""
+
+    query: str
+    query_vec: List[float]
+    docs: List[Dict[str, Any]]
+    collections: List[str]
+    timings: Dict[str, float]
+    filters: Filters
+    # item inválido (coleção desconhecida, filtro inválido): vira evento `error`
+    error: Optional[str] = None
+
+
+async def _search_batch(bodies: List[QueryRequest]) -> List[_Searched]:
+    """Rewrite, embedding e busca de um lote inteiro: um embedding em lote e
+    um único round trip ao Qdrant por coleção (com as perguntas roteadas
+    para ela), com as coleções buscadas em paralelo.
+
+    Os tempos de `embed`/`retrieve` de cada item são os do lote (observados
+    uma vez só nos histogramas). Itens cujo filtro automático de biblioteca
+    deixou poucos documentos são buscados de novo, individualmente, sem ele.
+    Itens inválidos não são buscados e saem com `error` preenchido.
+    """
+
+    shared: Dict[str, float] = {}
+    with _StageTimer(shared, "rewrite"):
+        queries = list(
+            await asyncio.gather(
+                *(rewrite_query(b.history or [], b.query, query_rewriter) for b in bodies)
+            )
+        )
+    routes: List[List[SearchTarget]] = []
+    resolved: List[Tuple[Filters, bool]] = []
+    errors: Dict[int, str] = {}
+    for i, (b, q) in enumerate(zip(bodies, queries)):
+        try:
+            targets, flt = _route(b, q), _filters(b, q)
+        except HTTPException as exc:
+            errors[i] = str(exc.detail)
+            targets, flt = [], ({}, False)
+        routes.append(targets)
+        resolved.append(flt)
+    filters = [flt for flt, _ in resolved]
+    valid = [i for i in range(len(bodies)) if i not in errors]
+    vectors: List[List[float]] = [[] for _ in bodies]
+    with _StageTimer(shared, "embed"):
+        embedded = await embed_queries([queries[i] for i in valid], embeddings_client)
+    for i, vec in zip(valid, embedded):
+        vectors[i] = vec
+    with _StageTimer(shared, "retrieve"):
+        members: Dict[str, List[int]] = {}
+        for i, targets in enumerate(routes):
+            for target in targets:
+                members.setdefault(target.name, []).append(i)
+        per_collection = await asyncio.gather(
+            *(
+                retrieve_batch(
+                    [queries[i] for i in indices],
+                    client=qdrant_client,
+                    collection_name=name,
+                    query_vectors=[vectors[i] for i in indices],
+                    text_index=router.targets[name].text_index.get(),
+                    search_params=router.targets[name].search_params,
+                    filters=[filters[i] for i in indices],
+                    vector_index=router.targets[name].local_vectors(),
+                )
+                for name, indices in members.items()
+            )
+        )
+        found: Dict[Tuple[int, str], List[Dict[str, Any]]] = {}
+        for (name, indices), results in zip(members.items(), per_collection):
+            for i, docs in zip(indices, results):
+                found[(i, name)] = docs
+        top_k = _vector_top_k()
+        merged = [
+            _available(merge_collections([(t.name, found[(i, t.name)]) for t in targets], top_k))
+            for i, targets in enumerate(routes)
+        ]
+        retry = [
+            i
+            for i, (_, auto) in enumerate(resolved)
+            if auto and i not in errors and len(merged[i]) < library_detector.min_results
+        ]
+        for i in retry:
+            filters[i] = {}
+        retried = await asyncio.gather(
+            *(_search(queries[i], vectors[i], routes[i], {}) for i in retry)
+        )
+        for i, docs in zip(retry, retried):
+            merged[i] = docs
+    return [
+        _Searched(q, vec, docs, [t.name for t in targets], dict(shared), flt, errors.get(i))
+        for i, (q, vec, docs, targets, flt) in enumerate(
+            zip(queries, vectors, merged, routes, filters)
+        )
+    ]
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    """Formata as durações por estágio para o header HTTP `Server-Timing`."""
+    return ", ".join(
+        f"{name[:-3]};dur={ms:.1f}" for name, ms in timings.items() if name.endswith("_ms")
+    )
+
+
 @app.post("/query", response_model=QueryResponse)
-async def query(body: QueryRequest) -> QueryResponse:
+async def query(body: QueryRequest, response: Response) -> QueryResponse:
     """Endpoint principal de consulta RAG.
 
     1. Reescreve a query (opcional).
     2. Recupera documentos relevantes no Qdrant.
     3. Aplica reranking.
-    4. Gera resposta via LLM usando o contexto recuperado.
+    4. Reaproveita uma resposta em cache para o mesmo contexto, se houver.
+    5. Caso contrário, gera resposta via LLM usando o contexto recuperado.
     """
 
-    history = body.history or []
-    effective_query = rewrite_query(history, body.query)
+    started = time.perf_counter()
+    with REQUESTS_IN_FLIGHT.labels(endpoint="query").track_inprogress():
+        ctx = await _retrieve_context(body)
+        answer = ctx.cached_answer()
+        cached = answer is not None
+        if not cached:
+            with _StageTimer(ctx.timings, "llm"):
+                answer = await llm_client.generate(ctx.prompt)
+            ctx.remember(answer)
+    observe_request("query", cached, time.perf_counter() - started)
+    response.headers["Server-Timing"] = _server_timing(ctx.timings)
+
+    return QueryResponse(
+        answer=answer,
+        documents=ctx.docs,
+        cached=cached,
+        prompt_tokens=ctx.prompt_tokens,
+        timings=_rounded(ctx.timings) if body.include_timings else None,
+        filters=ctx.filters or None,
+    )
+
+
+@app.post("/retrieve", response_model=RetrieveResponse)
+async def retrieve_only(body: QueryRequest, response: Response) -> RetrieveResponse:
+    """Só os estágios anteriores ao LLM: os documentos que `/query` usaria.
+
+    Usado pela avaliação de retrieval (`eval_rag.py --retrieval-only`) e para
+    descobrir o contexto de uma pergunta sem pagar a geração.
+    """
+
+    started = time.perf_counter()
+    with REQUESTS_IN_FLIGHT.labels(endpoint="retrieve").track_inprogress():
+        ctx = await _retrieve_context(body)
+    observe_request("retrieve", False, time.perf_counter() - started)
+    response.headers["Server-Timing"] = _server_timing(ctx.timings)
+    return RetrieveResponse(
+        documents=ctx.docs,
+        prompt_tokens=ctx.prompt_tokens,
+        filters=ctx.filters or None,
+        timings=_rounded(ctx.timings) if body.include_timings else None,
+    )
+
+
+def _rounded(timings: Dict[str, float]) -> Dict[str, float]:
+    return {name: round(ms, 2) for name, ms in timings.items()}
+
+
+def _ndjson(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
 
-    docs = retrieve(
-        query=effective_query,
-        client=qdrant_client,
-        embeddings=embeddings_client,
-        collection_name=COLLECTION_NAME,
+
+@app.post("/query/stream")
+async def query_stream(body: QueryRequest) -> StreamingResponse:
+    """Versão em streaming de `/query` (NDJSON, um evento JSON por linha).
+
+    Eventos, em ordem:
+    - `{"type": "documents", "documents": [...], "prompt_tokens": n}` logo após
+      a montagem do contexto (com `filters`, se algum foi aplicado);
+    - `{"type": "token", "content": "..."}` para cada trecho gerado pelo LLM
+      (uma resposta em cache chega como um único token);
+    - `{"type": "done"}` ao final (com `timings` se `include_timings`), ou
+      `{"type": "error", "detail": "..."}`.
+
+    Erros antes do início do stream (ex.: Qdrant indisponível) seguem o
+    comportamento normal do FastAPI (HTTP 500).
+    """
+
+    started = time.perf_counter()
+    in_flight = REQUESTS_IN_FLIGHT.labels(endpoint="stream")
+    in_flight.inc()
+    try:
+        ctx = await _retrieve_context(body)
+    except Exception:
+        in_flight.dec()
+        raise
+    cached = ctx.cached_answer()
+
+    def done_event(**extra: Any) -> bytes:
+        event: Dict[str, Any] = {"type": "done", **extra}
+        if body.include_timings:
+            event["timings"] = _rounded(ctx.timings)
+        return _ndjson(event)
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            event: Dict[str, Any] = {
+                "type": "documents",
+                "documents": ctx.docs,
+                "prompt_tokens": ctx.prompt_tokens,
+            }
+            if ctx.filters:
+                event["filters"] = ctx.filters
+            yield _ndjson(event)
+            if cached is not None:
+                yield _ndjson({"type": "token", "content": cached})
+                yield done_event(cached=True)
+                return
+
+            parts: List[str] = []
+            try:
+                with _StageTimer(ctx.timings, "llm"):
+                    async for token in llm_client.stream(ctx.prompt):
+                        parts.append(token)
+                        yield _ndjson({"type": "token", "content": token})
+            except Exception as exc:  # o status HTTP já foi enviado
+                yield _ndjson({"type": "error", "detail": str(exc)})
+                return
+            ctx.remember("".join(parts))
+            yield done_event()
+        finally:
+            in_flight.dec()
+            observe_request("stream", cached is not None, time.perf_counter() - started)
+
+    # Só os estágios anteriores ao LLM: o header sai antes dos tokens.
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Server-Timing": _server_timing(ctx.timings)},
     )
-    docs = rerank(effective_query, docs)
 
-    prompt = _build_prompt(effective_query, docs)
-    answer = llm_client.generate(prompt)
 
-    return QueryResponse(answer=answer, documents=docs)
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+    # gerações simultâneas deste lote (limitado por `batch.max_concurrency`)
+    max_concurrency: Optional[int] = None
+
+
+@app.post("/query/batch")
+async def query_batch(body: BatchQueryRequest) -> StreamingResponse:
+    """Várias perguntas numa requisição, para jobs em lote (eval, QA de docs).
+
+    Todas as perguntas são embedadas numa única chamada e buscadas com um
+    único `query_batch_points`; rerank, montagem do prompt e geração rodam
+    por item, no máximo `max_concurrency` por vez (além do limite global do
+    LLM). A resposta é NDJSON, um evento por item na ordem em que terminam:
+
+    - `{"type": "result", "index": i, "answer": ..., "documents": [...],
+      "cached": bool, "prompt_tokens": n}` (com `filters` se algum foi
+      aplicado e `timings` se o item pediu `include_timings`);
+    - `{"type": "error", "index": i, "detail": "..."}` se aquele item falhou,
+      inclusive por ser inválido (coleção desconhecida, filtro inválido);
+    - `{"type": "done", "count": n, "errors": e}` ao final.
+
+    Lotes acima de `batch.max_queries` são recusados com HTTP 413; falhas na
+    busca do lote (antes do stream) seguem como HTTP 500.
+    """
+
+    max_queries = int(BATCH_CFG.get("max_queries", 256))
+    if len(body.queries) > max_queries:
+        raise HTTPException(
+            status_code=413,
+            detail=f"lote com {len(body.queries)} perguntas; máximo é {max_queries}",
+        )
+
+    started = time.perf_counter()
+    in_flight = REQUESTS_IN_FLIGHT.labels(endpoint="batch")
+    in_flight.inc()
+    try:
+        searched = await _search_batch(body.queries) if body.queries else []
+    except Exception:
+        in_flight.dec()
+        raise
+
+    limit = int(BATCH_CFG.get("max_concurrency", llm_client.limiter.max_concurrency))
+    if body.max_concurrency is not None:
+        limit = min(limit, body.max_concurrency)
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def answer(index: int) -> Dict[str, Any]:
+        item = searched[index]
+        if item.error is not None:
+            return {"type": "error", "index": index, "detail": item.error}
+        try:
+            async with semaphore:
+                ctx = await _finish_context(
+                    item.query,
+                    item.query_vec,
+                    item.docs,
+                    item.collections,
+                    item.timings,
+                    item.filters,
+                )
+                text = ctx.cached_answer()
+                cached = text is not None
+                if not cached:
+                    with _StageTimer(ctx.timings, "llm"):
+                        text = await llm_client.generate(ctx.prompt)
+                    ctx.remember(text)
+        except Exception as exc:  # o status HTTP já foi enviado
+            return {"type": "error", "index": index, "detail": str(exc)}
+        event: Dict[str, Any] = {
+            "type": "result",
+            "index": index,
+            "answer": text,
+            "documents": ctx.docs,
+            "cached": cached,
+            "prompt_tokens": ctx.prompt_tokens,
+        }
+        if ctx.filters:
+            event["filters"] = ctx.filters
+        if body.queries[index].include_timings:
+            event["timings"] = _rounded(ctx.timings)
+        return event
+
+    async def events() -> AsyncIterator[bytes]:
+        tasks = [asyncio.create_task(answer(i)) for i in range(len(searched))]
+        errors = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                errors += event["type"] == "error"
+                yield _ndjson(event)
+            yield _ndjson({"type": "done", "count": len(tasks), "errors": errors})
+        finally:
+            # Cliente desconectou no meio: não gera o resto do lote à toa.
+            for task in tasks:
+                task.cancel()
+            in_flight.dec()
+            observe_request("batch", False, time.perf_counter() - started)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
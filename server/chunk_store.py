@@ -0,0 +1,152 @@
+"""Armazenamento local dos chunks (texto + metadados), lido via mmap.
+
+Com `payload: slim` em config/collections.yaml, os pontos do Qdrant guardam
+só os campos de filtro (`library`, `type`, `path`, `lang`); texto e demais
+metadados ficam aqui. O servidor busca e reordena só com IDs e scores, e lê
+o texto apenas dos documentos que sobrevivem ao rerank (`hydrate_docs` em
+`rag_pipeline.py`). Isso reduz a RAM do Qdrant e o volume de cada resposta
+da busca (`vector.top_k` payloads por query).
+
+Escrito por `scripts/index_qdrant.py` a partir do mesmo JSONL que ele indexa
+(antes do upsert, então todo ponto novo já tem texto no store), em
+data/chunks/<coleção>.store/:
+
+- `ids.npy`         – IDs de ponto (`index_manifest.point_id`), ordenados,
+  para busca binária;
+- `offsets.npy`     – N + 1 offsets (int64) de cada texto em `texts.bin`;
+- `texts.bin`       – textos em UTF-8, um após o outro;
+- `file_idx.npy`    – índice (int32) dos metadados do arquivo de origem;
+- `section_idx.npy` – índice (int32) da seção do chunk;
+- `meta.json`       – listas de metadados por arquivo (sem `section`) e de
+  seções, cada valor gravado uma vez só.
+"""
+
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .index_manifest import point_id
+from .text_index import replace_dir
+
+
+ROOT = Path(__file__).resolve().parents[1]
+CHUNKS_DIR = ROOT / "data" / "chunks"
+
+
+class ChunkStoreError(RuntimeError):
+    """Coleção com payload `slim` sem chunk store para completar os documentos."""
+
+
+def chunk_store_dir(collection_name: str) -> Path:
+    return CHUNKS_DIR / f"{collection_name}.store"
+
+
+def build_chunk_store(records: Iterable[Dict[str, Any]], out_dir: Path) -> int:
+    """Grava os registros do JSONL de chunks em `out_dir`; retorna quantos
+    chunks distintos (por ID de ponto) foram gravados."""
+    files: Dict[str, int] = {}
+    file_list: List[Dict[str, Any]] = []
+    # None = registro sem `section` (JSONL de versões anteriores)
+    sections: Dict[Optional[str], int] = {}
+    rows: Dict[str, Tuple[bytes, int, int]] = {}
+
+    for rec in records:
+        meta = dict(rec.get("metadata") or {})
+        pid = point_id(meta.get("source") or "", rec["text"])
+        if pid in rows:
+            continue
+        section = meta.pop("section", None)
+        key = json.dumps(meta, sort_keys=True, ensure_ascii=False)
+        if key not in files:
+            files[key] = len(file_list)
+            file_list.append(meta)
+        rows[pid] = (
+            rec["text"].encode("utf-8"),
+            files[key],
+            sections.setdefault(section, len(sections)),
+        )
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    ids = sorted(rows)
+    offsets = [0]
+    with (tmp_dir / "texts.bin").open("wb") as blob:
+        for pid in ids:
+            blob.write(rows[pid][0])
+            offsets.append(offsets[-1] + len(rows[pid][0]))
+    id_width = max((len(i) for i in ids), default=1)
+    np.save(tmp_dir / "ids.npy", np.asarray(ids, dtype=f"U{id_width}"))
+    np.save(tmp_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+    np.save(tmp_dir / "file_idx.npy", np.asarray([rows[p][1] for p in ids], dtype=np.int32))
+    np.save(tmp_dir / "section_idx.npy", np.asarray([rows[p][2] for p in ids], dtype=np.int32))
+    with (tmp_dir / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump(
+            {"count": len(ids), "files": file_list, "sections": list(sections)},
+            f,
+            ensure_ascii=False,
+        )
+
+    replace_dir(tmp_dir, out_dir)
+    return len(ids)
+
+
+class ChunkStore:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with (path / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.files: List[Dict[str, Any]] = meta["files"]
+        self.sections: List[Optional[str]] = meta["sections"]
+        self.ids = np.load(path / "ids.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.file_idx = np.load(path / "file_idx.npy", mmap_mode="r")
+        self.section_idx = np.load(path / "section_idx.npy", mmap_mode="r")
+        # np.memmap não abre arquivo vazio (store sem chunks).
+        self.blob: Any = b""
+        if self.offsets[-1]:
+            self.blob = np.memmap(path / "texts.bin", dtype=np.uint8, mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, pid: object) -> bool:
+        row = int(np.searchsorted(self.ids, pid))
+        return row < len(self.ids) and self.ids[row] == pid
+
+    def get(self, pid: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(texto, metadados) do chunk, ou None se o ID não está no store."""
+        row = int(np.searchsorted(self.ids, pid))
+        if row >= len(self.ids) or self.ids[row] != pid:
+            return None
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        text = bytes(self.blob[start:end]).decode("utf-8")
+        metadata = dict(self.files[int(self.file_idx[row])])
+        section = self.sections[int(self.section_idx[row])]
+        if section is not None:
+            metadata["section"] = section
+        return text, metadata
+
+
+class ChunkStoreHandle:
+    """Mantém o `ChunkStore` de uma coleção aberto, recarregando após rebuilds."""
+
+    def __init__(self, collection_name: str) -> None:
+        self.path = chunk_store_dir(collection_name)
+        self._store: Optional[ChunkStore] = None
+        self._mtime: Optional[float] = None
+
+    def get(self) -> Optional[ChunkStore]:
+        try:
+            mtime = (self.path / "meta.json").stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if self._store is None or mtime != self._mtime:
+            self._store = ChunkStore(self.path)
+            self._mtime = mtime
+        return self._store
@@ -0,0 +1,207 @@
+"""Configuração das coleções (config/collections.yaml).
+
+Cada entrada descreve como a coleção é criada no Qdrant e como é buscada:
+
+- `vector_size`, `distance` (`cosine` ou `dot`; os scores são tratados como
+  similaridade, maior = melhor, na fusão híbrida e no rerank);
+- `on_disk`: vetores originais em disco (mmap) em vez de RAM;
+- `hnsw`: `m` e `ef_construct` do grafo (null = default do Qdrant);
+- `quantization`: `type` `none`, `scalar` (int8, ~4x menos memória) ou
+  `binary` (1 bit/dimensão, ~32x), com `always_ram` para manter os vetores
+  quantizados em RAM mesmo com `on_disk`;
+- `search`: `ef` da busca HNSW e, com quantização, `rescore` (reordena com os
+  vetores originais) e `oversampling` (candidatos extras antes do rescore);
+- `routing`: `keywords` que direcionam uma pergunta para a coleção e
+  `default` (buscada quando nenhuma palavra-chave casa); ver `server/routing.py`.
+  `paths` (globs sobre o caminho em data/raw/, ex. `"*.go"`) diz quais
+  arquivos `scripts/build_chunks.py` grava no JSONL da coleção (ver
+  `assign_collection`);
+- `backend`: onde a busca vetorial roda no servidor: `qdrant` (padrão) ou
+  `numpy` (matriz local em mmap com busca exata, para corpora pequenos; ver
+  `server/vector_index.py`), com `numpy_dtype` `float16` ou `float32`;
+- `payload`: `full` (padrão) guarda o chunk inteiro no payload; `slim` guarda
+  no Qdrant só os campos de filtro, com texto e demais metadados no chunk
+  store local (`server/chunk_store.py`), gravado pelo indexador;
+- `payload_indexes`: campos do payload com índice `keyword` no Qdrant, usados
+  pelos filtros de metadados (ver `server/filters.py`).
+
+O indexador usa `vectors_config`/`hnsw_config`/`quantization_config` ao criar
+(ou atualizar) a coleção e cria os `payload_indexes` que faltarem; o servidor passa `search_params` para `retrieve`.
+"""
+
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from qdrant_client import models
+
+from .filters import FILTER_FIELDS
+from .vector_index import DTYPES
+
+
+ROOT = Path(__file__).resolve().parents[1]
+CONFIG_PATH = ROOT / "config" / "collections.yaml"
+
+DISTANCES = {"cosine": models.Distance.COSINE, "dot": models.Distance.DOT}
+QUANTIZATION_TYPES = ("none", "scalar", "binary")
+BACKENDS = ("qdrant", "numpy")
+PAYLOAD_MODES = ("slim", "full")
+
+
+@dataclass
+class CollectionConfig:
+    name: str
+    vector_size: int
+    description: str = ""
+    distance: str = "cosine"
+    on_disk: bool = False
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    quantization: str = "none"
+    quantization_always_ram: bool = True
+    # só `scalar`: quantil usado para cortar outliers antes de converter para int8
+    quantization_quantile: Optional[float] = None
+    search_ef: Optional[int] = None
+    search_rescore: bool = True
+    search_oversampling: Optional[float] = None
+    routing_keywords: List[str] = field(default_factory=list)
+    routing_default: bool = True
+    # globs dos arquivos de data/raw/ desta coleção (vazio = o que sobrar)
+    routing_paths: List[str] = field(default_factory=list)
+    payload_indexes: List[str] = field(default_factory=lambda: list(FILTER_FIELDS))
+    backend: str = "qdrant"
+    payload: str = "full"
+    numpy_dtype: str = "float16"
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> "CollectionConfig":
+        hnsw = entry.get("hnsw") or {}
+        quant = entry.get("quantization") or {}
+        search = entry.get("search") or {}
+        routing = entry.get("routing") or {}
+        default = cls(name="", vector_size=0)
+
+        distance = str(entry.get("distance", default.distance)).lower()
+        if distance not in DISTANCES:
+            raise ValueError(
+                f"Coleção {entry.get('name')}: distance '{distance}' não suportada "
+                f"(use {', '.join(DISTANCES)})"
+            )
+        quant_type = str(quant.get("type") or "none").lower()
+        if quant_type not in QUANTIZATION_TYPES:
+            raise ValueError(
+                f"Coleção {entry.get('name')}: quantization.type '{quant_type}' inválido "
+                f"(use {', '.join(QUANTIZATION_TYPES)})"
+            )
+
+        backend = str(entry.get("backend", default.backend)).lower()
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Coleção {entry.get('name')}: backend '{backend}' inválido "
+                f"(use {', '.join(BACKENDS)})"
+            )
+        numpy_dtype = str(entry.get("numpy_dtype", default.numpy_dtype)).lower()
+        if numpy_dtype not in DTYPES:
+            raise ValueError(
+                f"Coleção {entry.get('name')}: numpy_dtype '{numpy_dtype}' inválido "
+                f"(use {', '.join(DTYPES)})"
+            )
+
+        payload = str(entry.get("payload", default.payload)).lower()
+        if payload not in PAYLOAD_MODES:
+            raise ValueError(
+                f"Coleção {entry.get('name')}: payload '{payload}' inválido "
+                f"(use {', '.join(PAYLOAD_MODES)})"
+            )
+
+        def optional(section: Dict[str, Any], key: str, cast: Any) -> Any:
+            value = section.get(key)
+            return None if value is None else cast(value)
+
+        return cls(
+            name=entry["name"],
+            vector_size=int(entry["vector_size"]),
+            description=entry.get("description", ""),
+            distance=distance,
+            on_disk=bool(entry.get("on_disk", default.on_disk)),
+            hnsw_m=optional(hnsw, "m", int),
+            hnsw_ef_construct=optional(hnsw, "ef_construct", int),
+            quantization=quant_type,
+            quantization_always_ram=bool(quant.get("always_ram", default.quantization_always_ram)),
+            quantization_quantile=optional(quant, "quantile", float),
+            search_ef=optional(search, "ef", int),
+            search_rescore=bool(search.get("rescore", default.search_rescore)),
+            search_oversampling=optional(search, "oversampling", float),
+            routing_keywords=[str(kw) for kw in routing.get("keywords") or []],
+            routing_default=bool(routing.get("default", default.routing_default)),
+            routing_paths=[str(p) for p in routing.get("paths") or []],
+            payload_indexes=[
+                str(f) for f in entry.get("payload_indexes", default.payload_indexes) or []
+            ],
+            backend=backend,
+            payload=payload,
+            numpy_dtype=numpy_dtype,
+        )
+
+    def vectors_config(self) -> models.VectorParams:
+        return models.VectorParams(
+            size=self.vector_size,
+            distance=DISTANCES[self.distance],
+            on_disk=self.on_disk,
+        )
+
+    def hnsw_config(self) -> Optional[models.HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self) -> Optional[models.QuantizationConfig]:
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=self.quantization_quantile,
+                    always_ram=self.quantization_always_ram,
+                )
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=self.quantization_always_ram)
+            )
+        return None
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        quantization = None
+        if self.quantization != "none":
+            quantization = models.QuantizationSearchParams(
+                rescore=self.search_rescore,
+                oversampling=self.search_oversampling,
+            )
+        if self.search_ef is None and quantization is None:
+            return None
+        return models.SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
+
+
+def assign_collection(collections: Sequence[CollectionConfig], rel_path: str) -> Optional[str]:
+    """Coleção que recebe os chunks do arquivo `rel_path` (relativo a data/raw/).
+
+    A primeira, na ordem de collections.yaml, com um glob de `routing.paths`
+    que case; sem nenhum casamento, a primeira coleção sem `paths` (de
+    preferência com `routing.default`). None se todas têm `paths` e nenhum
+    casa: o arquivo fica fora do índice.
+    """
+    for col in collections:
+        if any(fnmatchcase(rel_path, pattern) for pattern in col.routing_paths):
+            return col.name
+    rest = [c for c in collections if not c.routing_paths]
+    preferred = [c for c in rest if c.routing_default] or rest
+    return preferred[0].name if preferred else None
+
+
+def load_collection_configs(path: Path = CONFIG_PATH) -> List[CollectionConfig]:
+    import yaml
+
+    with path.open("r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    return [CollectionConfig.from_entry(entry) for entry in data.get("collections", []) or []]
@@ -0,0 +1,147 @@
+"""Montagem do contexto do prompt com orçamento de tokens.
+
+O tempo de prefill do LLM cresce com o tamanho do contexto, então em vez de
+concatenar todos os chunks reranqueados por inteiro:
+
+1. descarta chunks quase idênticos/sobrepostos da mesma `metadata.source`
+   (fração de shingles de palavras em comum >= `dedup_threshold`);
+2. reduz chunks maiores que `max_doc_tokens` às frases que mais compartilham
+   termos com a pergunta (mantendo a ordem original);
+3. para de adicionar documentos quando `max_tokens` seria ultrapassado.
+
+Tokens são estimados por `chars_per_token` (sem tokenizer do modelo).
+Parâmetros em config/retrieval.yaml, seção `context`.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .text_index import tokenize
+
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}|\n(?=\s*[-*#>|])")
+_WORD_RE = re.compile(r"\w+")
+
+SHINGLE_SIZE = 5
+
+
+@dataclass
+class ContextConfig:
+    max_tokens: int = 2500
+    max_doc_tokens: int = 600
+    chars_per_token: float = 4.0
+    dedup_threshold: float = 0.8
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "ContextConfig":
+        section = cfg.get("context") or {}
+        default = cls()
+        return cls(
+            max_tokens=int(section.get("max_tokens", default.max_tokens)),
+            max_doc_tokens=int(section.get("max_doc_tokens", default.max_doc_tokens)),
+            chars_per_token=float(section.get("chars_per_token", default.chars_per_token)),
+            dedup_threshold=float(section.get("dedup_threshold", default.dedup_threshold)),
+        )
+
+
+@dataclass
+class BuiltContext:
+    # documentos efetivamente usados (após deduplicação e orçamento)
+    docs: List[Dict[str, Any]]
+    # texto de cada documento como foi enviado (possivelmente reduzido)
+    texts: List[str]
+    tokens: int
+    dropped_duplicates: int = 0
+    dropped_budget: int = 0
+    trimmed: int = 0
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    return int(math.ceil(len(text) / chars_per_token)) if text else 0
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _overlap(a: Set[Tuple[str, ...]], b: Set[Tuple[str, ...]]) -> float:
+    """Fração do menor conjunto contida no outro (pega sobreposição parcial)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def _source_of(doc: Dict[str, Any]) -> str:
+    meta = doc.get("metadata", {}) or {}
+    return meta.get("source") or meta.get("path") or ""
+
+
+def trim_to_relevant(text: str, query: str, max_tokens: int, chars_per_token: float) -> str:
+    """Mantém as frases com mais termos da pergunta, até `max_tokens`."""
+    sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+    if len(sentences) <= 1:
+        return text[: int(max_tokens * chars_per_token)]
+
+    query_terms = set(tokenize(query))
+    scored = []
+    for idx, sentence in enumerate(sentences):
+        terms = set(tokenize(sentence))
+        score = len(terms & query_terms) / (1.0 + math.log1p(len(terms)))
+        scored.append((score, idx))
+    # Mais relevantes primeiro; empate favorece frases do início do chunk.
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    chosen: List[int] = []
+    used = 0
+    for _, idx in scored:
+        cost = estimate_tokens(sentences[idx], chars_per_token)
+        if used + cost > max_tokens:
+            continue
+        chosen.append(idx)
+        used += cost
+    if not chosen:
+        return sentences[scored[0][1]][: int(max_tokens * chars_per_token)]
+    return " … ".join(sentences[i] for i in sorted(chosen))
+
+
+def build_context(
+    query: str,
+    docs: List[Dict[str, Any]],
+    config: Optional[ContextConfig] = None,
+) -> BuiltContext:
+    cfg = config or ContextConfig()
+    used_docs: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    kept_shingles: Dict[str, List[Set[Tuple[str, ...]]]] = {}
+    result = BuiltContext(docs=used_docs, texts=texts, tokens=0)
+
+    for doc in docs:
+        text = doc.get("text", "") or ""
+        source = _source_of(doc)
+
+        shingles = _shingles(text)
+        same_source = kept_shingles.get(source, [])
+        if any(_overlap(shingles, other) >= cfg.dedup_threshold for other in same_source):
+            result.dropped_duplicates += 1
+            continue
+
+        if estimate_tokens(text, cfg.chars_per_token) > cfg.max_doc_tokens:
+            text = trim_to_relevant(text, query, cfg.max_doc_tokens, cfg.chars_per_token)
+            result.trimmed += 1
+
+        cost = estimate_tokens(text, cfg.chars_per_token)
+        if result.tokens + cost > cfg.max_tokens:
+            result.dropped_budget += 1
+            continue
+
+        kept_shingles.setdefault(source, []).append(shingles)
+        used_docs.append(doc)
+        texts.append(text)
+        result.tokens += cost
+
+    return result
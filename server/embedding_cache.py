@@ -0,0 +1,142 @@
+"""Cache persistente (SQLite) de embeddings, com despejo LRU.
+
+Compartilhado pelo indexador e pelo servidor através de `OllamaEmbeddingEngine`.
+A chave é (modelo, prefixo, hash do texto); os vetores são gravados como
+float32. Como o modelo faz parte da chave, processos com modelos diferentes
+podem dividir o mesmo arquivo sem apagar as entradas um do outro; vetores de
+um modelo que deixou de ser usado saem pelo despejo LRU.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path, model: str, max_entries: int = 200_000) -> None:
+        self.path = Path(path)
+        self.model = model
+        self.max_entries = max(1, int(max_entries))
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # Contagem de entradas atualizada a cada escrita, para `snapshot` (lido
+        # no event loop do servidor) não precisar de um COUNT(*).
+        self._entries = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # WAL permite que indexador e servidor usem o mesmo arquivo ao mesmo tempo.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key BLOB PRIMARY KEY,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+            )
+            (self._entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def _key(self, prefix: str, text: str) -> bytes:
+        h = hashlib.sha256()
+        for part in (self.model, prefix, text):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.digest()
+
+    def get_many(self, prefix: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Busca vetores em cache; `None` nas posições sem entrada."""
+        keys = [self._key(prefix, t) for t in texts]
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            # Limite de variáveis por query do SQLite: consulta em blocos.
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, k) for k in found],
+                    )
+            hits = sum(1 for k in keys if k in found)
+            self.stats.hits += hits
+            self.stats.misses += len(keys) - hits
+        return [found.get(k) for k in keys]
+
+    def put_many(self, prefix: str, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        now = time.time()
+        rows = [
+            (self._key(prefix, t), array("f", v).tobytes(), now) for t, v in zip(texts, vectors)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        self._entries = min(count, self.max_entries)
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.stats.evictions += excess
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = self.stats.snapshot()
+        # Pode atrasar em relação a escritas de outros processos no mesmo arquivo.
+        data["entries"] = self._entries
+        data["max_entries"] = self.max_entries
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
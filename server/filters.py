@@ -0,0 +1,127 @@
+"""Filtros de metadados na busca (`library`, `type`, `path`, `lang`).
+
+Os campos vêm de `build_chunks.build_metadata` e são indexados no Qdrant
+pelo indexador (`payload_indexes` em config/collections.yaml), então um
+filtro reduz o conjunto de candidatos antes da busca vetorial em vez de
+descartar resultados depois.
+
+Filtros podem vir explícitos na requisição (`{"library": "lipgloss"}` ou
+`{"library": ["gum", "bubbles"], "type": "doc"}`) ou, sem eles, ser
+detectados na pergunta: nomes de bibliotecas de config/sources.yaml (e os
+`aliases` de config/retrieval.yaml, seção `filters`) viram um filtro por
+`library`. Como a detecção pode errar, se a busca filtrada devolver menos de
+`min_results` documentos ela é repetida sem o filtro automático.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from qdrant_client import models
+
+from .text_index import tokenize
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SOURCES_PATH = ROOT / "config" / "sources.yaml"
+
+FILTER_FIELDS = ("library", "type", "path", "lang")
+
+# campo -> valores aceitos (qualquer um deles)
+Filters = Dict[str, List[str]]
+
+
+def normalize_filters(raw: Optional[Dict[str, Any]]) -> Filters:
+    """Valida e normaliza o campo `filters` da requisição (ValueError se inválido)."""
+    filters: Filters = {}
+    for key, value in (raw or {}).items():
+        if key not in FILTER_FIELDS:
+            raise ValueError(
+                f"filtro desconhecido: {key} (aceitos: {', '.join(FILTER_FIELDS)})"
+            )
+        values = [value] if isinstance(value, str) else list(value or [])
+        values = [str(v) for v in values if str(v)]
+        if not values:
+            raise ValueError(f"filtro {key} sem valores")
+        filters[key] = values
+    return filters
+
+
+def to_qdrant_filter(filters: Optional[Filters]) -> Optional[models.Filter]:
+    if not filters:
+        return None
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key=key,
+                match=(
+                    models.MatchValue(value=values[0])
+                    if len(values) == 1
+                    else models.MatchAny(any=values)
+                ),
+            )
+            for key, values in filters.items()
+        ]
+    )
+
+
+def doc_matches(doc: Dict[str, Any], filters: Optional[Filters]) -> bool:
+    """Aplica o filtro a um documento já carregado (ex.: achado só pelo BM25)."""
+    if not filters:
+        return True
+    metadata = doc.get("metadata") or {}
+    return all(metadata.get(key) in values for key, values in filters.items())
+
+
+def _source_libraries(path: Path) -> Dict[str, str]:
+    """Nome (e `name`, se diferente) -> valor de `library` de cada repositório."""
+    import yaml
+
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    names: Dict[str, str] = {}
+    for entries in data.values():
+        if not isinstance(entries, list):
+            continue
+        for entry in entries:
+            if not isinstance(entry, dict) or "/" not in str(entry.get("repo", "")):
+                continue
+            # build_metadata usa o nome do diretório do repositório como `library`.
+            library = entry["repo"].split("/", 1)[1]
+            names[library.lower()] = library
+            if entry.get("name"):
+                names[str(entry["name"]).lower()] = library
+    return names
+
+
+@dataclass
+class LibraryDetector:
+    enabled: bool = True
+    min_results: int = 3
+    # termos (já tokenizados) -> library
+    terms: List[Tuple[Set[str], str]] = field(default_factory=list)
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], sources_path: Path = SOURCES_PATH) -> "LibraryDetector":
+        section = cfg.get("filters") or {}
+        default = cls()
+        names = _source_libraries(sources_path)
+        for library, aliases in (section.get("aliases") or {}).items():
+            for alias in aliases or []:
+                names[str(alias).lower()] = names.get(str(library).lower(), str(library))
+        terms = [(set(tokenize(name)), library) for name, library in names.items() if tokenize(name)]
+        return cls(
+            enabled=bool(section.get("auto_library", default.enabled)),
+            min_results=int(section.get("min_results", default.min_results)),
+            terms=terms,
+        )
+
+    def detect(self, query: str) -> List[str]:
+        """Bibliotecas citadas em `query`, na ordem da configuração."""
+        if not self.enabled:
+            return []
+        tokens = set(tokenize(query))
+        found = [library for term, library in self.terms if term <= tokens]
+        return list(dict.fromkeys(found))
@@ -0,0 +1,114 @@
+"""Manifesto do que já está indexado em cada coleção do Qdrant.
+
+Escrito por `scripts/index_qdrant.py` em data/index/<coleção>.manifest.json
+(com o Qdrant no processo, no diretório de `qdrant_store.local_state_dir`).
+Guarda, para cada ponto, um digest do payload, além do modelo de embedding e
+do tamanho do vetor usados. Isso permite reindexação incremental (só embeda o
+que é novo) e dá ao servidor uma `version` da coleção, que muda a cada
+indexação com alterações.
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .qdrant_store import local_state_dir
+
+
+ROOT = Path(__file__).resolve().parents[1]
+INDEX_DIR = local_state_dir() or ROOT / "data" / "index"
+
+# Namespace fixo: o mesmo (source, texto) gera sempre o mesmo ID de ponto.
+POINT_ID_NAMESPACE = uuid.UUID("5d0f4a3e-2f7c-4f43-9b8e-6a1f3c2d9e10")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def point_id(source: str, text: str) -> str:
+    """ID estável de um chunk: UUIDv5 de `source` + hash do conteúdo."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source}\n{content_hash(text)}"))
+
+
+def payload_digest(payload: Dict[str, Any]) -> str:
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def manifest_path(collection_name: str) -> Path:
+    return INDEX_DIR / f"{collection_name}.manifest.json"
+
+
+# coleção -> (mtime do manifesto, versão); evita reler o JSON a cada consulta.
+_VERSION_CACHE: Dict[str, Tuple[float, Optional[str]]] = {}
+
+
+def collection_version(collection_name: str) -> Optional[str]:
+    """Versão atual da coleção segundo o manifesto (None se não houver)."""
+    path = manifest_path(collection_name)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    cached = _VERSION_CACHE.get(collection_name)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with path.open("r", encoding="utf-8") as f:
+        version = (json.load(f) or {}).get("version")
+    _VERSION_CACHE[collection_name] = (mtime, version)
+    return version
+
+
+@dataclass
+class IndexManifest:
+    collection: str
+    model: Optional[str] = None
+    vector_size: Optional[int] = None
+    version: Optional[str] = None
+    # point_id -> digest do payload gravado no Qdrant
+    points: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, collection_name: str) -> "IndexManifest":
+        path = manifest_path(collection_name)
+        if not path.exists():
+            return cls(collection=collection_name)
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f) or {}
+        return cls(
+            collection=collection_name,
+            model=data.get("model"),
+            vector_size=data.get("vector_size"),
+            version=data.get("version"),
+            points=data.get("points") or {},
+        )
+
+    def matches(self, model: str, vector_size: int) -> bool:
+        """Indica se o conteúdo indexado foi gerado com o mesmo modelo/dimensão."""
+        return self.model == model and self.vector_size == vector_size
+
+    def bump_version(self) -> None:
+        self.version = time.strftime("%Y%m%dT%H%M%S") + f"-{uuid.uuid4().hex[:8]}"
+
+    def save(self) -> None:
+        path = manifest_path(self.collection)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "collection": self.collection,
+                    "model": self.model,
+                    "vector_size": self.vector_size,
+                    "version": self.version,
+                    "points": self.points,
+                },
+                f,
+            )
+        os.replace(tmp, path)
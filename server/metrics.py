@@ -0,0 +1,82 @@
+"""Métricas Prometheus do servidor RAG (expostas em `GET /metrics`).
+
+- `rag_stage_duration_seconds{stage}`: histograma por estágio do pipeline
+  (`rewrite`, `embed`, `retrieve`, `rerank`, `prompt`, `llm`);
+- `rag_request_duration_seconds{endpoint,cached}`: latência total por endpoint;
+- `rag_requests_in_flight{endpoint}`: requisições em andamento;
+- `rag_llm_in_flight` / `rag_llm_queued`: chamadas ao LLM em execução e na
+  fila do `ConcurrencyLimiter` (lidos no momento da coleta);
+- `rag_collection_searches_total{collection}`: buscas por coleção após o
+  roteamento (server/routing.py);
+- `rag_rewrite_duration_seconds{outcome}`: reescrita da pergunta por
+  resultado (`skipped`, `cached`, `llm`, `error`; server/query_rewriter.py).
+
+Os buckets vão até 10 minutos: com modelos grandes em CPU a geração sozinha
+passa de 2 minutos.
+"""
+
+from typing import Callable, Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300, 600
+)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Duração de cada estágio do pipeline RAG.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "rag_request_duration_seconds",
+    "Duração total das requisições de consulta.",
+    ["endpoint", "cached"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "rag_requests_in_flight",
+    "Requisições de consulta em andamento.",
+    ["endpoint"],
+)
+LLM_IN_FLIGHT = Gauge("rag_llm_in_flight", "Chamadas ao LLM em execução.")
+LLM_QUEUED = Gauge("rag_llm_queued", "Chamadas ao LLM aguardando uma vaga.")
+REWRITE_LATENCY = Histogram(
+    "rag_rewrite_duration_seconds",
+    "Duração da reescrita da pergunta, por resultado.",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+COLLECTION_SEARCHES = Counter(
+    "rag_collection_searches",
+    "Buscas por coleção após o roteamento.",
+    ["collection"],
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+
+
+def observe_request(endpoint: str, cached: bool, seconds: float) -> None:
+    REQUEST_LATENCY.labels(endpoint=endpoint, cached=str(cached).lower()).observe(seconds)
+
+
+def observe_rewrite(outcome: str, seconds: float) -> None:
+    REWRITE_LATENCY.labels(outcome=outcome).observe(seconds)
+
+
+def observe_route(collections: Iterable[str]) -> None:
+    for name in collections:
+        COLLECTION_SEARCHES.labels(collection=name).inc()
+
+
+def track_llm_limiter(in_flight: Callable[[], float], queued: Callable[[], float]) -> None:
+    LLM_IN_FLIGHT.set_function(in_flight)
+    LLM_QUEUED.set_function(queued)
+
+
+def render() -> bytes:
+    return generate_latest()
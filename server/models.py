@@ -3,18 +3,34 @@
 Aqui poderemos implementar clients para:
 - Ollama (LLM e embeddings locais).
 - Outros providers (OpenAI, etc.), se desejado.
+
+Os clients síncronos (baseados em `requests`) continuam disponíveis para
+scripts. O servidor usa as variantes assíncronas (baseadas em `httpx`), que
+mantêm um pool de conexões keep-alive com o Ollama e não bloqueiam o event
+loop do FastAPI.
 """
 
+import asyncio
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import Any, AsyncIterator, Dict, List
 
+import httpx
 import requests
 
+from .embedding_cache import EmbeddingCache
+
 
 ROOT = Path(__file__).resolve().parents[1]
 CONFIG_DIR = ROOT / "config"
 
+DEFAULT_OLLAMA_BASE_URL = "http://localhost:11434"
+
 
 class EmbeddingsClient:
     def embed(self, texts: List[str]) -> List[List[float]]:
@@ -26,6 +42,26 @@ class LLMClient:
         raise NotImplementedError
 
 
+class AsyncEmbeddingsClient:
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
+
+
+class AsyncLLMClient:
+    async def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Gera a resposta incrementalmente, produzindo trechos de texto."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
+
+
 def load_embedding_config():
     import yaml
 
@@ -34,37 +70,341 @@ def load_embedding_config():
         return yaml.safe_load(f) or {}
 
 
-class OllamaEmbeddingsClient(EmbeddingsClient):
-    def __init__(self, base_url: str | None = None, model: str | None = None) -> None:
+def ollama_base_url(base_url: str | None) -> str:
+    return (base_url or os.getenv("OLLAMA_BASE_URL", DEFAULT_OLLAMA_BASE_URL)).rstrip("/")
+
+
+def make_async_http_client(timeout: float, max_connections: int = 16) -> httpx.AsyncClient:
+    """Cria um `httpx.AsyncClient` com pool de conexões keep-alive.
+
+    Reutilizar o mesmo client evita um handshake TCP por requisição ao Ollama.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=60.0,
+    )
+    return httpx.AsyncClient(timeout=httpx.Timeout(timeout), limits=limits)
+
+
+class ConcurrencyLimiter:
+    """Limita quantas chamadas de um estágio rodam ao mesmo tempo.
+
+    Também expõe quantas estão em execução (`in_flight`) e quantas aguardam
+    uma vaga (`queued`), para que o servidor possa publicar esses gauges.
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency deve ser >= 1")
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+        }
+
+
+@dataclass
+class EmbeddingStats:
+    """Contadores acumulados de um `OllamaEmbeddingEngine`.
+
+    `seconds` soma o tempo de parede de cada chamada a `embed`/`aembed`, de
+    modo que `texts_per_second` já reflete o ganho de lotes concorrentes.
+    """
+
+    texts: int = 0
+    requests: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_request(self, retries: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+
+    def record_call(self, texts: int, seconds: float) -> None:
+        with self._lock:
+            self.texts += texts
+            self.seconds += seconds
+
+    @property
+    def texts_per_second(self) -> float:
+        return self.texts / self.seconds if self.seconds > 0 else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "texts": self.texts,
+            "requests": self.requests,
+            "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+            "texts_per_second": round(self.texts_per_second, 2),
+        }
+
+
+class _RetryableError(RuntimeError):
+    pass
+
+
+def _cache_from_config(cfg: Dict[str, Any], model: str) -> EmbeddingCache | None:
+    cache_cfg = cfg.get("cache") or {}
+    if not cache_cfg.get("enabled", False):
+        return None
+    path = Path(cache_cfg.get("path", "data/cache/embeddings.sqlite"))
+    if not path.is_absolute():
+        path = ROOT / path
+    return EmbeddingCache(path, model=model, max_entries=cache_cfg.get("max_entries", 200_000))
+
+
+class OllamaEmbeddingEngine:
+    """Engine de embeddings em lote usada pelo indexador e pelo servidor.
+
+    Usa o endpoint `/api/embed` do Ollama, que aceita vários textos por
+    requisição, dividindo a entrada em lotes de `batch_size` e enviando até
+    `concurrency` lotes em paralelo. Falhas de rede, 429 e 5xx são refeitas
+    até `max_retries` vezes com backoff exponencial.
+
+    Os parâmetros vêm de config/embedding.yaml (`batch_size`, `concurrency`,
+    `max_retries`, `retry_backoff`) e podem ser sobrescritos no construtor.
+    `embed` é síncrono (threads); `aembed` é a variante assíncrona.
+
+    Se `cache.enabled` estiver ativo em embedding.yaml, os vetores passam por
+    um `EmbeddingCache` em disco e só os textos ausentes vão ao Ollama.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str | None = None,
+        batch_size: int | None = None,
+        concurrency: int | None = None,
+        max_retries: int | None = None,
+        retry_backoff: float | None = None,
+        expected_dim: int | None = None,
+        timeout: float = 120,
+        cache: EmbeddingCache | None = None,
+    ) -> None:
         cfg = load_embedding_config()
-        self.base_url = (base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")).rstrip("/")
+        provider = cfg.get("provider", "ollama")
+        if provider != "ollama":
+            raise RuntimeError(f"Provider de embeddings não suportado: {provider!r}")
+
+        self.base_url = ollama_base_url(base_url)
         self.model = model or cfg.get("model", "nomic-embed-text")
+        self.batch_size = max(1, int(batch_size or cfg.get("batch_size", 32)))
+        self.concurrency = max(1, int(concurrency or cfg.get("concurrency", 4)))
+        self.max_retries = int(max_retries if max_retries is not None else cfg.get("max_retries", 3))
+        self.retry_backoff = float(
+            retry_backoff if retry_backoff is not None else cfg.get("retry_backoff", 0.5)
+        )
+        self.expected_dim = expected_dim
+        self.timeout = timeout
+        self.stats = EmbeddingStats()
+        self.cache = cache if cache is not None else _cache_from_config(cfg, self.model)
 
-    def embed(self, texts: List[str]) -> List[List[float]]:
-        url = f"{self.base_url}/api/embeddings"
-        vectors: List[List[float]] = []
-        for idx, text in enumerate(texts):
-            resp = requests.post(
-                url,
-                json={"model": self.model, "prompt": text},
-                timeout=60,
+        self._local = threading.local()
+        self._http: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/api/embed"
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def _parse(self, status_code: int, body: str, data: Any, expected: int) -> List[List[float]]:
+        if status_code == 429 or status_code >= 500:
+            raise _RetryableError(
+                f"Falha ao obter embeddings via Ollama (status {status_code}): {body}"
             )
-            if resp.status_code != 200:
-                raise RuntimeError(
-                    f"Falha ao obter embedding via Ollama (status {resp.status_code}) "
-                    f"para item {idx}: {resp.text}"
+        if status_code != 200:
+            raise RuntimeError(
+                f"Falha ao obter embeddings via Ollama (status {status_code}): {body}"
+            )
+        vectors = (data or {}).get("embeddings")
+        if vectors is None:
+            raise RuntimeError("Resposta de embeddings do Ollama não contém campo 'embeddings'")
+        if len(vectors) != expected:
+            raise RuntimeError(
+                f"Ollama retornou {len(vectors)} embeddings para um lote de {expected} textos."
+            )
+        if self.expected_dim is not None:
+            for vec in vectors:
+                if len(vec) != self.expected_dim:
+                    raise RuntimeError(
+                        f"Dimensão do embedding ({len(vec)}) diferente do esperado ({self.expected_dim})."
+                    )
+        return vectors
+
+    def _backoff(self, attempt: int) -> float:
+        return self.retry_backoff * (2 ** attempt)
+
+    # --- API síncrona -----------------------------------------------------
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                resp = self._session().post(
+                    self.url,
+                    json={"model": self.model, "input": batch},
+                    timeout=self.timeout,
                 )
-            data = resp.json()
-            vec = data.get("embedding")
-            if vec is None:
-                raise RuntimeError("Resposta de embeddings do Ollama não contém campo 'embedding'")
-            vectors.append(vec)
+                data = resp.json() if resp.status_code == 200 else None
+                vectors = self._parse(resp.status_code, resp.text, data, len(batch))
+                break
+            except (requests.ConnectionError, requests.Timeout, _RetryableError):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+        self.stats.record_request(attempt)
+        return vectors
+
+    def _from_cache(self, texts: List[str], prefix: str) -> List[List[float] | None]:
+        if self.cache is None:
+            return [None] * len(texts)
+        return self.cache.get_many(prefix, texts)
+
+    def _fill(
+        self,
+        texts: List[str],
+        prefix: str,
+        vectors: List[List[float] | None],
+        computed: List[List[float]],
+    ) -> List[List[float]]:
+        """Preenche as lacunas de `vectors` com `computed` e grava no cache."""
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        for i, vec in zip(missing, computed):
+            vectors[i] = vec
+        if self.cache is not None and missing:
+            self.cache.put_many(prefix, [texts[i] for i in missing], computed)
+        return vectors  # type: ignore[return-value]
+
+    def embed(self, texts: List[str], prefix: str = "") -> List[List[float]]:
+        """Gera embeddings para `texts` (na ordem de entrada)."""
+        started = time.perf_counter()
+        vectors = self._from_cache(texts, prefix)
+        batches = self._batches([prefix + t for t, v in zip(texts, vectors) if v is None])
+        if len(batches) <= 1 or self.concurrency == 1:
+            results = [self._embed_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        computed = [vec for batch_vectors in results for vec in batch_vectors]
+        vectors = self._fill(texts, prefix, vectors, computed)
+        self.stats.record_call(len(texts), time.perf_counter() - started)
         return vectors
 
+    # --- API assíncrona ---------------------------------------------------
+
+    async def _aembed_batch(self, batch: List[str]) -> List[List[float]]:
+        if self._http is None:
+            self._http = make_async_http_client(
+                timeout=self.timeout, max_connections=self.concurrency
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            attempt = 0
+            while True:
+                try:
+                    resp = await self._http.post(
+                        self.url, json={"model": self.model, "input": batch}
+                    )
+                    data = resp.json() if resp.status_code == 200 else None
+                    vectors = self._parse(resp.status_code, resp.text, data, len(batch))
+                    break
+                except (httpx.TransportError, _RetryableError):
+                    if attempt >= self.max_retries:
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+            self.stats.record_request(attempt)
+        return vectors
+
+    async def aembed(self, texts: List[str], prefix: str = "") -> List[List[float]]:
+        """Variante assíncrona de `embed`; lotes concorrentes via semáforo."""
+        started = time.perf_counter()
+        vectors = await asyncio.to_thread(self._from_cache, texts, prefix)
+        batches = self._batches([prefix + t for t, v in zip(texts, vectors) if v is None])
+        results = await asyncio.gather(*(self._aembed_batch(b) for b in batches))
+        computed = [vec for batch_vectors in results for vec in batch_vectors]
+        vectors = await asyncio.to_thread(self._fill, texts, prefix, vectors, computed)
+        self.stats.record_call(len(texts), time.perf_counter() - started)
+        return vectors
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = self.stats.snapshot()
+        if self.cache is not None:
+            data["cache"] = self.cache.snapshot()
+        return data
+
+    def close(self) -> None:
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            session.close()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+
+class OllamaEmbeddingsClient(EmbeddingsClient):
+    """Client síncrono de embeddings; delega para `OllamaEmbeddingEngine`."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str | None = None,
+        engine: OllamaEmbeddingEngine | None = None,
+    ) -> None:
+        self.engine = engine or OllamaEmbeddingEngine(base_url=base_url, model=model)
+        self.base_url = self.engine.base_url
+        self.model = self.engine.model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.engine.embed(texts)
+
 
 class OllamaLLMClient(LLMClient):
     def __init__(self, base_url: str | None = None, model: str | None = None) -> None:
-        self.base_url = (base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")).rstrip("/")
+        self.base_url = ollama_base_url(base_url)
         self.model = model or os.getenv("OLLAMA_CHAT_MODEL", "phi3:medium")
 
     def generate(self, prompt: str) -> str:
@@ -85,3 +425,103 @@ class OllamaLLMClient(LLMClient):
         if not content:
             raise RuntimeError("Resposta do Ollama não contém conteúdo em 'message.content'")
         return content
+
+
+class AsyncOllamaEmbeddingsClient(AsyncEmbeddingsClient):
+    """Versão assíncrona de `OllamaEmbeddingsClient` (lotes via `/api/embed`)."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str | None = None,
+        engine: OllamaEmbeddingEngine | None = None,
+    ) -> None:
+        self.engine = engine or OllamaEmbeddingEngine(base_url=base_url, model=model)
+        self.base_url = self.engine.base_url
+        self.model = self.engine.model
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return await self.engine.aembed(texts)
+
+    async def aclose(self) -> None:
+        await self.engine.aclose()
+
+
+class AsyncOllamaLLMClient(AsyncLLMClient):
+    """Versão assíncrona de `OllamaLLMClient`.
+
+    As gerações passam por um `ConcurrencyLimiter` (default: variável
+    `LLM_MAX_CONCURRENCY`, ou 2), para não sobrecarregar o Ollama e permitir
+    medir a fila de espera do estágio de LLM.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str | None = None,
+        max_concurrency: int | None = None,
+        http_client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.base_url = ollama_base_url(base_url)
+        self.model = model or os.getenv("OLLAMA_CHAT_MODEL", "phi3:medium")
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+        self.limiter = ConcurrencyLimiter(max_concurrency)
+        self._http = http_client or make_async_http_client(
+            timeout=300, max_connections=max(max_concurrency, 1)
+        )
+
+    async def generate(self, prompt: str) -> str:
+        url = f"{self.base_url}/api/chat"
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": False,
+        }
+        async with self.limiter:
+            resp = await self._http.post(url, json=payload)
+        if resp.status_code != 200:
+            raise RuntimeError(
+                f"Falha ao gerar resposta via Ollama (status {resp.status_code}): {resp.text}"
+            )
+        data = resp.json()
+        message = data.get("message") or {}
+        content = message.get("content")
+        if not content:
+            raise RuntimeError("Resposta do Ollama não contém conteúdo em 'message.content'")
+        return content
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Faz streaming da resposta do Ollama (`stream: true`).
+
+        O Ollama envia uma linha JSON por trecho gerado; cada `message.content`
+        não vazio é repassado assim que chega. A vaga no limiter fica ocupada
+        até o fim do stream.
+        """
+        url = f"{self.base_url}/api/chat"
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        }
+        async with self.limiter:
+            async with self._http.stream("POST", url, json=payload) as resp:
+                if resp.status_code != 200:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")
+                    raise RuntimeError(
+                        f"Falha ao gerar resposta via Ollama (status {resp.status_code}): {body}"
+                    )
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(f"Erro do Ollama durante o streaming: {data['error']}")
+                    content = (data.get("message") or {}).get("content")
+                    if content:
+                        yield content
+                    if data.get("done"):
+                        break
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
@@ -0,0 +1,78 @@
+"""Conexão com o Qdrant a partir de `QDRANT_URL`.
+
+Além de um servidor (`http://...`/`https://...`), aceita os modos do
+qdrant-client que rodam no próprio processo, sem rede:
+
+- `:memory:` – coleção efêmera, some quando o processo termina;
+- um caminho local (`data/qdrant`, `/tmp/qdrant` ou `path:...`) – persistido
+  em disco; relativo à raiz do repositório. Só um processo por vez pode
+  abrir o diretório (ex.: rodar o indexador e depois o servidor).
+
+Servidor, indexador e eval usam as mesmas funções, então o modo é escolhido
+só pela variável de ambiente.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_QDRANT_URL = "http://localhost:6333"
+MEMORY = ":memory:"
+
+
+def qdrant_url() -> str:
+    return os.getenv("QDRANT_URL") or DEFAULT_QDRANT_URL
+
+
+def qdrant_location(url: Optional[str] = None) -> Dict[str, Any]:
+    """Argumentos de `QdrantClient`/`AsyncQdrantClient` para `url`."""
+    url = url or qdrant_url()
+    if url == MEMORY:
+        return {"location": MEMORY}
+    if url.startswith(("http://", "https://")):
+        return {"url": url, "api_key": os.getenv("QDRANT_API_KEY") or None}
+    if url.startswith("path:"):
+        url = url[len("path:"):]
+    path = Path(url).expanduser()
+    if not path.is_absolute():
+        path = ROOT / path
+    return {"path": str(path)}
+
+
+def is_local(url: Optional[str] = None) -> bool:
+    return "url" not in qdrant_location(url)
+
+
+_memory_state_dir: Optional[Path] = None
+
+
+def local_state_dir(url: Optional[str] = None) -> Optional[Path]:
+    """Onde guardar manifestos/índice BM25 quando o Qdrant roda no processo.
+
+    Eles descrevem o conteúdo da coleção, então não podem se misturar com os
+    de data/index/ (que descrevem o servidor Qdrant): num caminho local ficam
+    em `<caminho>/rag_index`; em `:memory:`, num diretório temporário do
+    processo. Para um servidor, retorna None (vale o default).
+    """
+    global _memory_state_dir
+    location = qdrant_location(url)
+    if "path" in location:
+        return Path(location["path"]) / "rag_index"
+    if location.get("location") == MEMORY:
+        if _memory_state_dir is None:
+            _memory_state_dir = Path(tempfile.mkdtemp(prefix="rag_index_"))
+        return _memory_state_dir
+    return None
+
+
+def make_qdrant_client(url: Optional[str] = None) -> QdrantClient:
+    return QdrantClient(**qdrant_location(url))
+
+
+def make_async_qdrant_client(url: Optional[str] = None) -> AsyncQdrantClient:
+    return AsyncQdrantClient(**qdrant_location(url))
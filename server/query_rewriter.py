@@ -0,0 +1,241 @@
+"""Reescrita de perguntas de follow-up usando o histórico da conversa.
+
+"E como mudo a cor dela?" não serve como query de busca; a reescrita troca
+as referências pelo que elas significam no histórico ("Como mudar a cor de
+uma borda no lipgloss?"). Para não somar uma ida ao LLM a toda requisição:
+
+- sem histórico, ou com uma pergunta que já se sustenta sozinha (longa o
+  bastante e sem pronomes/referências como "isso", "ele", "it", "that"), o
+  LLM não é chamado;
+- só as últimas `max_history_turns` mensagens vão no prompt, cada uma
+  truncada em `max_message_chars`;
+- usa um modelo próprio (`model`, `OLLAMA_REWRITE_MODEL`; de preferência
+  pequeno e rápido), com limite de tokens gerados e sem concorrer pela fila
+  do LLM de resposta;
+- o resultado fica num cache LRU por (hash do histórico truncado, pergunta);
+- erro, timeout ou saída estranha do modelo caem para a pergunta original.
+
+Cada reescrita é medida em `rag_rewrite_duration_seconds{outcome}`
+(`skipped`, `cached`, `llm`, `error`). Parâmetros em config/retrieval.yaml,
+seção `query_rewrite`.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .answer_cache import normalize_query
+from .metrics import observe_rewrite
+from .models import ConcurrencyLimiter, make_async_http_client, ollama_base_url
+
+
+# Palavras que indicam que a pergunta depende do histórico (pt e en).
+REFERENCE_WORDS = frozenset(
+    """
+    ele ela eles elas dele dela deles delas nele nela neles nelas
+    isso isto aquilo disso disto daquilo nisso nisto naquilo
+    esse essa esses essas este esta estes estas desse dessa deste desta
+    nesse nessa neste nesta aquele aquela daquele daquela
+    mesmo mesma anterior acima outro outra também tambem
+    it its they them their this that these those there one ones
+    same above previous former latter also
+    """.split()
+)
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+def history_key(history: Sequence[Dict[str, Any]]) -> str:
+    data = json.dumps(
+        [[m.get("role"), m.get("content")] for m in history],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class RewriteStats:
+    skipped: int = 0
+    cache_hits: int = 0
+    llm_calls: int = 0
+    errors: int = 0
+    total_llm_ms: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "skipped": self.skipped,
+            "cache_hits": self.cache_hits,
+            "llm_calls": self.llm_calls,
+            "errors": self.errors,
+            "avg_llm_ms": round(self.total_llm_ms / self.llm_calls, 2) if self.llm_calls else 0.0,
+        }
+
+
+class QueryRewriter:
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_history_turns: int = 5,
+        max_message_chars: int = 500,
+        min_words: int = 4,
+        max_tokens: int = 64,
+        timeout_seconds: float = 10.0,
+        max_concurrency: int = 4,
+        cache_max_entries: int = 2000,
+        cache_ttl_seconds: float = 3600,
+    ) -> None:
+        self.base_url = ollama_base_url(base_url)
+        self.model = model or os.getenv("OLLAMA_REWRITE_MODEL") or os.getenv(
+            "OLLAMA_CHAT_MODEL", "phi3:medium"
+        )
+        self.max_history_turns = max(0, int(max_history_turns))
+        self.max_message_chars = max_message_chars
+        self.min_words = min_words
+        self.max_tokens = max_tokens
+        self.timeout_seconds = timeout_seconds
+        self.cache_max_entries = max(1, int(cache_max_entries))
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.stats = RewriteStats()
+        self.limiter = ConcurrencyLimiter(max_concurrency)
+        self._http = make_async_http_client(
+            timeout=timeout_seconds, max_connections=max(max_concurrency, 1)
+        )
+        # (hash do histórico, pergunta normalizada) -> (reescrita, criado em), em ordem LRU
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> Optional["QueryRewriter"]:
+        section = cfg.get("query_rewrite") or {}
+        if not section.get("enabled", False):
+            return None
+        cache = section.get("cache") or {}
+        return cls(
+            model=section.get("model"),
+            max_history_turns=int(section.get("max_history_turns", 5)),
+            max_message_chars=int(section.get("max_message_chars", 500)),
+            min_words=int(section.get("min_words", 4)),
+            max_tokens=int(section.get("max_tokens", 64)),
+            timeout_seconds=float(section.get("timeout_seconds", 10)),
+            max_concurrency=int(section.get("max_concurrency", 4)),
+            cache_max_entries=int(cache.get("max_entries", 2000)),
+            cache_ttl_seconds=float(cache.get("ttl_seconds", 3600)),
+        )
+
+    def truncate(self, history: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Últimas `max_history_turns` mensagens com conteúdo."""
+        if self.max_history_turns == 0:
+            return []
+        messages = [m for m in history if str(m.get("content") or "").strip()]
+        return messages[-self.max_history_turns:]
+
+    def needs_rewrite(self, history: Sequence[Dict[str, Any]], query: str) -> bool:
+        """Heurística: só reescreve perguntas curtas ou com referências ao histórico."""
+        if not history:
+            return False
+        words = _WORDS.findall(query.lower())
+        return len(words) < self.min_words or any(w in REFERENCE_WORDS for w in words)
+
+    def _prompt(self, history: Sequence[Dict[str, Any]], query: str) -> str:
+        lines = []
+        for m in history:
+            role = "Usuário" if m.get("role") == "user" else "Assistente"
+            content = " ".join(str(m.get("content") or "").split())
+            lines.append(f"{role}: {content[: self.max_message_chars]}")
+        return (
+            "Reescreva a última pergunta do usuário como uma pergunta completa e "
+            "autônoma para busca em documentação, substituindo pronomes e "
+            "referências pelo que significam na conversa. Mantenha o idioma da "
+            "pergunta e nomes de bibliotecas/funções. Se ela já for autônoma, "
+            "repita-a.\n\n"
+            "Conversa:\n" + "\n".join(lines) + "\n\n"
+            f"Última pergunta: {query}\n\n"
+            "Responda apenas com a pergunta reescrita, numa linha, sem explicações."
+        )
+
+    def _clean(self, content: str, query: str) -> str:
+        lines = [line.strip() for line in content.strip().splitlines() if line.strip()]
+        if not lines:
+            return query
+        text = re.sub(r"^(pergunta reescrita|rewritten question)\s*:\s*", "", lines[0], flags=re.I)
+        text = text.strip().strip("\"'“”`").strip()
+        # Modelo pequeno divagando: mais vale a pergunta original.
+        if not text or len(text) > max(4 * len(query), 300):
+            return query
+        return text
+
+    async def _generate(self, history: Sequence[Dict[str, Any]], query: str) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": self._prompt(history, query)}],
+            "stream": False,
+            "options": {"temperature": 0, "num_predict": self.max_tokens},
+        }
+        async with self.limiter:
+            resp = await self._http.post(f"{self.base_url}/api/chat", json=payload)
+        if resp.status_code != 200:
+            raise RuntimeError(
+                f"Falha na reescrita via Ollama (status {resp.status_code}): {resp.text}"
+            )
+        return (resp.json().get("message") or {}).get("content") or ""
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        text, created = entry
+        if self.cache_ttl_seconds > 0 and time.time() - created > self.cache_ttl_seconds:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return text
+
+    def _store(self, key: Tuple[str, str], text: str) -> None:
+        self._cache[key] = (text, time.time())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+
+    async def rewrite(self, history: Sequence[Dict[str, Any]], query: str) -> str:
+        started = time.perf_counter()
+        history = self.truncate(history)
+        if not self.needs_rewrite(history, query):
+            self.stats.skipped += 1
+            observe_rewrite("skipped", time.perf_counter() - started)
+            return query
+
+        key = (history_key(history), normalize_query(query))
+        text = self._cached(key)
+        if text is not None:
+            self.stats.cache_hits += 1
+            observe_rewrite("cached", time.perf_counter() - started)
+            return text
+
+        try:
+            text = self._clean(await self._generate(history, query), query)
+        except Exception:  # inclui timeout do httpx: segue com a pergunta original
+            self.stats.errors += 1
+            observe_rewrite("error", time.perf_counter() - started)
+            return query
+        seconds = time.perf_counter() - started
+        self.stats.llm_calls += 1
+        self.stats.total_llm_ms += seconds * 1000.0
+        observe_rewrite("llm", seconds)
+        self._store(key, text)
+        return text
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "cache_entries": len(self._cache),
+            **self.stats.snapshot(),
+        }
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
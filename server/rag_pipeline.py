@@ -7,12 +7,19 @@ Responsabilidades previstas:
 - Montagem do contexto final para o modelo de linguagem.
 """
 
+import asyncio
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, models
 
-from .models import EmbeddingsClient
+from .chunk_store import ChunkStore, ChunkStoreError
+from .filters import Filters, doc_matches, to_qdrant_filter
+from .models import AsyncEmbeddingsClient
+from .query_rewriter import QueryRewriter
+from .rerankers import Reranker, RerankStats, ScoreSortReranker, rerank_with_budget
+from .text_index import TextIndex
+from .vector_index import VectorIndex
 
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -30,73 +37,394 @@ def _load_retrieval_config() -> Dict[str, Any]:
 RETRIEVAL_CFG = _load_retrieval_config()
 
 
-def rewrite_query(history: List[Dict[str, Any]], query: str) -> str:
+async def rewrite_query(
+    history: List[Dict[str, Any]],
+    query: str,
+    rewriter: Optional[QueryRewriter] = None,
+) -> str:
     """Reescreve a query do usuário usando o histórico de conversa.
 
-    Futuro: usar um LLM para condensar a pergunta com base no histórico.
-    Por enquanto, apenas retorna a query original.
+    Sem `rewriter` (`query_rewrite.enabled: false`), devolve a query original.
+    Ver `server/query_rewriter.py` para as heurísticas que evitam o LLM e o
+    cache de reescritas.
     """
-    return query
+    if rewriter is None:
+        return query
+    return await rewriter.rewrite(history, query)
+
+
+async def embed_query(query: str, embeddings: AsyncEmbeddingsClient) -> List[float]:
+    """Embedding de uma query de busca (prefixo `search_query: `)."""
+    return (await embed_queries([query], embeddings))[0]
+
+
+async def embed_queries(
+    queries: Sequence[str], embeddings: AsyncEmbeddingsClient
+) -> List[List[float]]:
+    """Embeddings de várias queries numa única chamada em lote."""
+    return await embeddings.embed([f"search_query: {q}" for q in queries])
+
+
+def retrieval_section(name: str) -> Dict[str, Any]:
+    return RETRIEVAL_CFG.get("retrieval", {}).get(name, {}) or {}
+
+
+def _point_to_doc(point: Any, score: Optional[float] = None) -> Dict[str, Any]:
+    payload = point.payload or {}
+    text = payload.get("text", "")
+    metadata = {k: v for k, v in payload.items() if k != "text"}
+    return {
+        "id": point.id,
+        "score": point.score if score is None else score,
+        "text": text,
+        "metadata": metadata,
+    }
+
 
+def _min_max(hits: Sequence[Tuple[str, float]]) -> Dict[str, float]:
+    if not hits:
+        return {}
+    scores = [s for _, s in hits]
+    lo, hi = min(scores), max(scores)
+    if hi == lo:
+        return {pid: 1.0 for pid, _ in hits}
+    return {pid: (s - lo) / (hi - lo) for pid, s in hits}
 
-def retrieve(
+
+def fuse_hits(
+    vector_hits: Sequence[Tuple[str, float]],
+    text_hits: Sequence[Tuple[str, float]],
+    alpha: float,
+    method: str = "weighted",
+    rrf_k: int = 60,
+) -> List[Tuple[str, float]]:
+    """Combina os rankings vetorial e textual.
+
+    - `weighted`: `alpha * vetorial + (1 - alpha) * textual`, com cada lista
+      normalizada para [0, 1] (min-max);
+    - `rrf`: Reciprocal Rank Fusion, `alpha / (k + rank_v) + (1 - alpha) / (k + rank_t)`.
+    """
+    fused: Dict[str, float] = {}
+    if method == "rrf":
+        for weight, hits in ((alpha, vector_hits), (1.0 - alpha, text_hits)):
+            for rank, (pid, _) in enumerate(hits, start=1):
+                fused[pid] = fused.get(pid, 0.0) + weight / (rrf_k + rank)
+    else:
+        vec_norm = _min_max(vector_hits)
+        text_norm = _min_max(text_hits)
+        for pid in set(vec_norm) | set(text_norm):
+            fused[pid] = alpha * vec_norm.get(pid, 0.0) + (1.0 - alpha) * text_norm.get(pid, 0.0)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+async def retrieve(
     query: str,
-    client: QdrantClient,
-    embeddings: EmbeddingsClient,
+    client: AsyncQdrantClient,
+    embeddings: AsyncEmbeddingsClient,
     collection_name: str,
+    query_vector: Optional[List[float]] = None,
+    text_index: Optional[TextIndex] = None,
+    search_params: Optional[models.SearchParams] = None,
+    filters: Optional[Filters] = None,
+    vector_index: Optional[VectorIndex] = None,
 ) -> List[Dict[str, Any]]:
-    """Faz a busca inicial em Qdrant.
+    """Faz a busca inicial (vetorial no Qdrant, opcionalmente híbrida).
 
-    Implementação atual: busca vetorial simples usando o embedding da query.
     Os parâmetros são lidos de config/retrieval.yaml (seção retrieval.vector.top_k).
+    Tanto o embedding quanto a busca são assíncronos, para não bloquear o
+    event loop do servidor. Se `query_vector` for informado, o embedding já
+    calculado é reaproveitado.
+
+    Com `text_index` (BM25 local) e `retrieval.hybrid.alpha < 1`, a busca
+    textual (`retrieval.text.top_k`) roda em paralelo com a vetorial e os
+    resultados são fundidos por `retrieval.hybrid.method` (`weighted` ou
+    `rrf`). Documentos encontrados só pelo texto têm o payload buscado no
+    Qdrant pelo ID. O resultado tem até `vector.top_k` documentos.
+
+    `search_params` (`ef` do HNSW, rescore da quantização) vem da coleção em
+    config/collections.yaml (ver `server/collection_config.py`).
+
+    `filters` (campo -> valores aceitos, ver `server/filters.py`) vira um
+    filtro do Qdrant aplicado durante a busca vetorial; os achados só pelo
+    BM25, que não conhece metadados, são filtrados depois de carregados.
+
+    Com `vector_index` (coleção com `backend: numpy`, ver
+    `server/vector_index.py`) a busca vetorial é exata, no próprio processo,
+    e o Qdrant não é consultado.
     """
 
-    vector_top_k = (
-        RETRIEVAL_CFG.get("retrieval", {})
-        .get("vector", {})
-        .get("top_k", 40)
-    )
+    vector_top_k = retrieval_section("vector").get("top_k", 40)
+    query_vec = query_vector or await embed_query(query, embeddings)
 
-    query_vec = embeddings.embed([f"search_query: {query}"])[0]
+    if vector_index is not None:
+        points = vector_index.search(query_vec, vector_top_k, filters)
+        if not _hybrid_enabled(text_index):
+            return [_point_to_doc(r) for r in points]
+        text_hits = await _text_search(text_index, query)
+        return await _merge_hybrid(
+            points, text_hits, client, collection_name, filters, vector_index
+        )
 
-    results = client.search(
+    vector_search = client.query_points(
         collection_name=collection_name,
-        query_vector=query_vec,
+        query=query_vec,
         limit=vector_top_k,
         with_payload=True,
         with_vectors=False,
+        search_params=search_params,
+        query_filter=to_qdrant_filter(filters),
     )
 
-    docs: List[Dict[str, Any]] = []
-    for r in results:
-        payload = r.payload or {}
-        text = payload.get("text", "")
-        metadata = {k: v for k, v in payload.items() if k != "text"}
-
-        docs.append(
-            {
-                "id": r.id,
-                "score": r.score,
-                "text": text,
-                "metadata": metadata,
-            }
+    if not _hybrid_enabled(text_index):
+        response = await vector_search
+        return [_point_to_doc(r) for r in response.points]
+
+    response, text_hits = await asyncio.gather(
+        vector_search, _text_search(text_index, query)
+    )
+    return await _merge_hybrid(response.points, text_hits, client, collection_name, filters)
+
+
+async def retrieve_batch(
+    queries: Sequence[str],
+    client: AsyncQdrantClient,
+    collection_name: str,
+    query_vectors: Sequence[List[float]],
+    text_index: Optional[TextIndex] = None,
+    search_params: Optional[models.SearchParams] = None,
+    filters: Optional[Sequence[Optional[Filters]]] = None,
+    vector_index: Optional[VectorIndex] = None,
+) -> List[List[Dict[str, Any]]]:
+    """`retrieve` para várias queries com os embeddings já calculados.
+
+    As buscas vetoriais vão numa única chamada `query_batch_points` (um
+    round trip ao Qdrant para o lote inteiro); as textuais, se houver busca
+    híbrida, rodam em threads enquanto isso. Devolve uma lista de documentos
+    por query, na mesma ordem. `filters`, se informado, tem um filtro (ou
+    None) por query. Com `vector_index`, o lote inteiro vira um único
+    produto de matriz local.
+    """
+
+    vector_top_k = retrieval_section("vector").get("top_k", 40)
+    per_query = list(filters) if filters is not None else [None] * len(query_vectors)
+    if vector_index is not None:
+        local = vector_index.search_batch(query_vectors, vector_top_k, per_query)
+        if not _hybrid_enabled(text_index):
+            return [[_point_to_doc(r) for r in points] for points in local]
+        text_hits = await asyncio.gather(*(_text_search(text_index, q) for q in queries))
+        return await asyncio.gather(
+            *(
+                _merge_hybrid(points, hits, client, collection_name, flt, vector_index)
+                for points, hits, flt in zip(local, text_hits, per_query)
+            )
         )
 
+    vector_search = client.query_batch_points(
+        collection_name=collection_name,
+        requests=[
+            models.QueryRequest(
+                query=vec,
+                filter=to_qdrant_filter(flt),
+                limit=vector_top_k,
+                with_payload=True,
+                params=search_params,
+            )
+            for vec, flt in zip(query_vectors, per_query)
+        ],
+    )
+
+    if not _hybrid_enabled(text_index):
+        responses = await vector_search
+        return [[_point_to_doc(r) for r in resp.points] for resp in responses]
+
+    responses, *text_hits = await asyncio.gather(
+        vector_search, *(_text_search(text_index, q) for q in queries)
+    )
+    return await asyncio.gather(
+        *(
+            _merge_hybrid(resp.points, hits, client, collection_name, flt)
+            for resp, hits, flt in zip(responses, text_hits, per_query)
+        )
+    )
+
+
+def _hybrid_enabled(text_index: Optional[TextIndex]) -> bool:
+    alpha = float(retrieval_section("hybrid").get("alpha", 1.0))
+    return text_index is not None and alpha < 1.0
+
+
+async def _text_search(text_index: TextIndex, query: str) -> List[Tuple[str, float]]:
+    text_top_k = retrieval_section("text").get("top_k", 40)
+    return await asyncio.to_thread(text_index.search, query, text_top_k)
+
+
+async def _merge_hybrid(
+    points: Sequence[Any],
+    text_hits: Sequence[Tuple[str, float]],
+    client: AsyncQdrantClient,
+    collection_name: str,
+    filters: Optional[Filters] = None,
+    vector_index: Optional[VectorIndex] = None,
+) -> List[Dict[str, Any]]:
+    vector_top_k = retrieval_section("vector").get("top_k", 40)
+    hybrid_cfg = retrieval_section("hybrid")
+    by_id = {str(r.id): r for r in points}
+    vector_hits = [(str(r.id), r.score) for r in points]
+    fused = fuse_hits(
+        vector_hits,
+        text_hits,
+        alpha=float(hybrid_cfg.get("alpha", 1.0)),
+        method=hybrid_cfg.get("method", "weighted"),
+        rrf_k=int(hybrid_cfg.get("rrf_k", 60)),
+    )[:vector_top_k]
+
+    missing = [pid for pid, _ in fused if pid not in by_id]
+    if missing and vector_index is not None:
+        for point in vector_index.retrieve(missing):
+            by_id[str(point.id)] = point
+    elif missing:
+        for point in await client.retrieve(
+            collection_name=collection_name,
+            ids=missing,
+            with_payload=True,
+            with_vectors=False,
+        ):
+            by_id[str(point.id)] = point
+
+    vec_scores = dict(vector_hits)
+    text_scores = dict(text_hits)
+    docs: List[Dict[str, Any]] = []
+    for pid, score in fused:
+        point = by_id.get(pid)
+        if point is None:
+            # Índice textual mais novo/antigo que a coleção: ignora o ID órfão.
+            continue
+        doc = _point_to_doc(point, score=score)
+        if not doc_matches(doc, filters):
+            continue
+        doc["scores"] = {"vector": vec_scores.get(pid), "text": text_scores.get(pid)}
+        docs.append(doc)
+
     return docs
 
 
-def rerank(query: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def merge_collections(
+    results: Sequence[Tuple[str, List[Dict[str, Any]]]], limit: int
+) -> List[Dict[str, Any]]:
+    """Junta os resultados de várias coleções num único ranking.
+
+    Cada documento recebe `collection`. Com mais de uma coleção, os scores de
+    cada uma são normalizados para [0, 1] (min-max, como na fusão híbrida),
+    já que as distribuições não são comparáveis entre grafos/índices
+    diferentes; o score original fica em `scores.raw`.
+    """
+    if len(results) == 1:
+        name, docs = results[0]
+        for doc in docs:
+            doc["collection"] = name
+        return docs[:limit]
+
+    merged: List[Dict[str, Any]] = []
+    for name, docs in results:
+        norm = _min_max([(str(i), float(d.get("score") or 0.0)) for i, d in enumerate(docs)])
+        for i, doc in enumerate(docs):
+            doc["collection"] = name
+            doc.setdefault("scores", {})["raw"] = doc.get("score")
+            doc["score"] = norm[str(i)]
+            merged.append(doc)
+    merged.sort(key=lambda d: d["score"], reverse=True)
+    return merged[:limit]
+
+
+def _store_for(
+    doc: Dict[str, Any], stores: Mapping[str, Optional[ChunkStore]]
+) -> ChunkStore:
+    name = doc.get("collection") or ""
+    store = stores.get(name)
+    if store is None:
+        raise ChunkStoreError(
+            f"Coleção {name}: documentos sem texto (payload slim) e nenhum chunk "
+            "store; rode scripts/index_qdrant.py para gravá-lo"
+        )
+    return store
+
+
+def available_docs(
+    docs: List[Dict[str, Any]], stores: Mapping[str, Optional[ChunkStore]]
+) -> List[Dict[str, Any]]:
+    """Os documentos que `hydrate_docs` manteria, sem ler o texto.
+
+    Usado antes do rerank para que contagens (ex.: o fallback do filtro
+    automático) já descontem o que a hidratação descartaria.
+    """
+    return [d for d in docs if d.get("text") or str(d["id"]) in _store_for(d, stores)]
+
+
+def hydrate_docs(
+    docs: List[Dict[str, Any]], stores: Mapping[str, Optional[ChunkStore]]
+) -> List[Dict[str, Any]]:
+    """Completa texto e metadados de documentos vindos de payloads `slim`.
+
+    `stores` mapeia coleção -> chunk store (`server/chunk_store.py`).
+    Documentos que já têm texto (payload `full`) passam direto. Sem store
+    para a coleção de um documento sem texto, levanta `ChunkStoreError`: a
+    coleção foi indexada como `slim` e o store sumiu, e responder com o
+    contexto vazio esconderia isso. Um ID ausente de um store existente é de
+    um chunk já removido do corpus (o indexador grava o store antes de apagar
+    os pontos obsoletos) e é descartado, como os IDs órfãos da busca híbrida.
+    """
+    hydrated: List[Dict[str, Any]] = []
+    for doc in docs:
+        if doc.get("text"):
+            hydrated.append(doc)
+            continue
+        chunk = _store_for(doc, stores).get(str(doc["id"]))
+        if chunk is None:
+            continue
+        text, metadata = chunk
+        doc["text"] = text
+        doc["metadata"] = {**metadata, **(doc.get("metadata") or {})}
+        hydrated.append(doc)
+    return hydrated
+
+
+async def rerank(
+    query: str,
+    docs: List[Dict[str, Any]],
+    reranker: Optional[Reranker] = None,
+    stats: Optional[RerankStats] = None,
+    stores: Optional[Mapping[str, Optional[ChunkStore]]] = None,
+) -> List[Dict[str, Any]]:
     """Reranking dos documentos retornados.
 
-    Implementação atual: apenas ordena por score do Qdrant e aplica o top_k
-    configurado em retrieval.rerank.top_k (se enabled=true).
-    Futuro: integrar modelo de reranking dedicado.
+    Se `retrieval.rerank.enabled` for true, pontua todos os candidatos com
+    `reranker` (default: ordenação pelo score da busca) dentro do orçamento
+    `retrieval.rerank.budget_ms` e aplica `retrieval.rerank.top_k`. Ver
+    `server/rerankers.py`.
+
+    Com `stores`, o texto dos documentos é lido do chunk store (`hydrate_docs`)
+    só quando necessário: antes do rerank se o reranker lê o texto, senão
+    apenas para os `top_k` que sobrevivem.
     """
 
-    rerank_cfg = RETRIEVAL_CFG.get("rerank", {})
+    def hydrate(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return hydrate_docs(items, stores) if stores is not None else items
+
+    rerank_cfg = retrieval_section("rerank")
     if not rerank_cfg.get("enabled", False):
-        return docs
+        return hydrate(docs)
 
+    reranker = reranker or ScoreSortReranker()
+    if reranker.needs_text:
+        docs = hydrate(docs)
     top_k = rerank_cfg.get("top_k", len(docs))
-    docs_sorted = sorted(docs, key=lambda d: d.get("score", 0.0), reverse=True)
-    return docs_sorted[:top_k]
+    ranked = await rerank_with_budget(
+        reranker,
+        query,
+        docs,
+        top_k=top_k,
+        budget_ms=rerank_cfg.get("budget_ms"),
+        stats=stats,
+        candidates=rerank_cfg.get("candidates"),
+    )
+    return hydrate(ranked)
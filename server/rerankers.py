@@ -0,0 +1,244 @@
+"""Rerankers plugáveis para o estágio `rerank` do pipeline.
+
+Todos recebem os `candidates` melhores documentos do retrieval (pelo score
+da busca) e devolvem um score por documento numa única chamada em lote; os
+demais seguem depois deles, na ordem da busca. O provider é escolhido em
+config/retrieval.yaml (`retrieval.rerank.provider`):
+
+- `score`: mantém o score da busca (vetorial/híbrida); custo zero.
+- `ollama`: pede a um modelo de chat do Ollama notas de 0 a 10 para todos
+  os candidatos em um único prompt, com saída JSON. As chamadas passam pelo
+  mesmo `ConcurrencyLimiter` da geração de respostas, já que disputam o
+  mesmo Ollama.
+- `cross_encoder`: cross-encoder local em CPU via `sentence-transformers`
+  (dependência opcional, não listada em requirements.txt), numa única
+  thread dedicada.
+
+`rerank_with_budget` aplica o limite de tempo (`budget_ms`): se o reranker
+estourar o orçamento ou falhar, o resultado cai para a ordenação por score.
+O tempo na fila do limiter conta no orçamento.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .models import ConcurrencyLimiter, make_async_http_client, ollama_base_url
+
+
+class Reranker:
+    name = "base"
+    # precisa do texto dos candidatos (com payload slim, lido do chunk store antes)
+    needs_text = True
+
+    async def score(self, query: str, docs: List[Dict[str, Any]]) -> List[float]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
+
+
+class ScoreSortReranker(Reranker):
+    name = "score"
+    needs_text = False
+
+    async def score(self, query: str, docs: List[Dict[str, Any]]) -> List[float]:
+        return [float(d.get("score") or 0.0) for d in docs]
+
+
+def _snippet(doc: Dict[str, Any], max_chars: int) -> str:
+    text = " ".join((doc.get("text") or "").split())
+    return text[:max_chars]
+
+
+class OllamaReranker(Reranker):
+    name = "ollama"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_chars: int = 300,
+        limiter: Optional[ConcurrencyLimiter] = None,
+    ) -> None:
+        self.base_url = ollama_base_url(base_url)
+        self.model = model or os.getenv("OLLAMA_RERANK_MODEL") or os.getenv(
+            "OLLAMA_CHAT_MODEL", "phi3:medium"
+        )
+        self.max_chars = max_chars
+        # Compartilhado com o LLM de resposta (`llm_client.limiter` no servidor).
+        self.limiter = limiter or ConcurrencyLimiter(2)
+        self._http = make_async_http_client(
+            timeout=120, max_connections=self.limiter.max_concurrency
+        )
+
+    def _prompt(self, query: str, docs: List[Dict[str, Any]]) -> str:
+        parts = [f"[{i}] {_snippet(d, self.max_chars)}" for i, d in enumerate(docs)]
+        return (
+            "Avalie a relevância de cada trecho para responder à pergunta, com "
+            "uma nota de 0 (irrelevante) a 10 (responde diretamente).\n\n"
+            f"Pergunta: {query}\n\n"
+            "Trechos:\n" + "\n\n".join(parts) + "\n\n"
+            f'Responda apenas com JSON no formato {{"scores": [n0, n1, ...]}}, '
+            f"com exatamente {len(docs)} notas na ordem dos trechos."
+        )
+
+    async def score(self, query: str, docs: List[Dict[str, Any]]) -> List[float]:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": self._prompt(query, docs)}],
+            "format": "json",
+            "stream": False,
+            # ~3 tokens por nota + o invólucro do JSON
+            "options": {"temperature": 0, "num_predict": 4 * len(docs) + 16},
+        }
+        async with self.limiter:
+            resp = await self._http.post(f"{self.base_url}/api/chat", json=payload)
+        if resp.status_code != 200:
+            raise RuntimeError(
+                f"Falha no reranking via Ollama (status {resp.status_code}): {resp.text}"
+            )
+        content = ((resp.json().get("message") or {}).get("content") or "").strip()
+        scores = (json.loads(content) or {}).get("scores")
+        if not isinstance(scores, list) or len(scores) != len(docs):
+            raise RuntimeError("Saída do reranker Ollama não tem uma nota por documento.")
+        return [float(s) for s in scores]
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+class CrossEncoderReranker(Reranker):
+    name = "cross_encoder"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        max_chars: int = 300,
+        batch_size: int = 32,
+    ) -> None:
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as exc:
+            raise RuntimeError(
+                "rerank.provider=cross_encoder requer o pacote 'sentence-transformers'."
+            ) from exc
+        self.model_name = model or "cross-encoder/ms-marco-MiniLM-L-6-v2"
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+        self._model = CrossEncoder(self.model_name, device="cpu")
+        # Uma predição por vez: o modelo já usa todos os núcleos, e chamadas
+        # canceladas não podem se acumular em threads.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+    def _predict(
+        self, query: str, docs: List[Dict[str, Any]], cancelled: threading.Event
+    ) -> List[float]:
+        pairs = [(query, _snippet(d, self.max_chars)) for d in docs]
+        scores: List[float] = []
+        # Em lotes, para parar logo após o orçamento estourar (`cancelled`).
+        for start in range(0, len(pairs), self.batch_size):
+            if cancelled.is_set():
+                break  # ninguém mais espera o resultado
+            batch = pairs[start : start + self.batch_size]
+            scores.extend(float(s) for s in self._model.predict(batch, batch_size=self.batch_size))
+        return scores
+
+    async def score(self, query: str, docs: List[Dict[str, Any]]) -> List[float]:
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, self._predict, query, docs, cancelled
+            )
+        except asyncio.CancelledError:
+            # `wait_for` desistiu: a thread termina o lote atual e para.
+            cancelled.set()
+            raise
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_reranker(
+    rerank_cfg: Dict[str, Any], limiter: Optional[ConcurrencyLimiter] = None
+) -> Reranker:
+    """`limiter`: o do LLM de resposta, compartilhado pelo provider `ollama`."""
+    provider = rerank_cfg.get("provider", "score")
+    max_chars = int(rerank_cfg.get("max_chars", 300))
+    if provider == "score":
+        return ScoreSortReranker()
+    if provider == "ollama":
+        return OllamaReranker(
+            model=rerank_cfg.get("model"), max_chars=max_chars, limiter=limiter
+        )
+    if provider == "cross_encoder":
+        return CrossEncoderReranker(model=rerank_cfg.get("model"), max_chars=max_chars)
+    raise RuntimeError(f"Provider de reranking não suportado: {provider!r}")
+
+
+@dataclass
+class RerankStats:
+    calls: int = 0
+    fallbacks: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def record(self, ms: float, fallback: bool) -> None:
+        self.calls += 1
+        self.fallbacks += int(fallback)
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+def _by_score(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(docs, key=lambda d: d.get("score", 0.0), reverse=True)
+
+
+async def rerank_with_budget(
+    reranker: Reranker,
+    query: str,
+    docs: List[Dict[str, Any]],
+    top_k: int,
+    budget_ms: Optional[float],
+    stats: Optional[RerankStats] = None,
+    candidates: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Reordena `docs` com `reranker` e corta em `top_k`, dentro de `budget_ms`.
+
+    Só os `candidates` melhores pelo score da busca vão ao reranker (None =
+    todos); os demais ficam depois deles. Em caso de timeout ou erro, usa a
+    ordenação pelo score da busca. O score do reranker fica em
+    `doc["rerank_score"]`; `doc["score"]` não é alterado.
+    """
+    started = time.perf_counter()
+    fallback = False
+    ranked: List[Dict[str, Any]] = _by_score(docs)
+    if docs and not isinstance(reranker, ScoreSortReranker):
+        cut = len(ranked) if candidates is None else max(1, candidates)
+        head, tail = ranked[:cut], ranked[cut:]
+        timeout = budget_ms / 1000.0 if budget_ms else None
+        try:
+            scores = await asyncio.wait_for(reranker.score(query, head), timeout=timeout)
+            for doc, s in zip(head, scores):
+                doc["rerank_score"] = s
+            ranked = sorted(head, key=lambda d: d["rerank_score"], reverse=True) + tail
+        except Exception:  # inclui asyncio.TimeoutError
+            fallback = True
+
+    if stats is not None:
+        stats.record((time.perf_counter() - started) * 1000.0, fallback)
+    return ranked[:top_k]
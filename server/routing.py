@@ -0,0 +1,103 @@
+"""Roteamento de consultas entre as coleções de config/collections.yaml.
+
+Cada coleção tem seu próprio grafo HNSW e índice BM25; uma pergunta é
+buscada só nas coleções relevantes, em paralelo, com o mesmo embedding de
+query (por isso todas precisam ter o mesmo `vector_size`).
+
+A escolha das coleções, em ordem:
+1. `collections` explícito na requisição;
+2. classificador por palavras-chave: coleções cujo `routing.keywords` tem
+   algum termo presente na pergunta (mesma tokenização do BM25, então
+   `tea.Cmd` casa com `tea`; termos com várias palavras exigem todas);
+3. sem nenhum casamento, as coleções com `routing.default: true` (ou todas,
+   se nenhuma for marcada).
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set
+
+from qdrant_client import models
+
+from .chunk_store import ChunkStore, ChunkStoreHandle
+from .collection_config import CollectionConfig
+from .text_index import TextIndexHandle, tokenize
+from .vector_index import VectorIndex, VectorIndexHandle
+
+
+@dataclass
+class SearchTarget:
+    config: CollectionConfig
+    text_index: TextIndexHandle
+    search_params: Optional[models.SearchParams]
+    # só com `backend: numpy`
+    vector_index: Optional[VectorIndexHandle] = None
+    chunk_store: Optional[ChunkStoreHandle] = None
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    def local_vectors(self) -> Optional[VectorIndex]:
+        """Índice vetorial local, se a coleção usa `backend: numpy` e ele já foi
+        gerado pelo indexador; senão None (a busca vai ao Qdrant)."""
+        return self.vector_index.get() if self.vector_index is not None else None
+
+    def store(self) -> Optional[ChunkStore]:
+        """Chunk store local (texto dos documentos com `payload: slim`)."""
+        return self.chunk_store.get() if self.chunk_store is not None else None
+
+
+class UnknownCollectionError(ValueError):
+    pass
+
+
+class CollectionRouter:
+    def __init__(self, collections: Sequence[CollectionConfig]) -> None:
+        if not collections:
+            raise RuntimeError("Nenhuma coleção configurada em config/collections.yaml")
+        sizes = {c.vector_size for c in collections}
+        if len(sizes) > 1:
+            raise RuntimeError(
+                "Todas as coleções precisam do mesmo vector_size (o embedding da query "
+                f"é compartilhado); encontrado: {sorted(sizes)}"
+            )
+        self.targets: Dict[str, SearchTarget] = {
+            c.name: SearchTarget(
+                c,
+                TextIndexHandle(c.name),
+                c.search_params(),
+                VectorIndexHandle(c.name) if c.backend == "numpy" else None,
+                ChunkStoreHandle(c.name),
+            )
+            for c in collections
+        }
+        self.defaults = [c.name for c in collections if c.routing_default] or [
+            c.name for c in collections
+        ]
+        self._keywords: Dict[str, List[Set[str]]] = {
+            c.name: [set(tokenize(kw)) for kw in c.routing_keywords if tokenize(kw)]
+            for c in collections
+        }
+
+    def classify(self, query: str) -> List[str]:
+        tokens = set(tokenize(query))
+        matched = [
+            name
+            for name, keywords in self._keywords.items()
+            if any(kw <= tokens for kw in keywords)
+        ]
+        return matched or list(self.defaults)
+
+    def route(self, query: str, requested: Optional[Sequence[str]] = None) -> List[SearchTarget]:
+        """Coleções a buscar para `query` (levanta UnknownCollectionError)."""
+        if requested:
+            unknown = [name for name in requested if name not in self.targets]
+            if unknown:
+                raise UnknownCollectionError(
+                    f"coleção desconhecida: {', '.join(unknown)} "
+                    f"(disponíveis: {', '.join(self.targets)})"
+                )
+            names = list(dict.fromkeys(requested))
+        else:
+            names = self.classify(query)
+        return [self.targets[name] for name in names]
@@ -0,0 +1,180 @@
+"""Índice textual local (BM25) sobre os chunks, para a busca híbrida.
+
+Construído pelo indexador (`scripts/index_qdrant.py`) a partir do mesmo JSONL
+de chunks e gravado em data/index/<coleção>.text/:
+
+- `meta.json`   – vocabulário (termo -> [offset, df]), IDs dos pontos, avgdl;
+- `postings.npy` – índices de documento (int32) de todos os termos, em sequência;
+- `tfs.npy`      – frequência do termo em cada posting (uint16);
+- `doclens.npy`  – tamanho (em tokens) de cada documento (int32).
+
+No servidor os arrays são abertos com `mmap_mode="r"`, então o índice não é
+carregado inteiro em memória e a busca não tem salto de rede. Os IDs dos
+documentos são os mesmos IDs de ponto do Qdrant (`index_manifest.point_id`).
+"""
+
+import json
+import os
+import re
+import shutil
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .index_manifest import INDEX_DIR
+
+
+# Identificadores com pontos (ex.: `tea.Cmd`, `lipgloss.NewStyle`) ficam inteiros.
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*|\d+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza texto/código para BM25.
+
+    Além do token completo em minúsculas, emite as partes de identificadores
+    com ponto (`tea.cmd` -> `tea`, `cmd`) e em camelCase (`NewProgram` ->
+    `new`, `program`), para que buscas por qualquer uma das formas casem.
+    """
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text):
+        word = match.group(0)
+        tokens.append(word.lower())
+        parts = word.split(".") if "." in word else [word]
+        for part in parts:
+            sub = [p.lower() for p in _CAMEL_RE.findall(part)]
+            if len(parts) > 1:
+                tokens.append(part.lower())
+            if len(sub) > 1:
+                tokens.extend(sub)
+    return tokens
+
+
+def text_index_dir(collection_name: str) -> Path:
+    return INDEX_DIR / f"{collection_name}.text"
+
+
+def replace_dir(tmp_dir: Path, out_dir: Path) -> None:
+    """Troca `out_dir` por `tmp_dir` já completo (leitores nunca veem meio índice)."""
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+
+
+def build_text_index(docs: Iterable[Tuple[str, str]], out_dir: Path) -> int:
+    """Constrói o índice a partir de pares (point_id, texto) e grava em `out_dir`.
+
+    A escrita é feita num diretório temporário e trocada no final, para que o
+    servidor nunca veja um índice pela metade.
+    """
+    ids: List[str] = []
+    doclens: List[int] = []
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+    for point_id, text in docs:
+        doc_idx = len(ids)
+        ids.append(point_id)
+        tokens = tokenize(text)
+        doclens.append(len(tokens))
+        counts: Dict[str, int] = defaultdict(int)
+        for tok in tokens:
+            counts[tok] += 1
+        for tok, tf in counts.items():
+            postings[tok].append((doc_idx, tf))
+
+    terms: Dict[str, List[int]] = {}
+    doc_arr: List[int] = []
+    tf_arr: List[int] = []
+    for term in sorted(postings):
+        plist = postings[term]
+        terms[term] = [len(doc_arr), len(plist)]
+        for doc_idx, tf in plist:
+            doc_arr.append(doc_idx)
+            tf_arr.append(min(tf, np.iinfo(np.uint16).max))
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "postings.npy", np.asarray(doc_arr, dtype=np.int32))
+    np.save(tmp_dir / "tfs.npy", np.asarray(tf_arr, dtype=np.uint16))
+    np.save(tmp_dir / "doclens.npy", np.asarray(doclens, dtype=np.int32))
+    avgdl = float(sum(doclens) / len(doclens)) if doclens else 0.0
+    with (tmp_dir / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "avgdl": avgdl, "terms": terms}, f)
+
+    replace_dir(tmp_dir, out_dir)
+    return len(ids)
+
+
+class TextIndex:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with (path / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids: List[str] = meta["ids"]
+        self.avgdl: float = meta["avgdl"] or 1.0
+        self.terms: Dict[str, List[int]] = meta["terms"]
+        self.postings = np.load(path / "postings.npy", mmap_mode="r")
+        self.tfs = np.load(path / "tfs.npy", mmap_mode="r")
+        self.doclens = np.load(path / "doclens.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Retorna até `top_k` pares (point_id, score BM25), do maior para o menor."""
+        n_docs = len(self.ids)
+        if n_docs == 0 or top_k <= 0:
+            return []
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            matched = True
+            offset, df = entry
+            docs = self.postings[offset : offset + df]
+            tf = self.tfs[offset : offset + df].astype(np.float32)
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doclens[docs] / self.avgdl)
+            scores[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        if not matched:
+            return []
+
+        k = min(top_k, n_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+class TextIndexHandle:
+    """Mantém o `TextIndex` de uma coleção aberto, recarregando após rebuilds."""
+
+    def __init__(self, collection_name: str) -> None:
+        self.path = text_index_dir(collection_name)
+        self._index: Optional[TextIndex] = None
+        self._mtime: Optional[float] = None
+
+    def get(self) -> Optional[TextIndex]:
+        try:
+            mtime = (self.path / "meta.json").stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if self._index is None or mtime != self._mtime:
+            self._index = TextIndex(self.path)
+            self._mtime = mtime
+        return self._index
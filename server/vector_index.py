@@ -0,0 +1,245 @@
+"""Índice vetorial local (matriz NumPy em mmap), alternativa ao Qdrant na busca.
+
+Para corpora pequenos (alguns milhares de chunks) uma busca exata por
+produto de matriz em memória custa menos que a ida e volta ao Qdrant.
+Escolhido por coleção em config/collections.yaml (`backend: numpy`); com
+`backend: qdrant` (padrão) nada disso é usado.
+
+Escrito pelo indexador (`scripts/index_qdrant.py`), que copia vetores e
+payloads da coleção já atualizada no Qdrant, em data/index/<coleção>.vectors/:
+
+- `meta.json`    – dimensão, dtype, distância e, para cada campo de filtro, a
+  lista de valores (o código de um valor é a posição nessa lista);
+- `vectors.npy`  – matriz N x dim (`float16` ou `float32`), linhas já
+  normalizadas quando a distância é `cosine`;
+- `ids.npy`      – ID do ponto de cada linha (os mesmos IDs do Qdrant);
+- `offsets.npy`  – N + 1 offsets (int64) de cada payload em `payloads.bin`;
+- `payloads.bin` – payloads em JSON (UTF-8), um após o outro;
+- `codes.npy`    – N x campos (int32) com o código de `library`, `type`...
+  de cada linha (-1 = ausente), para aplicar filtros sem ler os payloads.
+
+No servidor todos os arquivos são abertos com mmap; só os payloads dos
+resultados são decodificados. Uma matriz `float32` é usada direto do mmap;
+uma `float16` (metade do tamanho em disco) é convertida para `float32` uma
+vez, na primeira busca, porque converter a cada query custaria mais que o
+próprio produto de matriz. `VectorIndexHandle` reabre o índice quando o
+indexador o regrava (a troca do diretório é atômica).
+"""
+
+import json
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .filters import FILTER_FIELDS, Filters
+from .index_manifest import INDEX_DIR
+from .text_index import replace_dir
+
+
+DTYPES = ("float16", "float32")
+
+
+def vector_index_dir(collection_name: str) -> Path:
+    return INDEX_DIR / f"{collection_name}.vectors"
+
+
+def build_vector_index(
+    points: Iterable[Tuple[str, Sequence[float], Dict[str, Any]]],
+    out_dir: Path,
+    dim: int,
+    dtype: str = "float16",
+    distance: str = "cosine",
+) -> int:
+    """Grava (point_id, vetor, payload) em `out_dir`; retorna o número de pontos.
+
+    Como em `build_text_index`, a escrita é feita num diretório temporário
+    trocado no final.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype '{dtype}' não suportado (use {', '.join(DTYPES)})")
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    ids: List[str] = []
+    rows: List[np.ndarray] = []
+    offsets: List[int] = [0]
+    values: Dict[str, Dict[str, int]] = {f: {} for f in FILTER_FIELDS}
+    codes: List[List[int]] = []
+    with (tmp_dir / "payloads.bin").open("wb") as blob:
+        for pid, vector, payload in points:
+            row = np.asarray(vector, dtype=np.float32)
+            if row.shape != (dim,):
+                raise ValueError(f"Ponto {pid}: vetor com dimensão {row.shape}, esperado {dim}")
+            if distance == "cosine":
+                norm = float(np.linalg.norm(row))
+                if norm > 0:
+                    row = row / norm
+            ids.append(str(pid))
+            rows.append(row.astype(dtype))
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            blob.write(data)
+            offsets.append(offsets[-1] + len(data))
+            codes.append([
+                values[f].setdefault(str(payload[f]), len(values[f]))
+                if isinstance(payload.get(f), str)
+                else -1
+                for f in FILTER_FIELDS
+            ])
+
+    matrix = np.vstack(rows) if rows else np.zeros((0, dim), dtype=dtype)
+    np.save(tmp_dir / "vectors.npy", matrix)
+    id_width = max((len(i) for i in ids), default=1)
+    np.save(tmp_dir / "ids.npy", np.asarray(ids, dtype=f"U{id_width}"))
+    np.save(tmp_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+    np.save(
+        tmp_dir / "codes.npy",
+        np.asarray(codes, dtype=np.int32).reshape(len(ids), len(FILTER_FIELDS)),
+    )
+    with (tmp_dir / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "dim": dim,
+                "dtype": dtype,
+                "distance": distance,
+                "count": len(ids),
+                "fields": {f: list(v) for f, v in values.items()},
+            },
+            f,
+            ensure_ascii=False,
+        )
+
+    replace_dir(tmp_dir, out_dir)
+    return len(ids)
+
+
+@dataclass
+class VectorHit:
+    """Mesmos atributos usados de um `ScoredPoint`/`Record` do Qdrant."""
+
+    id: str
+    score: Optional[float]
+    payload: Dict[str, Any]
+
+
+class VectorIndex:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with (path / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim: int = meta["dim"]
+        self.normalize = meta["distance"] == "cosine"
+        self.values: Dict[str, Dict[str, int]] = {
+            field: {v: i for i, v in enumerate(vals)} for field, vals in meta["fields"].items()
+        }
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.ids = np.load(path / "ids.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.codes = np.load(path / "codes.npy", mmap_mode="r")
+        # np.memmap não abre arquivo vazio (índice sem pontos).
+        self.blob: Any = b""
+        if self.offsets[-1]:
+            self.blob = np.memmap(path / "payloads.bin", dtype=np.uint8, mode="r")
+        self._rows: Optional[Dict[str, int]] = None
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def payload(self, row: int) -> Dict[str, Any]:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(bytes(self.blob[start:end]).decode("utf-8"))
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.asarray(self.vectors, dtype=np.float32)
+        return self._matrix
+
+    def _mask(self, filters: Optional[Filters]) -> Optional[np.ndarray]:
+        if not filters:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, accepted in filters.items():
+            known = self.values.get(field)
+            if known is None:
+                return np.zeros(len(self.ids), dtype=bool)
+            col = FILTER_FIELDS.index(field)
+            mask &= np.isin(self.codes[:, col], [known[v] for v in accepted if v in known])
+        return mask
+
+    def search_batch(
+        self,
+        query_vectors: Sequence[Sequence[float]],
+        top_k: int,
+        filters: Optional[Sequence[Optional[Filters]]] = None,
+    ) -> List[List[VectorHit]]:
+        """Top-k exato por similaridade (cosseno ou produto interno) para cada query.
+
+        Um único produto de matriz para o lote; `argpartition` separa os k
+        melhores de cada linha sem ordenar tudo.
+        """
+        if not len(query_vectors):
+            return []
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if self.normalize:
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms > 0, norms, 1.0)
+        if len(self.ids) == 0 or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ self.matrix().T
+        per_query = list(filters) if filters is not None else [None] * len(queries)
+        results: List[List[VectorHit]] = []
+        for row_scores, flt in zip(scores, per_query):
+            mask = self._mask(flt)
+            candidates = np.flatnonzero(mask) if mask is not None else None
+            if candidates is not None:
+                row_scores = row_scores[candidates]
+            k = min(top_k, len(row_scores))
+            if k == 0:
+                results.append([])
+                continue
+            top = np.argpartition(-row_scores, k - 1)[:k]
+            top = top[np.argsort(-row_scores[top])]
+            rows = candidates[top] if candidates is not None else top
+            results.append([
+                VectorHit(str(self.ids[r]), float(s), self.payload(int(r)))
+                for r, s in zip(rows, row_scores[top])
+            ])
+        return results
+
+    def search(
+        self, query_vector: Sequence[float], top_k: int, filters: Optional[Filters] = None
+    ) -> List[VectorHit]:
+        return self.search_batch([query_vector], top_k, [filters])[0]
+
+    def retrieve(self, ids: Iterable[str]) -> List[VectorHit]:
+        """Payloads por ID (para documentos achados só pelo BM25)."""
+        if self._rows is None:
+            self._rows = {str(pid): i for i, pid in enumerate(self.ids)}
+        rows = [self._rows[pid] for pid in map(str, ids) if pid in self._rows]
+        return [VectorHit(str(self.ids[r]), None, self.payload(r)) for r in rows]
+
+
+class VectorIndexHandle:
+    """Mantém o `VectorIndex` de uma coleção aberto, recarregando após reindexações."""
+
+    def __init__(self, collection_name: str) -> None:
+        self.path = vector_index_dir(collection_name)
+        self._index: Optional[VectorIndex] = None
+        self._mtime: Optional[float] = None
+
+    def get(self) -> Optional[VectorIndex]:
+        try:
+            mtime = (self.path / "meta.json").stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if self._index is None or mtime != self._mtime:
+            self._index = VectorIndex(self.path)
+            self._mtime = mtime
+        return self._index
@@ -0,0 +1,9 @@
+"""Torna `server/` e os scripts de `scripts/` importáveis nos testes."""
+
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
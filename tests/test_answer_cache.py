@@ -0,0 +1,56 @@
+from server.answer_cache import AnswerCache, cosine, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  Como  usar o Gum?? ") == "como usar o gum"
+
+
+def test_cosine():
+    assert cosine([1.0, 0.0], [2.0, 0.0]) == 1.0
+    assert cosine([1.0, 0.0], [0.0, 1.0]) == 0.0
+    assert cosine([0.0, 0.0], [1.0, 0.0]) == 0.0
+
+
+def test_exact_hit_requires_same_context():
+    cache = AnswerCache(semantic_threshold=None)
+    cache.store("Como usar o gum?", None, ["a", "b"], "v1", "resposta")
+    assert cache.lookup("como usar o gum", None, ["a", "b"], "v1") == "resposta"
+    # outros documentos, outra ordem ou outra versão da coleção: miss
+    assert cache.lookup("como usar o gum", None, ["a", "c"], "v1") is None
+    assert cache.lookup("como usar o gum", None, ["b", "a"], "v1") is None
+    assert cache.lookup("como usar o gum", None, ["a", "b"], "v2") is None
+    assert cache.stats.exact_hits == 1 and cache.stats.misses == 3
+
+
+def test_semantic_hit_above_threshold():
+    cache = AnswerCache(semantic_threshold=0.95)
+    cache.store("como usar o gum", [1.0, 0.0], ["a"], "v1", "resposta")
+    assert cache.lookup("de que jeito uso o gum", [0.99, 0.05], ["a"], "v1") == "resposta"
+    assert cache.lookup("outra coisa", [0.5, 0.5], ["a"], "v1") is None
+    assert cache.stats.semantic_hits == 1
+
+
+def test_ttl_expiration(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("server.answer_cache.time.time", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=10, semantic_threshold=None)
+    cache.store("q", None, ["a"], "v1", "resposta")
+    now[0] += 11
+    assert cache.lookup("q", None, ["a"], "v1") is None
+    assert cache.stats.expirations == 1
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2, semantic_threshold=None)
+    cache.store("q1", None, ["a"], "v1", "r1")
+    cache.store("q2", None, ["a"], "v1", "r2")
+    assert cache.lookup("q1", None, ["a"], "v1") == "r1"  # q1 passa a ser o mais recente
+    cache.store("q3", None, ["a"], "v1", "r3")
+    assert cache.lookup("q2", None, ["a"], "v1") is None
+    assert cache.lookup("q1", None, ["a"], "v1") == "r1"
+    assert cache.stats.evictions == 1
+
+
+def test_from_config_disabled():
+    assert AnswerCache.from_config({"answer_cache": {"enabled": False}}) is None
+    assert AnswerCache.from_config({}) is None
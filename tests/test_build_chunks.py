@@ -0,0 +1,159 @@
+import build_chunks
+from build_chunks import (
+    ChunkConfig,
+    pack_units,
+    split_go,
+    split_markdown,
+    split_oversized,
+    split_paragraphs,
+)
+
+
+GO_SOURCE = """// Package demo é um exemplo.
+package demo
+
+import "fmt"
+
+// Model guarda o estado.
+type Model struct{ n int }
+
+// Update trata mensagens.
+func (m *Model) Update(msg string) {
+	fmt.Println(msg)
+}
+
+func main() {}
+"""
+
+
+def test_split_go_on_top_level_declarations():
+    units = split_go(GO_SOURCE)
+    assert [label for label, _ in units] == ["package", "import", "Model", "Model.Update", "main"]
+    # o comentário acima da declaração vai junto com ela
+    assert units[3][1].startswith("// Update trata mensagens.\nfunc (m *Model) Update")
+    assert "".join(text for _, text in units) == GO_SOURCE
+
+
+def test_split_go_without_declarations():
+    assert split_go("// só comentário\n") == [("", "// só comentário\n")]
+
+
+def test_split_markdown_labels_with_heading_path():
+    text = (
+        "Intro\n"
+        "# Install\n"
+        "texto\n"
+        "## Go\n"
+        "```sh\n"
+        "# não é título\n"
+        "```\n"
+        "# Usage\n"
+    )
+    units = split_markdown(text)
+    assert [label for label, _ in units] == ["", "Install", "Install > Go", "Usage"]
+    assert "# não é título" in units[2][1]
+
+
+def test_split_paragraphs():
+    assert split_paragraphs("a\n\n  \nb") == [("", "a\n\n"), ("", "b\n\n")]
+
+
+def test_split_oversized_respects_max_and_overlap():
+    text = "".join(f"linha {i:02d}\n" for i in range(20))  # 9 chars por linha
+    parts = split_oversized(text, max_chars=30, overlap_chars=10)
+    assert all(len(p) <= 30 for p in parts)
+    assert len(parts) > 1
+    # cada parte começa com a última linha da anterior
+    for prev, part in zip(parts, parts[1:]):
+        assert part.splitlines()[0] == prev.splitlines()[-1]
+    assert split_oversized("x" * 25, max_chars=10, overlap_chars=0) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_pack_units_merges_small_and_splits_large():
+    cfg = ChunkConfig(max_chars=50, min_chars=20, overlap_chars=0)
+    units = [("a", "curta\n"), ("b", "outra\n"), ("c", "x" * 40 + "\n"), ("d", "y" * 120)]
+    chunks = list(pack_units(units, cfg))
+    # a + b juntas (rótulo da primeira); c sozinha; d dividida em partes
+    assert chunks[0] == ("a", "curta\noutra")
+    assert chunks[1] == ("c", "x" * 40)
+    assert [label for label, _ in chunks[2:]] == ["d"] * 3
+    assert all(len(text) <= cfg.max_chars for _, text in chunks)
+
+
+def _setup_raw(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    monkeypatch.setattr(build_chunks, "RAW_DIR", raw)
+    monkeypatch.setattr(build_chunks, "SHARDS_DIR", shards)
+    monkeypatch.setattr(build_chunks, "FETCH_MANIFEST_PATH", raw / "fetch_manifest.json")
+    return raw
+
+
+def _built(paths, index):
+    """Simula um build completo: shard e stat de cada arquivo registrados."""
+    for path in paths:
+        rel = path.relative_to(build_chunks.RAW_DIR).as_posix()
+        build_chunks.write_shard(rel, [])
+        st = path.stat()
+        index.files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "chunks": 0}
+
+
+def test_plan_build_outside_git_uses_size_and_mtime(tmp_path, monkeypatch):
+    raw = _setup_raw(tmp_path, monkeypatch)
+    (raw / "manual").mkdir(parents=True)
+    a, b = raw / "manual" / "a.md", raw / "manual" / "b.md"
+    a.write_text("um")
+    b.write_text("dois")
+
+    index = build_chunks.ShardIndex()
+    dirty, _ = build_chunks.plan_build([a, b], index)
+    assert dirty == [a, b]
+
+    _built([a, b], index)
+    assert build_chunks.plan_build([a, b], index)[0] == []
+
+    b.write_text("dois, alterado")
+    assert build_chunks.plan_build([a, b], index)[0] == [b]
+
+    # shard apagado: reprocessa mesmo sem mudança no arquivo
+    build_chunks.shard_path("manual/a.md").unlink()
+    assert build_chunks.plan_build([a, b], index)[0] == [a, b]
+
+
+def test_plan_build_in_git_repo_uses_diff(tmp_path, monkeypatch):
+    import subprocess
+
+    raw = _setup_raw(tmp_path, monkeypatch)
+    repo = raw / "github" / "o" / "r"
+    repo.mkdir(parents=True)
+
+    def git(*args):
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", "-C", str(repo), *args],
+            check=True,
+            capture_output=True,
+        )
+
+    a, b = repo / "a.md", repo / "b.md"
+    a.write_text("um")
+    b.write_text("dois")
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-qm", "1")
+
+    index = build_chunks.ShardIndex()
+    dirty, revs = build_chunks.plan_build([a, b], index)
+    assert dirty == [a, b]
+    _built([a, b], index)
+    index.repos = revs
+
+    # mtime muda, conteúdo não: o git diff manda, nada a reprocessar
+    a.write_text("um")
+    assert build_chunks.plan_build([a, b], index)[0] == []
+
+    b.write_text("dois, alterado")
+    git("commit", "-qam", "2")
+    dirty, new_revs = build_chunks.plan_build([a, b], index)
+    assert dirty == [b]
+    assert new_revs["github/o/r"] != revs["github/o/r"]
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from server import rag_pipeline
+from server.chunk_store import ChunkStore, ChunkStoreError, ChunkStoreHandle, build_chunk_store
+from server.index_manifest import point_id
+from server.rag_pipeline import available_docs, hydrate_docs, rerank
+
+
+def _record(text, repo, path, section=None):
+    metadata = {
+        "source": f"github:charmbracelet/{repo}:/{path}",
+        "library": repo,
+        "type": "doc",
+        "path": f"{repo}/{path}",
+        "lang": "en",
+        "tags": [],
+    }
+    if section is not None:
+        metadata["section"] = section
+    return {"text": text, "metadata": metadata}
+
+
+RECORDS = [
+    _record("Bordas com lipgloss.NewStyle().Border(...)", "lipgloss", "README.md", "Borders"),
+    _record("Cores adaptativas: lipgloss.AdaptiveColor", "lipgloss", "README.md", "Colors"),
+    # JSONL antigo, sem `section`
+    _record("func (m model) Update(msg tea.Msg)", "bubbletea", "tutorial.go"),
+]
+
+
+def _pid(rec):
+    return point_id(rec["metadata"]["source"], rec["text"])
+
+
+@pytest.fixture
+def store(tmp_path):
+    # o terceiro registro repetido: um ponto só
+    assert build_chunk_store(RECORDS + RECORDS[2:], tmp_path / "col.store") == 3
+    return ChunkStore(tmp_path / "col.store")
+
+
+def test_round_trip_text_and_metadata(store):
+    assert len(store) == 3
+    for rec in RECORDS:
+        assert _pid(rec) in store
+        assert store.get(_pid(rec)) == (rec["text"], rec["metadata"])
+    assert "inexistente" not in store
+    assert store.get("inexistente") is None
+
+
+def test_metadata_is_interned_per_file(store):
+    assert len(store.files) == 2
+    assert store.sections == ["Borders", "Colors", None]
+
+
+def test_empty_store(tmp_path):
+    assert build_chunk_store([], tmp_path / "vazio.store") == 0
+    empty = ChunkStore(tmp_path / "vazio.store")
+    assert len(empty) == 0 and empty.get("x") is None
+
+
+def test_handle_missing_then_built(tmp_path, monkeypatch):
+    monkeypatch.setattr("server.chunk_store.CHUNKS_DIR", tmp_path)
+    handle = ChunkStoreHandle("col")
+    assert handle.get() is None
+    build_chunk_store(RECORDS, tmp_path / "col.store")
+    assert len(handle.get()) == 3
+
+
+def _slim(rec, collection="col"):
+    meta = rec["metadata"]
+    return {
+        "id": _pid(rec),
+        "score": 0.5,
+        "text": "",
+        "metadata": {"library": meta["library"], "type": meta["type"]},
+        "collection": collection,
+    }
+
+
+def test_hydrate_fills_slim_docs(store):
+    docs = hydrate_docs([_slim(RECORDS[0])], {"col": store})
+    assert docs[0]["text"] == RECORDS[0]["text"]
+    assert docs[0]["metadata"]["section"] == "Borders"
+    assert docs[0]["metadata"]["source"] == RECORDS[0]["metadata"]["source"]
+
+
+def test_hydrate_passes_full_docs_through():
+    doc = {"id": "x", "text": "já tem texto", "metadata": {}, "collection": "col"}
+    assert hydrate_docs([doc], {"col": None}) == [doc]
+
+
+def test_hydrate_without_store_raises_instead_of_returning_nothing():
+    # regressão: sem store, todos os documentos slim sumiam e o LLM respondia sem contexto
+    with pytest.raises(ChunkStoreError):
+        hydrate_docs([_slim(RECORDS[0])], {"col": None})
+    with pytest.raises(ChunkStoreError):
+        available_docs([_slim(RECORDS[0])], {})
+
+
+def test_ids_missing_from_store_are_dropped(store):
+    stale = dict(_slim(RECORDS[0]), id="removido")
+    docs = [_slim(RECORDS[1]), stale]
+    assert [d["id"] for d in available_docs(docs, {"col": store})] == [_pid(RECORDS[1])]
+    assert [d["id"] for d in hydrate_docs(docs, {"col": store})] == [_pid(RECORDS[1])]
+
+
+def test_rerank_hydrates_only_surviving_docs(store, monkeypatch):
+    monkeypatch.setitem(
+        rag_pipeline.RETRIEVAL_CFG, "retrieval", {"rerank": {"enabled": True, "top_k": 1}}
+    )
+    docs = [_slim(rec) for rec in RECORDS]
+    docs[2]["score"] = 0.9
+    ranked = asyncio.run(rerank("update", docs, stores={"col": store}))
+    assert [d["text"] for d in ranked] == [RECORDS[2]["text"]]
+    # os descartados pelo top_k não foram lidos do store
+    assert docs[0]["text"] == "" and docs[1]["text"] == ""
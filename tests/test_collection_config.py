@@ -0,0 +1,87 @@
+import pytest
+from qdrant_client import models
+
+from server.collection_config import CollectionConfig, assign_collection, load_collection_configs
+
+
+def _entry(**extra):
+    return {"name": "col", "vector_size": 768, **extra}
+
+
+def test_defaults():
+    col = CollectionConfig.from_entry(_entry())
+    assert (col.distance, col.quantization, col.backend, col.payload) == (
+        "cosine",
+        "none",
+        "qdrant",
+        "full",
+    )
+    assert col.hnsw_config() is None
+    assert col.quantization_config() is None
+    assert col.search_params() is None
+
+
+def test_hnsw_quantization_and_search_params():
+    col = CollectionConfig.from_entry(
+        _entry(
+            distance="dot",
+            on_disk=True,
+            hnsw={"m": 32},
+            quantization={"type": "scalar", "quantile": 0.99, "always_ram": False},
+            search={"ef": 128, "rescore": False, "oversampling": 2},
+        )
+    )
+    assert col.vectors_config() == models.VectorParams(
+        size=768, distance=models.Distance.DOT, on_disk=True
+    )
+    assert col.hnsw_config() == models.HnswConfigDiff(m=32, ef_construct=None)
+    scalar = col.quantization_config().scalar
+    assert (scalar.type, scalar.quantile, scalar.always_ram) == (models.ScalarType.INT8, 0.99, False)
+    params = col.search_params()
+    assert params.hnsw_ef == 128
+    assert (params.quantization.rescore, params.quantization.oversampling) == (False, 2.0)
+
+
+def test_binary_quantization():
+    col = CollectionConfig.from_entry(_entry(quantization={"type": "binary"}))
+    assert isinstance(col.quantization_config(), models.BinaryQuantization)
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {"distance": "euclid"},
+        {"quantization": {"type": "pq"}},
+        {"backend": "faiss"},
+        {"numpy_dtype": "int8"},
+        {"payload": "tiny"},
+    ],
+)
+def test_invalid_values_are_rejected(extra):
+    with pytest.raises(ValueError):
+        CollectionConfig.from_entry(_entry(**extra))
+
+
+def test_repository_config_loads():
+    collections = load_collection_configs()
+    assert collections and all(c.vector_size > 0 for c in collections)
+
+
+def test_assign_collection_by_routing_paths():
+    docs = CollectionConfig.from_entry(_entry(name="docs"))
+    go = CollectionConfig.from_entry(
+        _entry(name="go", routing={"default": False, "paths": ["*.go", "github/*/gum/*"]})
+    )
+    collections = [docs, go]
+    assert assign_collection(collections, "github/charmbracelet/bubbletea/tea.go") == "go"
+    assert assign_collection(collections, "github/charmbracelet/gum/README.md") == "go"
+    assert assign_collection(collections, "github/charmbracelet/lipgloss/README.md") == "docs"
+
+
+def test_assign_collection_prefers_default_catch_all_and_may_skip():
+    a = CollectionConfig.from_entry(_entry(name="a", routing={"default": False}))
+    b = CollectionConfig.from_entry(_entry(name="b"))
+    assert assign_collection([a, b], "manual/x.md") == "b"
+
+    only_go = CollectionConfig.from_entry(_entry(name="go", routing={"paths": ["*.go"]}))
+    assert assign_collection([only_go], "manual/x.md") is None
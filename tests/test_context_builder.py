@@ -0,0 +1,57 @@
+from server.context_builder import ContextConfig, build_context, estimate_tokens, trim_to_relevant
+
+
+def _doc(text, source="a.md"):
+    return {"text": text, "metadata": {"source": source}}
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("abcdef", chars_per_token=2) == 3
+
+
+def test_drops_overlapping_chunks_from_the_same_source():
+    text = "lipgloss renderiza bordas arredondadas com NewStyle e Border em qualquer terminal"
+    built = build_context("bordas", [_doc(text), _doc(text + " moderno"), _doc(text, "b.md")])
+    assert built.dropped_duplicates == 1
+    assert [d["metadata"]["source"] for d in built.docs] == ["a.md", "b.md"]
+
+
+def test_stops_at_the_token_budget_but_keeps_smaller_docs():
+    cfg = ContextConfig(max_tokens=10, max_doc_tokens=100, chars_per_token=1)
+    docs = [_doc("x" * 6, "1"), _doc("y" * 6, "2"), _doc("z" * 4, "3")]
+    built = build_context("q", docs, cfg)
+    assert [d["metadata"]["source"] for d in built.docs] == ["1", "3"]
+    assert built.dropped_budget == 1
+    assert built.tokens == 10
+
+
+def test_trims_large_docs_to_sentences_about_the_query():
+    text = (
+        "O bubbletea usa a arquitetura Elm. "
+        "Para mudar a cor da borda use BorderForeground no lipgloss. "
+        "Também há suporte a mouse. "
+        "Outras opções incluem padding e margin."
+    )
+    cfg = ContextConfig(max_tokens=100, max_doc_tokens=20, chars_per_token=4)
+    built = build_context("cor da borda lipgloss", [_doc(text)], cfg)
+    assert built.trimmed == 1
+    assert "BorderForeground" in built.texts[0]
+    assert estimate_tokens(built.texts[0], 4) <= 20
+    # o documento original não é alterado
+    assert built.docs[0]["text"] == text
+
+
+def test_trim_keeps_original_sentence_order():
+    text = "Primeira sobre gum. Segunda sobre nada. Terceira sobre gum input."
+    trimmed = trim_to_relevant(text, "gum input", max_tokens=12, chars_per_token=4)
+    assert trimmed.index("Primeira") < trimmed.index("Terceira")
+    assert "Segunda" not in trimmed
+
+
+def test_from_config_uses_defaults_for_missing_keys():
+    cfg = ContextConfig.from_config({"context": {"max_tokens": 100}})
+    assert cfg.max_tokens == 100
+    assert cfg.max_doc_tokens == ContextConfig().max_doc_tokens
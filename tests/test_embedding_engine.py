@@ -0,0 +1,66 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from server.embedding_cache import EmbeddingCache
+from server.models import OllamaEmbeddingEngine
+from tools.report.bench_stubs import StubOllama, fake_embedding
+
+
+@pytest.fixture(scope="module")
+def ollama():
+    stub = StubOllama(dim=8).start()
+    yield stub
+    stub.stop()
+
+
+def _engine(ollama, tmp_path, **kwargs):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite", model="stub")
+    return OllamaEmbeddingEngine(
+        base_url=ollama.url, model="stub", batch_size=3, concurrency=2, cache=cache, **kwargs
+    )
+
+
+TEXTS = [f"texto {i}" for i in range(10)]
+
+
+def test_embed_batches_and_keeps_input_order(ollama, tmp_path):
+    engine = _engine(ollama, tmp_path)
+    vectors = engine.embed(TEXTS, prefix="search_document: ")
+    expected = [fake_embedding(f"search_document: {t}", 8) for t in TEXTS]
+    assert np.allclose(vectors, expected, atol=1e-6)
+    assert engine.stats.requests == 4  # 10 textos em lotes de 3
+    engine.close()
+
+
+def test_aembed_matches_embed(ollama, tmp_path):
+    engine = _engine(ollama, tmp_path)
+
+    async def run():
+        try:
+            return await engine.aembed(TEXTS)
+        finally:
+            await engine.aclose()
+
+    vectors = asyncio.run(run())
+    assert np.allclose(vectors, [fake_embedding(t, 8) for t in TEXTS], atol=1e-6)
+
+
+def test_cache_only_sends_missing_texts(ollama, tmp_path):
+    engine = _engine(ollama, tmp_path)
+    engine.embed(TEXTS[:4])
+    requests = engine.stats.requests
+    vectors = engine.embed(TEXTS[:6])
+    # só os 2 textos novos vão ao Ollama, num único lote
+    assert engine.stats.requests == requests + 1
+    assert np.allclose(vectors, [fake_embedding(t, 8) for t in TEXTS[:6]], atol=1e-6)
+    assert engine.cache.stats.hits == 4
+    engine.close()
+
+
+def test_unexpected_dimension_is_an_error(ollama, tmp_path):
+    engine = _engine(ollama, tmp_path, expected_dim=16)
+    with pytest.raises(RuntimeError, match="Dimensão"):
+        engine.embed(["x"])
+    engine.close()
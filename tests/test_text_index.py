@@ -0,0 +1,72 @@
+from server.text_index import TextIndex, TextIndexHandle, build_text_index, tokenize
+
+
+def test_tokenize_splits_dotted_and_camel_case_identifiers():
+    tokens = tokenize("Use tea.Cmd com NewProgram")
+    assert "tea.cmd" in tokens
+    assert {"tea", "cmd"} <= set(tokens)
+    assert {"newprogram", "new", "program"} <= set(tokens)
+    assert "use" in tokens and "com" in tokens
+
+
+def test_tokenize_keeps_numbers_and_lowercases():
+    assert tokenize("HTTP 404") == ["http", "404"]
+
+
+def _index(tmp_path, docs):
+    out = tmp_path / "col.text"
+    assert build_text_index(docs, out) == len(docs)
+    return TextIndex(out)
+
+
+def test_search_ranks_rarer_and_more_frequent_terms_higher(tmp_path):
+    index = _index(
+        tmp_path,
+        [
+            ("a", "lipgloss border style border"),
+            ("b", "lipgloss color style"),
+            ("c", "bubbletea model update"),
+        ],
+    )
+    hits = index.search("border", top_k=3)
+    assert [pid for pid, _ in hits] == ["a"]
+
+    hits = index.search("lipgloss border", top_k=3)
+    assert [pid for pid, _ in hits] == ["a", "b"]
+    assert hits[0][1] > hits[1][1] > 0
+
+
+def test_search_matches_identifier_parts(tmp_path):
+    index = _index(tmp_path, [("a", "return tea.Quit"), ("b", "quit the program")])
+    assert {pid for pid, _ in index.search("tea", top_k=5)} == {"a"}
+    assert {pid for pid, _ in index.search("quit", top_k=5)} == {"a", "b"}
+
+
+def test_search_without_known_terms_or_docs(tmp_path):
+    index = _index(tmp_path, [("a", "lipgloss")])
+    assert index.search("inexistente", top_k=5) == []
+    assert index.search("lipgloss", top_k=0) == []
+    assert _index(tmp_path / "vazio", []).search("lipgloss", top_k=5) == []
+
+
+def test_top_k_limits_results(tmp_path):
+    index = _index(tmp_path, [(str(i), "gum " * (i + 1)) for i in range(10)])
+    assert len(index.search("gum", top_k=3)) == 3
+
+
+def test_rebuild_replaces_index_and_handle_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr("server.text_index.INDEX_DIR", tmp_path)
+    handle = TextIndexHandle("col")
+    assert handle.get() is None
+
+    build_text_index([("a", "gum input")], tmp_path / "col.text")
+    first = handle.get()
+    assert first is not None and first.ids == ["a"]
+    assert handle.get() is first
+
+    build_text_index([("b", "gum choose")], tmp_path / "col.text")
+    # mtime com resolução grosseira em alguns sistemas de arquivos
+    handle._mtime = None
+    assert handle.get().ids == ["b"]
+    assert not (tmp_path / "col.text.tmp").exists()
+    assert not (tmp_path / "col.text.old").exists()
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from server.vector_index import VectorIndex, build_vector_index
+
+
+POINTS = [
+    ("p0", [1.0, 0.0, 0.0], {"library": "lipgloss", "type": "doc", "text": "bordas"}),
+    ("p1", [0.9, 0.1, 0.0], {"library": "bubbletea", "type": "code", "text": "update"}),
+    ("p2", [0.0, 1.0, 0.0], {"library": "lipgloss", "type": "code", "text": "cores"}),
+    ("p3", [0.0, 0.0, 2.0], {"type": "doc", "text": "sem library"}),
+]
+
+
+def _index(tmp_path, points=POINTS, **kwargs):
+    out = tmp_path / "col.vectors"
+    assert build_vector_index(points, out, dim=3, **kwargs) == len(points)
+    return VectorIndex(out)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32"])
+def test_search_matches_brute_force_cosine(tmp_path, dtype):
+    index = _index(tmp_path, dtype=dtype)
+    hits = index.search([1.0, 0.2, 0.0], top_k=2)
+    assert [h.id for h in hits] == ["p1", "p0"]
+    expected = np.dot([0.9, 0.1, 0.0], [1.0, 0.2, 0.0]) / (
+        np.linalg.norm([0.9, 0.1, 0.0]) * np.linalg.norm([1.0, 0.2, 0.0])
+    )
+    assert hits[0].score == pytest.approx(expected, abs=1e-3)
+    assert hits[0].payload["text"] == "update"
+
+
+def test_dot_distance_keeps_vector_norms(tmp_path):
+    index = _index(tmp_path, distance="dot", dtype="float32")
+    hits = index.search([0.0, 0.0, 1.0], top_k=1)
+    assert hits[0].id == "p3"
+    assert hits[0].score == pytest.approx(2.0)
+
+
+def test_filters_restrict_candidates(tmp_path):
+    index = _index(tmp_path)
+    hits = index.search([1.0, 0.0, 0.0], top_k=4, filters={"library": ["lipgloss"]})
+    assert [h.id for h in hits] == ["p0", "p2"]
+
+    hits = index.search(
+        [1.0, 0.0, 0.0], top_k=4, filters={"library": ["lipgloss"], "type": ["code"]}
+    )
+    assert [h.id for h in hits] == ["p2"]
+
+    assert index.search([1.0, 0.0, 0.0], top_k=4, filters={"library": ["gum"]}) == []
+    # campo sem nenhum valor no índice
+    assert index.search([1.0, 0.0, 0.0], top_k=4, filters={"lang": ["en"]}) == []
+
+
+def test_search_batch_with_per_query_filters(tmp_path):
+    index = _index(tmp_path)
+    results = index.search_batch(
+        [[1.0, 0.0, 0.0], [1.0, 0.0, 0.0]], top_k=1, filters=[None, {"type": ["code"]}]
+    )
+    assert [[h.id for h in r] for r in results] == [["p0"], ["p1"]]
+    assert index.search_batch([], top_k=3) == []
+
+
+def test_retrieve_by_id_skips_unknown(tmp_path):
+    index = _index(tmp_path)
+    hits = index.retrieve(["p2", "inexistente", "p0"])
+    assert [(h.id, h.score) for h in hits] == [("p2", None), ("p0", None)]
+    assert hits[0].payload["library"] == "lipgloss"
+
+
+def test_empty_index(tmp_path):
+    index = _index(tmp_path, points=[])
+    assert len(index) == 0
+    assert index.search([1.0, 0.0, 0.0], top_k=3) == []
+
+
+def test_rejects_wrong_dimension_and_dtype(tmp_path):
+    with pytest.raises(ValueError):
+        build_vector_index([("p", [1.0, 0.0], {})], tmp_path / "a", dim=3)
+    with pytest.raises(ValueError):
+        build_vector_index(POINTS, tmp_path / "b", dim=3, dtype="int8")
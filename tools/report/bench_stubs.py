@@ -0,0 +1,267 @@
+"""Stand-ins locais de Ollama e Qdrant para benchmarks e testes offline.
+
+- `StubOllama`: servidor HTTP em thread com `/api/embed`, `/api/embeddings`,
+  `/api/chat` (com e sem streaming) e `/api/tags`. Embeddings são
+  determinísticos (derivados do hash do texto) e a latência é configurável:
+  tempo por requisição de embedding, tempo até o primeiro token (prefill) e
+  tokens por segundo na geração. Pedidos com `format: json` recebem as
+  notas do reranker ou um veredito do juiz do eval.
+- `seed_collection`: cria uma coleção Qdrant (tipicamente `:memory:`) com os
+  chunks do JSONL e os mesmos vetores determinísticos, para que a busca
+  devolva documentos reais sem depender do Ollama de verdade.
+
+Também roda sozinho, no lugar do Ollama para servidor, indexador e eval:
+
+    python tools/report/bench_stubs.py --port 11435 --ttft-ms 800 --token-rate 12
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 QDRANT_URL=data/qdrant-local \
+        python scripts/index_qdrant.py
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+EMBED_DIM = 768
+ANSWER_TEXT = (
+    "Resposta simulada pelo stub do Ollama para medir o overhead do pipeline "
+    "RAG sem depender do modelo real. "
+)
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """Vetor unitário determinístico para `text` (mesmo texto -> mesmo vetor)."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+    return vec.tolist()
+
+
+class StubOllama:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        dim: int = EMBED_DIM,
+        embed_latency_ms: float = 0.0,
+        ttft_ms: float = 0.0,
+        token_rate: float = 0.0,
+        answer_tokens: int = 64,
+    ) -> None:
+        """`token_rate` em tokens/s; 0 gera a resposta inteira sem espera."""
+        self.dim = dim
+        self.embed_latency_ms = embed_latency_ms
+        self.ttft_ms = ttft_ms
+        self.token_rate = token_rate
+        self.answer_tokens = answer_tokens
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        """Atende no thread atual até ser interrompido (uso standalone)."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def answer_chunks(self) -> List[str]:
+        words = (ANSWER_TEXT * (self.answer_tokens // 10 + 1)).split()
+        return [w + " " for w in words[: self.answer_tokens]]
+
+    def token_delay(self) -> float:
+        return 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+
+
+_SCORES_RE = re.compile(r"exatamente (\d+) notas")
+
+
+def _make_handler(stub: StubOllama) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: Any) -> None:
+            return None
+
+        def _json(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": "stub"}]})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/embed":
+                texts = body.get("input") or []
+                if isinstance(texts, str):
+                    texts = [texts]
+                time.sleep(stub.embed_latency_ms / 1000.0)
+                self._json(200, {
+                    "model": body.get("model"),
+                    "embeddings": [fake_embedding(t, stub.dim) for t in texts],
+                })
+            elif self.path == "/api/embeddings":
+                time.sleep(stub.embed_latency_ms / 1000.0)
+                self._json(200, {"embedding": fake_embedding(body.get("prompt", ""), stub.dim)})
+            elif self.path == "/api/chat":
+                self._chat(body)
+            else:
+                self._json(404, {"error": "not found"})
+
+        def _chat(self, body: Dict[str, Any]) -> None:
+            model = body.get("model")
+            prompt = "".join(m.get("content", "") for m in body.get("messages") or [])
+            time.sleep(stub.ttft_ms / 1000.0)
+
+            if body.get("format") == "json":
+                # Reranker: uma nota por trecho, na ordem em que aparecem;
+                # qualquer outro pedido JSON é o juiz do eval.
+                match = _SCORES_RE.search(prompt)
+                if match:
+                    n = int(match.group(1))
+                    content = json.dumps({"scores": [float(n - i) for i in range(n)]})
+                else:
+                    content = json.dumps({"verdict": "correct", "reason": "stub"})
+                self._json(200, {"model": model, "message": {"content": content}, "done": True})
+                return
+
+            chunks = stub.answer_chunks()
+            delay = stub.token_delay()
+            if not body.get("stream", True):
+                time.sleep(delay * len(chunks))
+                self._json(200, {
+                    "model": model,
+                    "message": {"role": "assistant", "content": "".join(chunks)},
+                    "done": True,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, chunk in enumerate(chunks):
+                if i and delay:
+                    time.sleep(delay)
+                self._chunk({"model": model, "message": {"content": chunk}, "done": False})
+            self._chunk({"model": model, "message": {"content": ""}, "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, event: Dict[str, Any]) -> None:
+            data = json.dumps(event).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def iter_chunks(path: Path, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if limit is not None and i >= limit:
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+async def seed_collection(
+    client: Any,
+    collection_name: str,
+    chunks_path: Path,
+    limit: Optional[int] = None,
+    dim: int = EMBED_DIM,
+    batch_size: int = 256,
+) -> List[Tuple[str, str]]:
+    """Popula `collection_name` com os chunks e vetores de `fake_embedding`.
+
+    Os textos recebem o mesmo prefixo `search_document: ` usado pelo indexador.
+    Retorna os pares (point_id, texto), para montar o índice BM25 local.
+    """
+    from qdrant_client import models
+
+    from server.index_manifest import point_id
+
+    await client.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+    )
+    docs: List[Tuple[str, str]] = []
+    batch: List[models.PointStruct] = []
+    for rec in iter_chunks(chunks_path, limit):
+        meta = rec.get("metadata") or {}
+        pid = point_id(meta.get("source", ""), rec["text"])
+        docs.append((pid, rec["text"]))
+        batch.append(models.PointStruct(
+            id=pid,
+            vector=fake_embedding("search_document: " + rec["text"], dim),
+            payload={**meta, "text": rec["text"]},
+        ))
+        if len(batch) >= batch_size:
+            await client.upsert(collection_name=collection_name, points=batch)
+            batch = []
+    if batch:
+        await client.upsert(collection_name=collection_name, points=batch)
+    return docs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ollama falso para testes offline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dim", type=int, default=EMBED_DIM)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--ttft-ms", type=float, default=0.0)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    stub = StubOllama(
+        host=args.host,
+        port=args.port,
+        dim=args.dim,
+        embed_latency_ms=args.embed_latency_ms,
+        ttft_ms=args.ttft_ms,
+        token_rate=args.token_rate,
+        answer_tokens=args.answer_tokens,
+    )
+    print(f"Ollama falso em {stub.url} (Ctrl+C para sair)")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
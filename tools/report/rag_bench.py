@@ -0,0 +1,614 @@
+#!/usr/bin/env python
+"""Benchmark de carga do Shantilly RAG (substitui o rag_benchmark.sh).
+
+Mede `/query` (ou `/query/stream`) com concorrência e taxa de chegada
+configuráveis e, no modo offline, cada estágio do pipeline isoladamente
+(`embed`, `retrieve`, `rerank`, `prompt`, `llm`). Para cada variante de
+`tools/templates/retrieval/retrieval.bench.*.yaml` (mesclada sobre o
+config/retrieval.yaml atual) reporta p50/p95/p99, média e throughput.
+
+Alvos:
+- `offline` (default): sobe o servidor no próprio processo (uvicorn numa
+  porta local), com o Ollama substituído por `bench_stubs.StubOllama` e o
+  Qdrant por `QDRANT_URL=:memory:`, populado com os chunks de
+  data/chunks/. Não precisa de rede; mede só o overhead do nosso código
+  (mais a latência simulada configurada). Caches de embedding e de
+  respostas ficam desligados.
+- `http`: dispara contra um servidor já rodando (`--base-url`). Para varrer
+  variantes, `--restart-cmd` é executado após gravar cada config em
+  config/retrieval.yaml (o arquivo original é restaurado no final).
+
+Saída em `--run-dir` (default tools/report/bench_results/<data>-runNN/),
+compatível com o rag_benchmark_report.sh:
+- `summary.csv` (`variant,run,timestamp,latency_ms,status,file`), uma linha
+  por requisição; estágios isolados aparecem como `<variante>@<estágio>`;
+- `<variante>_run<n>_<timestamp>.json` no formato do `rag-cli -json`, com
+  `--save-responses`;
+- `bench_summary.json` com os percentis de cada variante/estágio.
+
+Exemplo:
+    python tools/report/rag_bench.py --concurrency 4 --requests 40
+    python tools/report/rag_bench.py --stages query,retrieve,rerank --rate 5
+    python tools/report/rag_bench.py --target http --configs "" --concurrency 2
+"""
+
+import argparse
+import asyncio
+import copy
+import csv
+import glob
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+import yaml
+
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_stubs import EMBED_DIM, StubOllama, seed_collection  # noqa: E402
+
+
+BENCH_DIR = ROOT / "tools" / "report" / "bench_results"
+RETRIEVAL_CONFIG = ROOT / "config" / "retrieval.yaml"
+DEFAULT_CONFIGS = "tools/templates/retrieval/retrieval.bench.*.yaml"
+DEFAULT_CHUNKS = ROOT / "data" / "chunks" / "charmbracelet_shantilly_knowledge.jsonl"
+QA_PATH = ROOT / "tests" / "rag" / "qa_dataset.jsonl"
+STAGES = ("query", "embed", "retrieve", "rerank", "prompt", "llm")
+
+
+@dataclass
+class Sample:
+    question: str
+    latency_ms: float
+    # tempo entre a chegada programada e o início (modo taxa fixa)
+    queue_ms: float = 0.0
+    status: str = "ok"
+    error: Optional[str] = None
+    cached: bool = False
+    first_token_ms: Optional[float] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    answer: str = ""
+    documents: List[Dict[str, Any]] = field(default_factory=list)
+    timestamp: str = ""
+
+
+def deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def variant_name(path: Path) -> str:
+    # Ex.: retrieval.bench.vec30r6.yaml -> vec30r6
+    name = path.name
+    if name.startswith("retrieval.bench."):
+        name = name[len("retrieval.bench."):]
+    return name[: -len(".yaml")] if name.endswith(".yaml") else name
+
+
+def load_yaml(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_questions(args: argparse.Namespace) -> List[str]:
+    if args.query:
+        return list(args.query)
+    path = Path(args.questions)
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+def next_run_dir() -> Path:
+    prefix = datetime.now().strftime("%Y-%m-%d")
+    n = 1
+    while (BENCH_DIR / f"{prefix}-run{n:02d}").exists():
+        n += 1
+    return BENCH_DIR / f"{prefix}-run{n:02d}"
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(arr.mean()), 2),
+        "max_ms": round(float(arr.max()), 2),
+    }
+
+
+# --- Gerador de carga ----------------------------------------------------
+
+
+async def run_load(
+    fn: Callable[[str], Awaitable[Sample]],
+    questions: List[str],
+    requests: int,
+    concurrency: int,
+    rate: float,
+    poisson: bool,
+) -> List[Sample]:
+    """Executa `requests` chamadas de `fn`.
+
+    Com `rate <= 0` o laço é fechado: `concurrency` workers emendam uma
+    chamada na outra. Com `rate > 0` as chegadas são programadas (intervalo
+    fixo ou exponencial com `poisson`) e no máximo `concurrency` rodam ao
+    mesmo tempo; a latência inclui a espera por uma vaga (`queue_ms`).
+    """
+    samples: List[Sample] = []
+
+    async def timed(i: int, scheduled: float) -> None:
+        started = time.perf_counter()
+        sample = await fn(questions[i % len(questions)])
+        sample.queue_ms = (started - scheduled) * 1000.0
+        sample.latency_ms += sample.queue_ms
+        samples.append(sample)
+
+    if rate <= 0:
+        counter = iter(range(requests))
+
+        async def worker() -> None:
+            for i in counter:
+                await timed(i, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        return samples
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    rng = random.Random(0)
+    t0 = time.perf_counter()
+    offset = 0.0
+    tasks: List[asyncio.Task] = []
+
+    async def limited(i: int, scheduled: float) -> None:
+        async with sem:
+            await timed(i, scheduled)
+
+    for i in range(requests):
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(limited(i, t0 + offset)))
+        offset += rng.expovariate(rate) if poisson else 1.0 / rate
+    await asyncio.gather(*tasks)
+    return samples
+
+
+async def _measure(question: str, coro: Awaitable[Any]) -> Sample:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    started = time.perf_counter()
+    try:
+        await coro
+        status, error = "ok", None
+    except Exception as exc:
+        status, error = "error", str(exc)
+    return Sample(
+        question=question,
+        latency_ms=(time.perf_counter() - started) * 1000.0,
+        status=status,
+        error=error,
+        timestamp=timestamp,
+    )
+
+
+async def query_once(
+    http: httpx.AsyncClient, question: str, stream: bool
+) -> Sample:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    body = {"query": question, "history": [], "include_timings": True}
+    sample = Sample(question=question, latency_ms=0.0, timestamp=timestamp)
+    started = time.perf_counter()
+    try:
+        if not stream:
+            resp = await http.post("/query", json=body)
+            resp.raise_for_status()
+            data = resp.json()
+            sample.answer = data.get("answer", "")
+            sample.documents = data.get("documents") or []
+            sample.cached = bool(data.get("cached"))
+            sample.timings = data.get("timings") or {}
+        else:
+            parts: List[str] = []
+            async with http.stream("POST", "/query/stream", json=body) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "documents":
+                        sample.documents = event.get("documents") or []
+                    elif event["type"] == "token":
+                        if sample.first_token_ms is None:
+                            sample.first_token_ms = (time.perf_counter() - started) * 1000.0
+                        parts.append(event.get("content", ""))
+                    elif event["type"] == "done":
+                        sample.cached = bool(event.get("cached"))
+                        sample.timings = event.get("timings") or {}
+                    elif event["type"] == "error":
+                        raise RuntimeError(event.get("detail"))
+            sample.answer = "".join(parts)
+    except Exception as exc:
+        sample.status, sample.error = "error", str(exc)
+    sample.latency_ms = (time.perf_counter() - started) * 1000.0
+    return sample
+
+
+# --- Alvo offline (servidor no processo + stubs) -------------------------
+
+
+class OfflineTarget:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.stub = StubOllama(
+            embed_latency_ms=args.embed_latency_ms,
+            ttft_ms=args.ttft_ms,
+            token_rate=args.token_rate,
+            answer_tokens=args.answer_tokens,
+        ).start()
+        os.environ["OLLAMA_BASE_URL"] = self.stub.url
+        os.environ["QDRANT_URL"] = ":memory:"
+        os.environ.setdefault("LLM_MAX_CONCURRENCY", str(args.llm_concurrency))
+
+        import server.app as app_module
+
+        self.app = app_module
+        self.base_config = copy.deepcopy(app_module.RETRIEVAL_CFG)
+        self._server: Any = None
+        self._server_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> str:
+        import uvicorn
+
+        from server.text_index import build_text_index, text_index_dir
+
+        app = self.app
+        # Sem caches: o objetivo é medir o caminho completo a cada requisição.
+        engine = app.embeddings_client.engine
+        if engine.cache is not None:
+            engine.cache.close()
+            engine.cache = None
+        app.answer_cache = None
+
+        # QDRANT_URL=:memory: -> manifestos e índice BM25 num diretório temporário.
+        # Só a coleção padrão é semeada: as perguntas do benchmark caem nela.
+        name = app.router.defaults[0]
+        docs = await seed_collection(
+            app.qdrant_client,
+            name,
+            Path(self.args.chunks),
+            self.args.max_chunks,
+            EMBED_DIM,
+        )
+        build_text_index(docs, text_index_dir(name))
+        print(f"[bench] offline: {len(docs)} chunks em :memory:, Ollama stub em {self.stub.url}")
+
+        port = _free_port()
+        self._server = uvicorn.Server(
+            uvicorn.Config(app.app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        self._server_task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.05)
+        return f"http://127.0.0.1:{port}"
+
+    async def apply_config(self, override: Dict[str, Any]) -> None:
+        from server.context_builder import ContextConfig
+        from server.rerankers import build_reranker
+
+        app = self.app
+        cfg = deep_merge(self.base_config, override)
+        app.RETRIEVAL_CFG.clear()
+        app.RETRIEVAL_CFG.update(cfg)
+        await app.reranker.aclose()
+        app.reranker = build_reranker(
+            app.retrieval_section("rerank"), limiter=app.llm_client.limiter
+        )
+        app.context_config = ContextConfig.from_config(cfg)
+
+    async def stage_fn(
+        self, stage: str, questions: List[str]
+    ) -> Callable[[str], Awaitable[Sample]]:
+        """Pré-calcula as entradas de `stage` para cada pergunta (sem medir)."""
+        from server.context_builder import build_context
+        from server.rag_pipeline import embed_query, rerank, retrieve
+
+        app = self.app
+        target = app.router.targets[app.router.defaults[0]]
+        prepared: Dict[str, Dict[str, Any]] = {}
+        for q in set(questions):
+            vec = await embed_query(q, app.embeddings_client)
+            docs = await retrieve(
+                q, app.qdrant_client, app.embeddings_client, target.name,
+                query_vector=vec, text_index=target.text_index.get(),
+                search_params=target.search_params, vector_index=target.local_vectors(),
+            )
+            ranked = await rerank(q, [dict(d) for d in docs], reranker=app.reranker)
+            built = build_context(q, ranked, app.context_config)
+            prepared[q] = {
+                "vec": vec, "docs": docs, "ranked": ranked, "built": built,
+                "prompt": app._build_prompt(q, built),
+            }
+
+        async def run_prompt(q: str) -> None:
+            built = build_context(q, prepared[q]["ranked"], app.context_config)
+            app._build_prompt(q, built)
+
+        calls: Dict[str, Callable[[str], Awaitable[Any]]] = {
+            "embed": lambda q: embed_query(q, app.embeddings_client),
+            "retrieve": lambda q: retrieve(
+                q, app.qdrant_client, app.embeddings_client, target.name,
+                query_vector=prepared[q]["vec"], text_index=target.text_index.get(),
+                search_params=target.search_params, vector_index=target.local_vectors(),
+            ),
+            "rerank": lambda q: rerank(
+                q, [dict(d) for d in prepared[q]["docs"]], reranker=app.reranker
+            ),
+            "prompt": run_prompt,
+            "llm": lambda q: app.llm_client.generate(prepared[q]["prompt"]),
+        }
+        call = calls[stage]
+        return lambda q: _measure(q, call(q))
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._server_task
+        self.stub.stop()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- Alvo HTTP (servidor já em execução) ---------------------------------
+
+
+class HttpTarget:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self._backup: Optional[Path] = None
+
+    async def start(self) -> str:
+        return self.args.base_url
+
+    async def apply_config(self, override: Dict[str, Any]) -> None:
+        if not self.args.restart_cmd:
+            raise SystemExit("--target http com variantes requer --restart-cmd")
+        if self._backup is None:
+            self._backup = Path(tempfile.mkstemp(prefix="retrieval.", suffix=".yaml")[1])
+            shutil.copyfile(RETRIEVAL_CONFIG, self._backup)
+        merged = deep_merge(load_yaml(self._backup), override)
+        with RETRIEVAL_CONFIG.open("w", encoding="utf-8") as f:
+            yaml.safe_dump(merged, f, sort_keys=False, allow_unicode=True)
+        subprocess.run(self.args.restart_cmd, shell=True, check=True)
+        await wait_for_health(self.args.base_url)
+
+    async def stage_fn(self, stage: str, questions: List[str]) -> Any:
+        raise SystemExit(f"Estágio isolado '{stage}' só está disponível com --target offline")
+
+    async def close(self) -> None:
+        if self._backup is not None:
+            shutil.copyfile(self._backup, RETRIEVAL_CONFIG)
+            self._backup.unlink()
+            if self.args.restart_cmd:
+                subprocess.run(self.args.restart_cmd, shell=True, check=False)
+
+
+async def wait_for_health(base_url: str, attempts: int = 30) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as http:
+        for _ in range(attempts):
+            try:
+                if (await http.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(2)
+    raise SystemExit(f"Timeout aguardando /health em {base_url}")
+
+
+# --- Relatório -----------------------------------------------------------
+
+
+def summarize(
+    label: str, stage: str, samples: List[Sample], duration: float, args: argparse.Namespace
+) -> Dict[str, Any]:
+    ok = [s for s in samples if s.status == "ok"]
+    summary: Dict[str, Any] = {
+        "variant": label,
+        "stage": stage,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "cached": sum(s.cached for s in ok),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(ok) / duration, 3) if duration > 0 else 0.0,
+        **percentiles([s.latency_ms for s in ok]),
+    }
+    first_tokens = [s.first_token_ms for s in ok if s.first_token_ms is not None]
+    if first_tokens:
+        summary["first_token"] = percentiles(first_tokens)
+    stage_names = sorted({name for s in ok for name in s.timings})
+    if stage_names:
+        summary["stages"] = {
+            name[:-3] if name.endswith("_ms") else name: percentiles(
+                [s.timings[name] for s in ok if name in s.timings]
+            )
+            for name in stage_names
+        }
+    return summary
+
+
+def write_samples(
+    run_dir: Path, label: str, samples: List[Sample], save: bool, writer: Any
+) -> None:
+    for n, s in enumerate(samples, start=1):
+        path = ""
+        if save:
+            out = run_dir / f"{label}_run{n}_{s.timestamp}.json"
+            record: Dict[str, Any] = {
+                "question": s.question,
+                "answer": s.answer,
+                "documents": s.documents,
+                "latency_ms": int(round(s.latency_ms)),
+            }
+            if s.first_token_ms is not None:
+                record["first_token_ms"] = int(round(s.first_token_ms))
+            with out.open("w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, indent=2)
+            path = str(out)
+        latency = int(round(s.latency_ms)) if s.status == "ok" else ""
+        writer.writerow([label, n, s.timestamp, latency, s.status, path])
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(
+        f"[bench] {summary['variant']:<20} n={summary['requests']:<5} "
+        f"err={summary['errors']:<3} p50={summary.get('p50_ms', 0):>9.1f}ms "
+        f"p95={summary.get('p95_ms', 0):>9.1f}ms p99={summary.get('p99_ms', 0):>9.1f}ms "
+        f"thr={summary['throughput_rps']:.2f}/s"
+    )
+    for name, stats in (summary.get("stages") or {}).items():
+        print(f"[bench]   {name:<10} p50={stats['p50_ms']:>9.1f}ms p95={stats['p95_ms']:>9.1f}ms")
+
+
+# --- Main ----------------------------------------------------------------
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de carga do Shantilly RAG.")
+    parser.add_argument("--target", choices=("offline", "http"), default="offline")
+    parser.add_argument("--base-url", default=os.getenv("RAG_BASE_URL", "http://127.0.0.1:8001"))
+    parser.add_argument("--restart-cmd", default=None,
+                        help="Comando para reiniciar o servidor após trocar a config (alvo http).")
+    parser.add_argument("--query", action="append",
+                        help="Pergunta (repetível); default: perguntas do dataset de Q&A.")
+    parser.add_argument("--questions", default=str(QA_PATH),
+                        help="JSONL com campo `question` (default: tests/rag/qa_dataset.jsonl).")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS,
+                        help="Glob de variantes de retrieval; vazio = só a config atual.")
+    parser.add_argument("--stages", default="query",
+                        help=f"Estágios separados por vírgula: {', '.join(STAGES)}.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Usa /query/stream e mede o tempo até o primeiro token.")
+    parser.add_argument("--requests", type=int, default=20, help="Requisições por variante/estágio.")
+    parser.add_argument("--warmup", type=int, default=2, help="Requisições descartadas antes de medir.")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Chegadas por segundo (0 = laço fechado com --concurrency workers).")
+    parser.add_argument("--poisson", action="store_true", help="Intervalos exponenciais entre chegadas.")
+    parser.add_argument("--run-dir", default=None,
+                        help="Diretório de saída (default: tools/report/bench_results/<data>-runNN).")
+    parser.add_argument("--save-responses", action="store_true",
+                        help="Grava um JSON por requisição de /query (formato do rag-cli -json).")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    offline = parser.add_argument_group("alvo offline")
+    offline.add_argument("--chunks", default=str(DEFAULT_CHUNKS))
+    offline.add_argument("--max-chunks", type=int, default=None)
+    offline.add_argument("--embed-latency-ms", type=float, default=0.0)
+    offline.add_argument("--ttft-ms", type=float, default=0.0,
+                         help="Tempo simulado até o primeiro token do LLM.")
+    offline.add_argument("--token-rate", type=float, default=0.0,
+                         help="Tokens/s simulados do LLM (0 = instantâneo).")
+    offline.add_argument("--answer-tokens", type=int, default=64)
+    offline.add_argument("--llm-concurrency", type=int, default=2)
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Estágios desconhecidos: {', '.join(sorted(unknown))}")
+
+    questions = load_questions(args)
+    configs = [Path(p) for p in sorted(glob.glob(str(ROOT / args.configs)))] if args.configs else []
+    variants: List[tuple] = [(variant_name(p), load_yaml(p)) for p in configs] or [("current", None)]
+
+    run_dir = Path(args.run_dir) if args.run_dir else next_run_dir()
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    target = OfflineTarget(args) if args.target == "offline" else HttpTarget(args)
+    summaries: List[Dict[str, Any]] = []
+    base_url = await target.start()
+    http = httpx.AsyncClient(
+        base_url=base_url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=max(args.concurrency, 1) * 2),
+    )
+    try:
+        with (run_dir / "summary.csv").open("w", encoding="utf-8", newline="") as csv_f:
+            writer = csv.writer(csv_f)
+            writer.writerow(["variant", "run", "timestamp", "latency_ms", "status", "file"])
+            for name, override in variants:
+                if override is not None:
+                    await target.apply_config(override)
+                for stage in stages:
+                    if stage == "query":
+                        fn = lambda q: query_once(http, q, args.stream)  # noqa: E731
+                        label = name
+                    else:
+                        fn = await target.stage_fn(stage, questions)
+                        label = f"{name}@{stage}"
+
+                    if args.warmup:
+                        await run_load(fn, questions, args.warmup, args.concurrency, 0, False)
+                    started = time.perf_counter()
+                    samples = await run_load(
+                        fn, questions, args.requests, args.concurrency, args.rate, args.poisson
+                    )
+                    duration = time.perf_counter() - started
+
+                    write_samples(run_dir, label, samples, args.save_responses and stage == "query", writer)
+                    summary = summarize(label, stage, samples, duration, args)
+                    summaries.append(summary)
+                    print_summary(summary)
+                    for s in samples:
+                        if s.error:
+                            print(f"[bench]   erro: {s.error}")
+                            break
+    finally:
+        await http.aclose()
+        await target.close()
+
+    with (run_dir / "bench_summary.json").open("w", encoding="utf-8") as f:
+        json.dump(
+            {"target": args.target, "stream": args.stream, "results": summaries},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"[bench] Resultados em {run_dir}")
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()